@@ -1,24 +1,137 @@
+import json
 import os
+import sqlite3
+import uuid
 
 import streamlit as st
 
-from components.core.climb_detector import detect_significant_segments
-from components.core.gpx_parser import parse_gpx
-from components.core.logging import Timer
-from components.core.utils import classify_climb_category_strava
-from components.ui.elevation_chart import (
-    get_smoothed_grade,
-    update_plot_elevation_colored_by_slope,
+from components.core.archive import get_activity_archive
+from components.core.cache import cached_parse_gpx, content_key
+from components.core.climb_detector import (
+    DETECTION_PRESETS,
+    detect_significant_segments,
 )
+from components.core.dem import DEM_DIR
+from components.core.overpass import OverpassError
+from components.core.pipeline import PipelineRun
+from components.core.profiler import Trace, activate, span
+from components.core.range_stats import grade_range_stats
+from components.core.track_file import TRACK_DIR
+from components.core.utils import apply_slope_smoothing
 from components.ui.legend import display_legend
-from components.ui.map_display import update_display_route_map
-from components.ui.pace_analysis import run_pace_analysis  # <-- added
-from components.ui.segment_details import show_segment_summary_and_details
+from components.ui.map_display import (
+    build_route_map,
+    route_map_html,
+    show_route_map,
+)
+from components.ui.pace_analysis import pace_analysis, show_pace_analysis
 from components.ui.stats_panel import show_stats
-from utils.gps_signal_analysis import run_gps_signal_analysis
+from utils.gps_signal_analysis import (
+    gps_signal_analysis,
+    prefetch_buildings,
+    show_gps_signal_analysis,
+    show_overpass_error,
+)
+
+TABS = ["🏔️ Hills & Climbs", "📡 GPS Signal Quality", "🏃‍♂️ Pace Analysis"]
+MAP_OPTIONS = {"tile_style": "OpenStreetMap", "color_by_slope": True}
+PROFILE_OPTIONS = {"color_by_slope": True, "simplified": False}
+
+
+# ───────────────────────── ETAPAS
+# Cada etapa depende solo de sus entradas y de los widgets que recibe como
+# parámetros: cambiar la sensibilidad repite la detección y lo que cuelga de
+# ella; cambiar un control del perfil solo vuelve a dibujar el perfil.
+# Los módulos con matplotlib se importan dentro de las etapas que lo usan, así
+# que la página inicial (sin GPX) se pinta sin cargarlo.
+def grade_stage(parsed, target_meters):
+    df = apply_slope_smoothing(parsed[0], target_meters)
+    return df, grade_range_stats(df)
+
+
+def segments_stage(graded, **params):
+    # detect_significant_segments ya enriquece cada segmento con sus estadísticas
+    df, grade_index = graded
+    return tuple(
+        detect_significant_segments(df, kind=kind, grade_index=grade_index, **params)
+        for kind in ("climb", "descent")
+    )
+
+
+def map_stage(graded, segments, **options):
+    climbs_df, descents_df = segments
+    m = build_route_map(
+        graded[0], climbs_df=climbs_df, descents_df=descents_df, **options
+    )
+    return route_map_html(m)
+
+
+def profile_stage(graded, segments, **options):
+    from components.ui.elevation_chart import elevation_chart_png
+
+    climbs_df, descents_df = segments
+    return elevation_chart_png(
+        graded[0], climbs_df=climbs_df, descents_df=descents_df, **options
+    )
+
+
+def segment_images_stage(graded, segments, progress=None):
+    from components.ui.segment_details import segment_images
+
+    climbs_df, descents_df = segments
+    total = len(climbs_df) + len(descents_df)
+
+    def figure_done(done, _):
+        if progress is not None:
+            progress(done / total, f"Segment figures: {done}/{total}")
+
+    climbs = segment_images(climbs_df, graded[0], kind="climb", progress=figure_done)
+    offset = len(climbs)
+    descents = segment_images(
+        descents_df,
+        graded[0],
+        kind="descent",
+        progress=lambda done, n: figure_done(offset + done, n),
+    )
+    return climbs, descents
+
+
+def gps_stage(parsed, progress=None):
+    return gps_signal_analysis(parsed[0], progress=progress)
+
+
+def pace_stage(parsed):
+    return pace_analysis(parsed[0])
+
+
+def prefetch_stage(parsed):
+    return prefetch_buildings(parsed[0])
+
+
+def progress_reporter(label, container=st):
+    """
+    Callback `progress(fracción, texto)` que pinta una barra solo si se llama
+    (una etapa que sale de la caché no la muestra) y la función para quitarla.
+    Cada actualización es además un punto en el que Streamlit puede cortar la
+    ejecución si el usuario ha cambiado de vista.
+    """
+    placeholder = container.empty()
+
+    def update(fraction, text=label):
+        placeholder.progress(min(max(fraction, 0.0), 1.0), text=text)
+
+    return update, placeholder.empty
+
 
 st.set_page_config(layout="wide", page_title="GPX Analyzer 📍")
 
+# Una traza por sesión: los spans de cada ejecución del script van a su buffer
+if "trace" not in st.session_state:
+    st.session_state["trace"] = Trace(name=f"session-{uuid.uuid4().hex[:12]}")
+trace = st.session_state["trace"]
+trace.clear()
+activate(trace)
+
 # ───────────────────────── GPX INPUT
 with st.sidebar:
     st.title("Upload GPX File")
@@ -27,12 +140,65 @@ with st.sidebar:
     data_dir = "data"
     example_files = []
     if os.path.isdir(data_dir):
-        example_files = [f for f in os.listdir(data_dir) if f.endswith(".gpx")]
+        example_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".gpx"))
+
+    # Resúmenes del índice de actividades. El índice se pone al día en segundo
+    # plano (una vez por sesión o al pulsar el botón) y la lista usa lo que ya
+    # esté indexado, así que el primer render no espera a parsear los ejemplos
+    summaries = {}
+    try:
+        with span("Queried activity archive"):
+            archive = get_activity_archive()
+            reindex = st.button("🔄 Re-index examples")
+            if reindex or "archive_sync" not in st.session_state:
+                st.session_state["archive_sync"] = archive.sync_in_background(
+                    [os.path.join(data_dir, f) for f in example_files]
+                )
+            indexed = archive.query()
+        summaries = {
+            os.path.basename(row["path"]): row
+            for row in indexed.to_dict("records")
+            if os.path.dirname(row["path"]) == os.path.abspath(data_dir)
+        }
+        archive_sync = st.session_state["archive_sync"]
+        if not archive_sync.done():
+            st.caption("⏳ Indexing examples in the background…")
+        else:
+            archive_sync.result()
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"⚠️ Activity archive not available: {e}")
+
+    min_gain = st.number_input(
+        "Minimum elevation gain (m)", min_value=0, value=0, step=250
+    )
+    if min_gain:
+        example_files = [
+            f
+            for f in example_files
+            if f in summaries and summaries[f]["elevation_gain"] >= min_gain
+        ]
+
+    def example_label(name):
+        summary = summaries.get(name)
+        if summary is None:
+            return name
+        return (
+            f"{name} · {summary['total_distance_km']:.1f} km"
+            f" · {summary['elevation_gain']:.0f} m↑"
+        )
 
+    # Las etiquetas cambian cuando termina el índice en segundo plano, y con
+    # ellas la identidad del widget: la elección se guarda aparte para no
+    # perderla
     options = ["---"] + example_files
+    previous = st.session_state.get("selected_example", "---")
     selected_example = st.selectbox(
-        "Or choose an example from the /data folder:", options
+        "Or choose an example from the /data folder:",
+        options,
+        index=options.index(previous) if previous in options else 0,
+        format_func=example_label,
     )
+    st.session_state["selected_example"] = selected_example
     gpx_data = None
     if selected_example != "---":
         example_path = os.path.join(data_dir, selected_example)
@@ -54,84 +220,59 @@ with st.sidebar:
         help="Lenient: Detects more, shorter climbs. Strict: Detects only the most significant climbs.",
     )
 
-    if detection_mode == "Lenient":
-        params = {
-            "max_pause_length_m": 400,
-            "max_pause_descent_m": 20,
-            "start_threshold_slope": 1.5,
-        }
-    elif detection_mode == "Balanced":
-        params = {
-            "max_pause_length_m": 200,
-            "max_pause_descent_m": 10,
-            "start_threshold_slope": 2.0,
-        }
-    else:  # Strict
-        params = {
-            "max_pause_length_m": 100,
-            "max_pause_descent_m": 5,
-            "start_threshold_slope": 3.0,
-        }
+    params = DETECTION_PRESETS[detection_mode]
+
+    # Las vistas se calculan al abrirlas; esto adelanta las que no están abiertas
+    precompute = st.button(
+        "⚡ Precompute all views",
+        help="Compute every analysis now so switching views is instant.",
+    )
 
 
+run = PipelineRun()
 df_reduced, stats = None, None
 if gpx_data:
     try:
-        df_reduced, stats = parse_gpx(gpx_data)
+        gpx = run.source("gpx", content_key(gpx_data), gpx_data)
+        # Tras un reinicio el track analizado se reabre de TRACK_DIR sin leer el
+        # XML; `key` reutiliza el hash del contenido en lugar de recalcularlo
+        parsed = run.stage(
+            "parse",
+            cached_parse_gpx,
+            gpx,
+            max_points_per_km=20,
+            dem_dir=DEM_DIR,
+            track_dir=TRACK_DIR,
+            key=gpx.key,
+        )
+        df_reduced, stats = parsed.value
     except Exception as e:
         st.error(f"❌ Error processing GPX file: {e}")
+    else:
+        # Los edificios de la pestaña GPS se van descargando mientras tanto;
+        # como etapa, se lanza una vez por track y no en cada rerun
+        run.stage("prefetch", prefetch_stage, parsed)
 
-# ───────────────────────── TABS
-tab1, tab2, tab3 = st.tabs(
-    ["🏔️ Hills & Climbs", "📡 GPS Signal Quality", "🏃‍♂️ Pace Analysis"]
+# ───────────────────────── VISTAS
+# Solo se ejecuta la vista elegida (st.tabs ejecuta las tres en cada rerun);
+# sus resultados quedan en la caché de etapas para cuando se vuelva a ella
+active_tab = st.radio(
+    "View", TABS, horizontal=True, key="active_tab", label_visibility="collapsed"
 )
 
 # ───────────────────────── TAB 1
-with tab1:
+if active_tab == TABS[0]:
     if df_reduced is not None:
-        t = Timer()
-        df_reduced["plot_grade"] = get_smoothed_grade(df_reduced)
-        t.log("Calculated and smoothed slope")
-
-        climbs_df = detect_significant_segments(df_reduced, kind="climb", **params)
-        descents_df = detect_significant_segments(df_reduced, kind="descent", **params)
-        t.log("Detected climbs and descents")
-
-        for seg_df, is_climb in [(climbs_df, True), (descents_df, False)]:
-            if not seg_df.empty:
-                seg_df["category"] = seg_df.apply(
-                    lambda row: classify_climb_category_strava(
-                        row["length_m"], abs(row["avg_slope"])
-                    ),
-                    axis=1,
-                )
-                seg_df["max_slope"] = seg_df.apply(
-                    lambda row: df_reduced["plot_grade"]
-                    .iloc[row["start_idx"] : row["end_idx"] + 1]
-                    .max(),
-                    axis=1,
-                )
-                seg_df["min_slope"] = seg_df.apply(
-                    lambda row: df_reduced["plot_grade"]
-                    .iloc[row["start_idx"] : row["end_idx"] + 1]
-                    .min(),
-                    axis=1,
-                )
-
-        t.log("Categorized and enriched segments")
+        graded = run.stage("grade", grade_stage, parsed, target_meters=300)
+        segments = run.stage("segments", segments_stage, graded, **params)
+        climbs_df, descents_df = segments.value
 
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("🗺️ Route Map")
-            update_display_route_map(
-                df_reduced,
-                tile_style="OpenStreetMap",
-                climbs_df=climbs_df,
-                descents_df=descents_df,
-                color_by_slope=True,
-            )
+            route_map = run.stage("map", map_stage, graded, segments, **MAP_OPTIONS)
+            show_route_map(route_map.value)
             display_legend()
-            t.log("Rendered map")
 
         with col2:
             st.subheader("📈 Elevation Profile")
@@ -150,23 +291,21 @@ with tab1:
                     help="Choose 'Detailed' to see slope variations or 'Average' for a single color per segment.",
                 )
 
-            show_markers = st.checkbox(
-                "Show climb/descent markers on profile",
-                value=True,
-                help="Show or hide the vertical dashed lines that mark the start and end of detected segments.",
-            )
-            update_plot_elevation_colored_by_slope(
-                df_reduced,
-                climbs_df=climbs_df,
-                descents_df=descents_df,
-                color_by_slope=True,
-                simplified=False,
+            profile = run.stage(
+                "profile",
+                profile_stage,
+                graded,
+                segments,
+                **PROFILE_OPTIONS,
                 show_markers=show_markers,
+                color_mode=color_mode,
             )
-            t.log("Rendered elevation chart")
+            from components.ui.elevation_chart import show_elevation_chart
+
+            show_elevation_chart(profile.value)
             st.subheader("📊 Statistics")
-            show_stats(stats)
-            t.log("Rendered stats panel")
+            with span("Rendered stats panel"):
+                show_stats(stats)
 
         st.subheader("⛰️ Climbs and Descents")
         col1, col2 = st.columns(2)
@@ -208,30 +347,94 @@ with tab1:
                 st.info("No descents detected.")
 
         st.subheader("🔎 Segment Details")
-        show_segment_summary_and_details(climbs_df, df_reduced, kind="climb")
-        show_segment_summary_and_details(descents_df, df_reduced, kind="descent")
+        from components.ui.segment_details import show_segment_summary_and_details
+
+        progress, done = progress_reporter("Segment figures")
+        images = run.stage(
+            "segment figures",
+            segment_images_stage,
+            graded,
+            segments,
+            progress=progress,
+        )
+        done()
+        climb_images, descent_images = images.value
+        show_segment_summary_and_details(
+            climbs_df, graded.value[0], kind="climb", images=climb_images
+        )
+        show_segment_summary_and_details(
+            descents_df, graded.value[0], kind="descent", images=descent_images
+        )
 
-        with open("execution_log.txt", "r") as f:
+        st.caption(f"Pipeline: {run.describe()}")
+
+        log_col, trace_col = st.columns(2)
+        with log_col:
             st.download_button(
-                "📥 Download Log", data=f.read(), file_name="execution_log.txt"
+                "📥 Download Log", data=trace.to_text(), file_name="execution_log.txt"
+            )
+        with trace_col:
+            st.download_button(
+                "📥 Download Trace (Chrome)",
+                data=json.dumps(trace.to_chrome()),
+                file_name="trace.json",
             )
     else:
         st.info("📂 Upload or select a GPX file to begin.")
 
 # ───────────────────────── TAB 2
-with tab2:
+elif active_tab == TABS[1]:
     if df_reduced is not None:
-        run_gps_signal_analysis(df_reduced)
+        progress, done = progress_reporter("Downloading buildings")
+        try:
+            gps = run.stage("gps signal", gps_stage, parsed, progress=progress)
+        except OverpassError as e:
+            done()
+            st.title("📡 GPS Signal Quality Analyzer")
+            show_overpass_error(e)
+        else:
+            done()
+            show_gps_signal_analysis(gps.value)
     else:
         st.info("📂 Upload or select a GPX file to begin.")
 
 # ───────────────────────── TAB 3
-with tab3:
+else:
     if df_reduced is not None:
         try:
-            df_pace = df_reduced[["lat", "lon", "time"]].copy()
-            run_pace_analysis(df_pace)
+            show_pace_analysis(run.stage("pace", pace_stage, parsed).value)
         except Exception as e:
             st.error(f"❌ Error processing GPX for pace analysis: {e}")
     else:
         st.info("📂 Upload or select a GPX file to begin.")
+
+# ───────────────────────── PRECÁLCULO
+# Mismas etapas y parámetros que al pintar cada vista, así que luego salen de
+# la caché (el perfil, con los valores por defecto de sus controles)
+if precompute and df_reduced is not None:
+    pre = PipelineRun()
+    progress, done = progress_reporter("Precomputing views", st.sidebar)
+    graded = pre.stage("grade", grade_stage, parsed, target_meters=300)
+    segments = pre.stage("segments", segments_stage, graded, **params)
+    pre.stage("map", map_stage, graded, segments, **MAP_OPTIONS)
+    pre.stage(
+        "profile",
+        profile_stage,
+        graded,
+        segments,
+        **PROFILE_OPTIONS,
+        show_markers=True,
+        color_mode="Detailed Slope",
+    )
+    pre.stage(
+        "segment figures", segment_images_stage, graded, segments, progress=progress
+    )
+    pre.stage("pace", pace_stage, parsed)
+    try:
+        pre.stage("gps signal", gps_stage, parsed, progress=progress)
+    except OverpassError:
+        st.sidebar.warning("📡 GPS view not precomputed: Overpass is unavailable.")
+    done()
+    st.sidebar.caption(f"Precomputed: {pre.describe()}")
+
+trace.flush()
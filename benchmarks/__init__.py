@@ -0,0 +1,5 @@
+import os
+
+# Las figuras solo se guardan a PNG: backend sin ventana antes de que nadie
+# importe matplotlib (equivale a MPLBACKEND=Agg en la línea de comandos)
+os.environ.setdefault("MPLBACKEND", "Agg")
@@ -0,0 +1,66 @@
+"""
+Tiempo de render del perfil "Detailed Slope" (figura + PNG, lo mismo que hace
+`st.pyplot`) sobre un perfil sintético, contra un presupuesto fijo. Se dibujan
+todos los puntos, sin pasar por la pirámide de detalle, para medir el camino
+de la PolyCollection y no el submuestreo.
+
+    python -m benchmarks.bench_elevation_chart [num_points]
+"""
+
+import io
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from components.ui.elevation_chart import build_elevation_figure
+
+# Presupuesto para 100k puntos, medido en un portátil de desarrollo
+RENDER_BUDGET_S = 1.0
+BUDGET_POINTS = 100_000
+
+
+def _synthetic_profile(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    distance = np.cumsum(rng.uniform(1, 4, n))
+    ele = 800 + 600 * np.sin(distance / 8000) + np.cumsum(rng.normal(0, 0.2, n))
+    grade = np.zeros(n)
+    grade[1:] = np.diff(ele) / np.diff(distance) * 100
+    # Recta hacia el norte: el submuestreo del perfil también usa lat/lon
+    lat = 42.0 + distance / 111_195.0
+    lon = np.full(n, 1.0)
+    return pd.DataFrame(
+        {"lat": lat, "lon": lon, "distance": distance, "ele": ele, "grade": grade}
+    )
+
+
+def run(n: int = BUDGET_POINTS) -> dict:
+    df = _synthetic_profile(n)
+    starts = distance_marks(df, 0.1)
+    climbs_df = pd.DataFrame({"start_km": starts, "end_km": starts + 0.1})
+
+    start = time.perf_counter()
+    fig = build_elevation_figure(df, climbs_df=climbs_df, max_points=None)
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+    elapsed = time.perf_counter() - start
+
+    return {"points": n, "render_s": elapsed, "budget_s": RENDER_BUDGET_S}
+
+
+def distance_marks(df, offset: float):
+    total_km = df["distance"].iloc[-1] / 1000
+    return np.arange(offset, total_km, 10.0)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_POINTS
+    r = run(n)
+    status = "OK" if n > BUDGET_POINTS or r["render_s"] <= r["budget_s"] else "OVER"
+    print(
+        f"{r['points']} points rendered in {r['render_s']:.2f} s "
+        f"(budget {r['budget_s']:.1f} s for {BUDGET_POINTS}) {status}"
+    )
+    sys.exit(0 if status == "OK" else 1)
@@ -0,0 +1,110 @@
+"""
+Puntuación de riesgo GPS sobre un centro urbano sintético muy denso: bucle
+por punto con `geodesic` (versión anterior del tab) frente a
+`compute_risk_scores`. Comprueba además que ambas dan las mismas puntuaciones.
+
+    python -m benchmarks.bench_gps_risk [num_points] [num_buildings]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+from sklearn.neighbors import BallTree
+
+from components.core.gps_risk import compute_risk_scores, impute_building_heights
+
+EARTH_RADIUS_M = 6371000
+
+
+def synthetic_city(n_points: int, n_buildings: int, seed: int = 0):
+    """Ruta en zigzag por una cuadrícula de ~1 km² llena de edificios."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, n_points)
+    route = pd.DataFrame(
+        {
+            "lat": 41.38 + 0.009 * t,
+            "lon": 2.17 + 0.012 * np.abs(np.sin(t * 12 * np.pi)),
+        }
+    )
+    height = rng.uniform(5, 80, n_buildings)
+    height[rng.random(n_buildings) < 0.5] = np.nan
+    levels = rng.integers(0, 20, n_buildings).astype(float)
+    levels[rng.random(n_buildings) < 0.3] = np.nan
+    buildings = pd.DataFrame(
+        {
+            "lat": 41.38 + 0.009 * rng.random(n_buildings),
+            "lon": 2.17 + 0.012 * rng.random(n_buildings),
+            "height": height,
+            "levels": levels,
+        }
+    )
+    return route, buildings
+
+
+def legacy_scores(df, buildings_df, radius: int = 10):
+    tree = BallTree(np.radians(buildings_df[["lat", "lon"]].values), metric="haversine")
+    building_heights = (
+        buildings_df.apply(
+            lambda row: (
+                row["height"] if pd.notnull(row["height"]) else (row["levels"] or 0) * 3
+            ),
+            axis=1,
+        )
+        .fillna(0)
+        .values
+    )
+    scores = []
+    for _, row in df.iterrows():
+        ind = tree.query_radius(
+            np.radians([[row["lat"], row["lon"]]]), r=radius / EARTH_RADIUS_M
+        )[0]
+        total = 0.0
+        for i in ind:
+            b_lat, b_lon = buildings_df.loc[i, ["lat", "lon"]]
+            d = geodesic((row["lat"], row["lon"]), (b_lat, b_lon)).meters
+            h = building_heights[i]
+            if h > 0 and d > 1:
+                total += h / d
+        scores.append(total)
+    return np.array(scores)
+
+
+def run(n_points: int = 2_000, n_buildings: int = 200_000) -> dict:
+    route, buildings = synthetic_city(n_points, n_buildings)
+
+    start = time.perf_counter()
+    old = legacy_scores(route, buildings)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new, _ = compute_risk_scores(
+        route["lat"],
+        route["lon"],
+        buildings["lat"],
+        buildings["lon"],
+        impute_building_heights(buildings),
+    )
+    batched_s = time.perf_counter() - start
+
+    return {
+        "points": n_points,
+        "buildings": n_buildings,
+        "legacy_s": legacy_s,
+        "batched_s": batched_s,
+        "max_abs_diff": float(np.max(np.abs(old - new))),
+        "pairs_scored": int(np.count_nonzero(new)),
+    }
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    r = run(*args)
+    print(
+        f"{r['points']} points x {r['buildings']} buildings: "
+        f"legacy {r['legacy_s']:.2f} s, batched {r['batched_s']:.3f} s "
+        f"({r['legacy_s'] / r['batched_s']:.0f}x), "
+        f"{r['pairs_scored']} points at risk, max |diff| {r['max_abs_diff']:.2e}"
+    )
@@ -0,0 +1,63 @@
+"""
+Compara el mapa de ruta con una PolyLine por par de puntos (versión anterior)
+frente a `add_binned_route`: número de capas, tamaño del HTML y tiempo.
+
+    python -m benchmarks.bench_route_layer [num_points]
+"""
+
+import sys
+import time
+
+import folium
+import numpy as np
+
+from components.core.utils import GRADE_COLORS, get_color, get_color_bins
+from components.ui.route_layer import add_binned_route
+
+
+def _synthetic_route(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lat = 42.9 + np.cumsum(rng.normal(0, 5e-5, n))
+    lon = 0.1 + np.cumsum(rng.normal(0, 5e-5, n))
+    grade = np.convolve(rng.normal(0, 6, n), np.ones(25) / 25, mode="same") * 3
+    return lat, lon, grade
+
+
+def _per_pair_map(lat, lon, grade):
+    m = folium.Map(location=[lat.mean(), lon.mean()], tiles=None)
+    coords = np.column_stack((lat, lon)).tolist()
+    for i in range(1, len(coords)):
+        folium.PolyLine(
+            [coords[i - 1], coords[i]], color=get_color(grade[i]), weight=4, opacity=1
+        ).add_to(m)
+    return m
+
+
+def _binned_map(lat, lon, grade):
+    m = folium.Map(location=[lat.mean(), lon.mean()], tiles=None)
+    add_binned_route(m, lat, lon, get_color_bins(grade[1:]), GRADE_COLORS)
+    return m
+
+
+def run(n: int = 10_000) -> dict:
+    lat, lon, grade = _synthetic_route(n)
+    results = {}
+    for name, builder in [("per_pair", _per_pair_map), ("binned", _binned_map)]:
+        start = time.perf_counter()
+        m = builder(lat, lon, grade)
+        html = m.get_root().render()
+        results[name] = {
+            "layers": len(m._children),
+            "html_bytes": len(html.encode("utf-8")),
+            "build_s": time.perf_counter() - start,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    for name, r in run(n).items():
+        print(
+            f"{name:>9}: {r['layers']:>6} layers, "
+            f"{r['html_bytes'] / 1e6:7.2f} MB, {r['build_s']:6.2f} s"
+        )
@@ -0,0 +1,179 @@
+"""
+Coste de arranque: tiempo de importación por módulo y tiempo hasta el primer
+render de la app.
+
+`profile` lanza un intérprete nuevo con `python -X importtime` y agrupa el
+resultado por módulo y por paquete, para ver qué dependencias pesan antes de
+que la app pinte nada. `render` mide, también en un proceso nuevo, cuánto
+tarda la primera ejecución de `app.py` (la página sin GPX) con el
+`AppTest` de Streamlit, y lo compara con FIRST_RENDER_TARGET_S.
+
+    python -m benchmarks.imports profile                  # import app
+    python -m benchmarks.imports profile components.cli --top 15
+    python -m benchmarks.imports render --check           # exit 1 si se pasa
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Objetivo de arranque en frío: proceso nuevo hasta la página inicial pintada
+# (importaciones + primera ejecución del script). Medido ~2.7 s tras cargar
+# matplotlib, folium, altair y scikit-learn solo cuando se usan (antes ~10 s).
+FIRST_RENDER_TARGET_S = 3.5
+
+_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "script_s": done - imported,
+    "exceptions": [str(e.value) for e in at.exception],
+}))
+"""
+
+
+def _env(**extra):
+    env = dict(os.environ, **extra)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (ROOT, os.environ.get("PYTHONPATH")) if p
+    )
+    return env
+
+
+def import_profile(module: str = "app"):
+    """
+    Filas (módulo, nivel, propio_ms, acumulado_ms) de `import module` en un
+    proceso nuevo, en el orden de `-X importtime`. Importar `app` ejecuta el
+    script, así que el índice de actividades va a un fichero temporal.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT,
+            env=_env(GPX_ARCHIVE_DB=os.path.join(tmp, "activities.sqlite")),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append(
+            (name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000)
+        )
+    if not rows:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return rows
+
+
+def package_totals(rows):
+    """Tiempo propio sumado por paquete de primer nivel, de mayor a menor."""
+    totals = {}
+    for name, _, self_ms, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0.0) + self_ms
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def first_render(app_path: str = "app.py", timeout: float = 300) -> dict:
+    """
+    Segundos desde que arranca un proceso nuevo hasta que termina la primera
+    ejecución de la app. Se ejecuta dos veces con el mismo índice de
+    actividades temporal y se informa de la segunda: proceso frío, pero sin
+    contar la indexación inicial de `data/`.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(GPX_ARCHIVE_DB=os.path.join(tmp, "activities.sqlite"))
+        for _ in range(2):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-c", _RENDER_SCRIPT, os.path.join(ROOT, app_path)],
+                cwd=tmp,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                check=False,
+            )
+            total = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"first render failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["total_s"] = total
+    report["target_s"] = FIRST_RENDER_TARGET_S
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup cost benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    profile = sub.add_parser("profile", help="Per-module import time")
+    profile.add_argument("module", nargs="?", default="app")
+    profile.add_argument("--top", type=int, default=25)
+    profile.add_argument("--json", action="store_true", help="Machine-readable")
+    render = sub.add_parser("render", help="Time to first render of the app")
+    render.add_argument("--app", default="app.py")
+    render.add_argument(
+        "--check", action="store_true", help="Exit 1 above FIRST_RENDER_TARGET_S"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "profile":
+        rows = import_profile(args.module)
+        total_ms = sum(row[2] for row in rows)
+        if args.json:
+            print(
+                json.dumps(
+                    {
+                        "module": args.module,
+                        "total_ms": total_ms,
+                        "modules": [
+                            dict(zip(("name", "depth", "self_ms", "cumulative_ms"), r))
+                            for r in rows
+                        ],
+                        "packages": dict(package_totals(rows)),
+                    }
+                )
+            )
+            return 0
+        print(f"import {args.module}: {total_ms:.0f} ms, {len(rows)} modules\n")
+        print(f"{'package':40s} {'self ms':>10s}")
+        for package, self_ms in package_totals(rows)[: args.top]:
+            print(f"{package:40s} {self_ms:10.1f}")
+        print(f"\n{'module':60s} {'cumulative ms':>14s}")
+        slowest = sorted(rows, key=lambda r: -r[3])[: args.top]
+        for name, depth, _, cumulative_ms in slowest:
+            print(f"{'  ' * min(depth, 6) + name:60s} {cumulative_ms:14.1f}")
+        return 0
+
+    report = first_render(args.app)
+    ok = report["total_s"] <= FIRST_RENDER_TARGET_S
+    print(
+        f"first render: {report['total_s']:.2f} s "
+        f"(streamlit {report['import_s']:.2f} s + script {report['script_s']:.2f} s), "
+        f"target {FIRST_RENDER_TARGET_S:.1f} s {'OK' if ok else 'EXCEEDED'}"
+    )
+    if report["exceptions"]:
+        print(f"exceptions: {report['exceptions']}", file=sys.stderr)
+        return 1
+    return 0 if ok or not args.check else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
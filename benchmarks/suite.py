@@ -0,0 +1,307 @@
+"""
+Suite de benchmarks por etapas sobre tracks sintéticos y los GPX de `data/`.
+
+Mide parseo, reducción de puntos, suavizado, detección, estadísticas,
+remuestreo del ritmo, riesgo GPS, los constructores del mapa y del perfil y
+el guardado y la reapertura del track completo en formato `.gpxtrack`. Antes
+de cada repetición se vacían las memos por proceso (suavizado y pirámide de
+detalle), así que se mide el cálculo y no un acierto de la memo.
+Guarda los tiempos en un JSON que sirve de referencia, y `compare` marca como
+regresión cualquier etapa más lenta que la referencia por encima de un
+porcentaje dado.
+
+    python -m benchmarks.suite run --sizes 1k,10k,100k -o baseline.json
+    python -m benchmarks.suite run --sizes 1M --profiles city --no-data
+    python -m benchmarks.suite run --compare baseline.json --threshold 15
+    python -m benchmarks.suite compare baseline.json current.json
+"""
+
+import argparse
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import (
+    PROFILES,
+    format_size,
+    parse_size,
+    synthetic_buildings,
+    synthetic_gpx,
+)
+from components.core import lod, utils
+from components.core.climb_detector import detect_significant_segments
+from components.core.gps_risk import (
+    compute_risk_scores,
+    impute_building_heights,
+)
+from components.core.gpx_parser import (
+    parse_gpx,
+    parse_track,
+    reduce_points_by_density,
+)
+from components.core.resample import (
+    resample_by_distance,
+    resample_by_time,
+)
+from components.core.stats import compute_gpx_stats
+from components.core.track_file import load_track_file, save_track_file
+from components.core.utils import apply_slope_smoothing
+from components.ui.elevation_chart import CHART_MAX_POINTS, build_elevation_figure
+from components.ui.map_display import MAP_MAX_POINTS, build_route_map
+from components.ui.pace_analysis import SPEED_WINDOW_M, SPEED_WINDOW_S
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = "1k,10k,100k"
+DEFAULT_THRESHOLD_PCT = 10.0
+# Por debajo de esta diferencia absoluta no se considera regresión (ruido)
+DEFAULT_MIN_DELTA_MS = 5.0
+# A partir de este tamaño cada etapa se mide una sola vez
+SINGLE_RUN_POINTS = 200_000
+BUILDINGS_PER_CASE = 20_000
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+def _clear_memos() -> None:
+    with utils._SMOOTHING_MEMO_LOCK:
+        utils._SMOOTHING_MEMO.clear()
+    with lod._PYRAMID_MEMO_LOCK:
+        lod._PYRAMID_MEMO.clear()
+
+
+def _best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        _clear_memos()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _full_track(gpx_content):
+    return parse_track(gpx_content, max_points_per_km=None).to_frame()
+
+
+def _render_map(df, climbs_df, descents_df):
+    m = build_route_map(df, climbs_df=climbs_df, descents_df=descents_df)
+    return m.get_root().render()
+
+
+def _render_chart(df, climbs_df, descents_df):
+    fig = build_elevation_figure(df, climbs_df=climbs_df, descents_df=descents_df)
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+
+def bench_case(gpx_content, repeat: int = 3, n_buildings: int = BUILDINGS_PER_CASE):
+    """Tiempos (s) de cada etapa del pipeline sobre un GPX."""
+    timings = {}
+    full = _full_track(gpx_content)
+    if len(full) >= SINGLE_RUN_POINTS:
+        repeat = 1
+
+    timings["parse_gpx"], (df, _) = _best_of(lambda: parse_gpx(gpx_content), repeat)
+    timings["reduce_points_by_density"], _ = _best_of(
+        lambda: reduce_points_by_density(full, 20), repeat
+    )
+    timings["apply_slope_smoothing"], df = _best_of(
+        lambda: apply_slope_smoothing(df), repeat
+    )
+    timings["detect_significant_segments"], (climbs_df, descents_df) = _best_of(
+        lambda: (
+            detect_significant_segments(df, kind="climb"),
+            detect_significant_segments(df, kind="descent"),
+        ),
+        repeat,
+    )
+    timings["compute_gpx_stats"], _ = _best_of(lambda: compute_gpx_stats(df), repeat)
+    timings["resample_pace"], _ = _best_of(
+        lambda: (
+            resample_by_time(df, window_s=SPEED_WINDOW_S, max_points=CHART_MAX_POINTS),
+            resample_by_distance(
+                df, window_m=SPEED_WINDOW_M, max_points=MAP_MAX_POINTS
+            ),
+        ),
+        repeat,
+    )
+
+    route = df.iloc[::2]
+    buildings = synthetic_buildings(route, n_buildings)
+    timings["gps_risk"], _ = _best_of(
+        lambda: compute_risk_scores(
+            route["lat"],
+            route["lon"],
+            buildings["lat"],
+            buildings["lon"],
+            impute_building_heights(buildings),
+        ),
+        repeat,
+    )
+    timings["route_map"], _ = _best_of(
+        lambda: _render_map(df, climbs_df, descents_df), repeat
+    )
+    timings["elevation_chart"], _ = _best_of(
+        lambda: _render_chart(df, climbs_df, descents_df), repeat
+    )
+    # Reabrir el track completo ya analizado frente a volver a parsear el XML
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "track.gpxtrack")
+        timings["track_file_save"], _ = _best_of(
+            lambda: save_track_file(path, full), repeat
+        )
+        timings["track_file_load"], _ = _best_of(lambda: load_track_file(path), repeat)
+    return {"points": len(full), "reduced_points": len(df), "timings": timings}
+
+
+def _cases(sizes, profiles, include_data: bool):
+    for n in sizes:
+        for profile in profiles:
+            yield (
+                f"{profile}/{format_size(n)}",
+                lambda n=n, p=profile: synthetic_gpx(n, p),
+            )
+    if include_data:
+        for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.gpx"))):
+            with open(path, "rb") as f:
+                content = f.read()
+            yield f"data/{os.path.basename(path)}", lambda c=content: c
+
+
+def run_suite(sizes, profiles, include_data: bool = True, repeat: int = 3) -> dict:
+    results = {}
+    for name, make_gpx in _cases(sizes, profiles, include_data):
+        gpx_content = make_gpx()
+        start = time.perf_counter()
+        results[name] = bench_case(gpx_content, repeat=repeat)
+        print(
+            f"{name}: {results[name]['points']} points "
+            f"({time.perf_counter() - start:.1f} s)",
+            file=sys.stderr,
+        )
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.datetime.now(datetime.UTC).isoformat(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold_pct: float = DEFAULT_THRESHOLD_PCT,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+):
+    """
+    Filas (caso, etapa, referencia, actual, % cambio, regresión) para las
+    etapas presentes en ambos ficheros.
+    """
+    rows = []
+    for case, result in current["results"].items():
+        base = baseline["results"].get(case)
+        if base is None:
+            continue
+        for stage, now_s in result["timings"].items():
+            base_s = base["timings"].get(stage)
+            if base_s is None:
+                continue
+            change_pct = (now_s - base_s) / base_s * 100 if base_s > 0 else 0.0
+            regressed = (
+                change_pct > threshold_pct and (now_s - base_s) * 1000 > min_delta_ms
+            )
+            rows.append((case, stage, base_s, now_s, change_pct, regressed))
+    return rows
+
+
+def print_comparison(rows) -> int:
+    regressions = 0
+    for case, stage, base_s, now_s, change_pct, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        regressions += regressed
+        print(
+            f"{case:<40} {stage:<28} {base_s * 1000:9.1f} ms "
+            f"-> {now_s * 1000:9.1f} ms {change_pct:+7.1f}% {flag}"
+        )
+    print(f"{regressions} regression(s) in {len(rows)} measurements")
+    return regressions
+
+
+def print_results(report) -> None:
+    for case, result in report["results"].items():
+        print(f"{case} ({result['points']} -> {result['reduced_points']} points)")
+        for stage, seconds in result["timings"].items():
+            print(f"  {stage:<28} {seconds * 1000:9.1f} ms")
+
+
+def _load(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("schema") != SCHEMA_VERSION:
+        raise SystemExit(f"Unsupported benchmark file: {path}")
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="GPX-Analyzer benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the suite")
+    run.add_argument("--sizes", default=DEFAULT_SIZES, help="e.g. 1k,10k,100k,1M")
+    run.add_argument("--profiles", default=",".join(PROFILES))
+    run.add_argument("--no-data", action="store_true", help="Skip data/*.gpx")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("-o", "--output", help="Save results as JSON baseline")
+    run.add_argument("--compare", help="Baseline JSON to compare against")
+
+    cmp_ = sub.add_parser("compare", help="Compare two result files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+
+    for p in (run, cmp_):
+        p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT)
+        p.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        rows = compare(
+            _load(args.baseline),
+            _load(args.current),
+            args.threshold,
+            args.min_delta_ms,
+        )
+        return 1 if print_comparison(rows) else 0
+
+    report = run_suite(
+        [parse_size(s) for s in args.sizes.split(",") if s],
+        [p for p in args.profiles.split(",") if p],
+        include_data=not args.no_data,
+        repeat=args.repeat,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        rows = compare(_load(args.compare), report, args.threshold, args.min_delta_ms)
+        return 1 if print_comparison(rows) else 0
+    print_results(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Generador determinista de tracks GPX sintéticos para los benchmarks.
+
+Dos perfiles:
+  - "mountain": puertos largos con zigzags, puntos cada ~2.5 m, ritmo de bici,
+  - "city": cuadrícula de calles casi llana con ruido GPS, ritmo de carrera.
+
+La misma (n, perfil, semilla) produce siempre el mismo GPX byte a byte.
+"""
+
+import numpy as np
+import pandas as pd
+
+METERS_PER_DEG_LAT = 111_320.0
+PROFILES = ("mountain", "city")
+
+_ORIGINS = {"mountain": (42.90, 0.10, 700.0), "city": (41.38, 2.17, 20.0)}
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '1M' -> 1_000_000, '2500' -> 2500."""
+    text = text.strip()
+    factor = {"k": 1_000, "K": 1_000, "m": 1_000_000, "M": 1_000_000}.get(text[-1])
+    if factor:
+        return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def format_size(n: int) -> str:
+    if n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+def _mountain(n: int, rng):
+    step = rng.uniform(1.5, 3.5, n)
+    step[0] = 0.0
+    distance = np.cumsum(step)
+    # Zigzags: el rumbo oscila y deriva despacio
+    heading = 0.8 * np.sin(distance / 350.0) + np.cumsum(rng.normal(0, 0.01, n))
+    # Puertos de ~15 km más ondulaciones cortas y ruido barométrico
+    ele = (
+        600 * (1 - np.cos(distance / 15_000.0 * np.pi)) / 2
+        + 40 * np.sin(distance / 900.0)
+        + rng.normal(0, 0.3, n)
+    )
+    grade = np.gradient(ele, distance + np.arange(n) * 1e-6) * 100
+    speed = np.clip(9.0 - 0.6 * grade, 2.5, 18.0)  # m/s
+    return step, heading, ele, speed, 0.0
+
+
+def _city(n: int, rng):
+    step = rng.uniform(0.8, 1.5, n)
+    step[0] = 0.0
+    # Giros de 90° en cruces cada 80-250 m
+    turns = rng.random(n) < step / rng.uniform(80, 250)
+    heading = np.cumsum(turns * rng.choice([-np.pi / 2, np.pi / 2], n))
+    distance = np.cumsum(step)
+    ele = 15 * np.sin(distance / 2_500.0) + rng.normal(0, 0.5, n)
+    speed = np.full(n, 3.2) + rng.normal(0, 0.2, n)
+    return step, heading, ele, speed, 2.0
+
+
+def synthetic_track(n: int, profile: str = "mountain", seed: int = 0):
+    """DataFrame lat/lon/ele/time con `n` puntos del perfil pedido."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}")
+    rng = np.random.default_rng(seed)
+    step, heading, ele, speed, jitter_m = (
+        _mountain(n, rng) if profile == "mountain" else _city(n, rng)
+    )
+    lat0, lon0, ele0 = _ORIGINS[profile]
+
+    north = np.cumsum(step * np.cos(heading)) + rng.normal(0, jitter_m or 1e-9, n)
+    east = np.cumsum(step * np.sin(heading)) + rng.normal(0, jitter_m or 1e-9, n)
+    lat = lat0 + north / METERS_PER_DEG_LAT
+    lon = lon0 + east / (METERS_PER_DEG_LAT * np.cos(np.radians(lat0)))
+
+    seconds = np.cumsum(step / np.maximum(speed, 0.5))
+    time = pd.Timestamp("2024-06-01T08:00:00Z") + pd.to_timedelta(
+        np.round(seconds), unit="s"
+    )
+    return pd.DataFrame({"lat": lat, "lon": lon, "ele": ele0 + ele, "time": time})
+
+
+def to_gpx(track) -> bytes:
+    """Serializa un track como GPX 1.1 (un único <trkseg>)."""
+    times = track["time"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    points = "".join(
+        f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.2f}</ele>'
+        f"<time>{t}</time></trkpt>\n"
+        for lat, lon, ele, t in zip(track["lat"], track["lon"], track["ele"], times)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="GPX-Analyzer benchmarks" '
+        'xmlns="http://www.topografix.com/GPX/1/1">\n'
+        "<trk><name>synthetic</name><trkseg>\n"
+        f"{points}"
+        "</trkseg></trk>\n</gpx>\n"
+    ).encode()
+
+
+def synthetic_gpx(n: int, profile: str = "mountain", seed: int = 0) -> bytes:
+    return to_gpx(synthetic_track(n, profile, seed))
+
+
+def synthetic_buildings(track, n_buildings: int, seed: int = 0):
+    """Edificios repartidos al azar en el bbox del track (mitad sin altura)."""
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max = track["lat"].min(), track["lat"].max()
+    lon_min, lon_max = track["lon"].min(), track["lon"].max()
+    height = rng.uniform(5, 80, n_buildings)
+    height[rng.random(n_buildings) < 0.5] = np.nan
+    levels = rng.integers(0, 20, n_buildings).astype(float)
+    levels[rng.random(n_buildings) < 0.3] = np.nan
+    return pd.DataFrame(
+        {
+            "lat": rng.uniform(lat_min, lat_max, n_buildings),
+            "lon": rng.uniform(lon_min, lon_max, n_buildings),
+            "height": height,
+            "levels": levels,
+        }
+    )
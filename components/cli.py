@@ -0,0 +1,545 @@
+# components/cli.py
+"""
+Análisis por lotes sin interfaz: el mismo pipeline que la pestaña de subidas
+(parseo, estadísticas, detección y categoría) sobre muchos GPX en paralelo.
+
+    python -m components.cli analyze data/ otra_ruta.gpx -o resultados.jsonl
+    python -m components.cli analyze archivo/ --format parquet -o rutas.parquet
+    python -m components.cli live < posiciones.jsonl
+    python -m components.cli archive sync data/ && \
+        python -m components.cli archive query --min-gain 2000
+
+Cada fichero se procesa en un proceso del pool y su resultado se escribe en
+cuanto llega (una línea JSON o una fila Parquet por fichero). Un GPX roto no
+detiene el lote: su registro lleva el campo `error` y el proceso termina con
+código 1 si hubo algún fallo.
+
+`live` lee puntos en JSON Lines (`{"lat": .., "lon": .., "ele": .., "time": ..}`)
+de la entrada estándar, o reproduce un GPX con `--replay`, y escribe cada
+evento de subida/bajada según ocurre (ver `components.core.live`).
+
+`archive` mantiene y consulta el índice de actividades en SQLite (ver
+`components.core.archive`).
+
+`--dem DIR` (o GPX_DEM_DIR) corrige la altitud con teselas SRTM .hgt o
+GeoTIFF locales antes de calcular desnivel y subidas (ver `components.core.dem`).
+
+`analyze --save-tracks DIR` guarda cada track analizado (columnas, pendiente
+suavizada, estadísticas y segmentos) como `.gpxtrack` en DIR, con la misma ruta
+relativa que tenía dentro de las carpetas de entrada; `analyze` acepta esos
+ficheros como entrada y los reabre proyectados en memoria, sin parsear el XML
+(ver `components.core.track_file`):
+
+    python -m components.cli analyze data/ --save-tracks tracks/ -o a.jsonl
+    python -m components.cli analyze tracks/ -o b.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+from components.core.archive import ARCHIVE_PATH, ActivityArchive
+from components.core.climb_detector import (
+    DETECTION_PRESETS,
+    detect_significant_segments,
+)
+from components.core.dem import DEM_DIR, get_dem_source
+from components.core.gpx_parser import _read_track_arrays, parse_gpx
+from components.core.live import LiveTrackAnalyzer
+from components.core.range_stats import grade_range_stats
+from components.core.track_file import (
+    TRACK_FILE_SUFFIX,
+    load_track_file,
+    save_track_file,
+)
+from components.core.utils import smoothed_grade
+
+SEGMENT_FIELDS = (
+    "start_km",
+    "end_km",
+    "length_m",
+    "avg_slope",
+    "max_slope",
+    "min_slope",
+    "category",
+)
+PARQUET_BATCH_ROWS = 256
+
+
+def find_gpx_files(paths):
+    """Expande ficheros y directorios (recursivamente) a ficheros .gpx y .gpxtrack."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in names
+                    if name.lower().endswith((".gpx", TRACK_FILE_SUFFIX))
+                )
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def track_file_names(files):
+    """
+    Nombre de salida de cada fichero para `--save-tracks`: su ruta relativa a
+    la carpeta común de todos, sin extensión (`a/ruta.gpx` y `b/ruta.gpx`
+    quedan en `a/ruta` y `b/ruta`). Lanza ValueError si dos ficheros darían
+    el mismo nombre (p. ej. `ruta.gpx` y `ruta.gpxtrack`).
+    """
+    paths = [os.path.abspath(path) for path in files]
+    if not paths:
+        return []
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    names, seen = [], {}
+    for file, path in zip(files, paths):
+        name = os.path.splitext(os.path.relpath(path, root))[0]
+        other = seen.setdefault(os.path.normcase(name), file)
+        if other != file:
+            raise ValueError(f"{other} and {file} would both be saved as {name}")
+        names.append(name)
+    return names
+
+
+def _segment_records(seg_df, kind):
+    gain_col = "elev_gain" if kind == "climb" else "elev_loss"
+    columns = [*SEGMENT_FIELDS[:2], gain_col, *SEGMENT_FIELDS[2:]]
+    if seg_df.empty:
+        return []
+    return seg_df[columns].to_dict("records")
+
+
+def analyze_file(
+    path,
+    max_points_per_km: int = 20,
+    sensitivity: str = "Balanced",
+    dem_dir=None,
+    save_dir=None,
+    save_name=None,
+):
+    """
+    Analiza un GPX y devuelve un dict serializable. Nunca lanza: los errores se
+    devuelven en `error` para que un fichero no tumbe el lote entero. Con
+    `dem_dir` la altitud se corrige con las teselas DEM de ese directorio.
+
+    Un `.gpxtrack` se reabre tal cual se guardó (la reducción de puntos y el
+    DEM ya están aplicados) y sus segmentos se reutilizan si se detectaron con
+    la misma sensibilidad. Con `save_dir` el análisis se guarda en
+    `save_dir/<save_name>.gpxtrack` (por defecto, el nombre del fichero) y su
+    ruta va en `track_file`.
+    """
+    start = time.perf_counter()
+    record = {"file": path}
+    try:
+        segments = {}
+        if path.lower().endswith(TRACK_FILE_SUFFIX):
+            saved = load_track_file(path)
+            df, stats = saved["frame"], saved["stats"]
+            if saved["meta"].get("sensitivity") == sensitivity:
+                segments = saved["segments"]
+        else:
+            with open(path, "rb") as f:
+                gpx_content = f.read()
+            df, stats = parse_gpx(
+                gpx_content,
+                max_points_per_km=max_points_per_km,
+                dem=get_dem_source(dem_dir),
+            )
+        if df.empty:
+            raise ValueError("No track points found")
+
+        if "plot_grade" not in df.columns:
+            df["plot_grade"] = smoothed_grade(df)
+        params = DETECTION_PRESETS[sensitivity]
+
+        record["stats"] = stats
+        grade_index = None
+        for kind, key in (("climb", "climbs"), ("descent", "descents")):
+            if kind not in segments:
+                if grade_index is None:
+                    grade_index = grade_range_stats(df)
+                segments[kind] = detect_significant_segments(
+                    df, kind=kind, grade_index=grade_index, **params
+                )
+            record[key] = _segment_records(segments[kind], kind)
+
+        if save_dir:
+            name = save_name or os.path.splitext(os.path.basename(path))[0]
+            record["track_file"] = save_track_file(
+                os.path.join(save_dir, name + TRACK_FILE_SUFFIX),
+                df,
+                stats,
+                segments,
+                meta={
+                    "source": os.path.abspath(path),
+                    "max_points_per_km": max_points_per_km,
+                    "sensitivity": sensitivity,
+                    "dem_dir": dem_dir,
+                },
+            )
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_s"] = time.perf_counter() - start
+    return record
+
+
+def _analyze_job(job):
+    return analyze_file(*job)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _clean(value):
+    """NaN -> None para que la salida sea JSON estándar."""
+    if isinstance(value, (float, np.floating)) and math.isnan(value):
+        return None
+    return value
+
+
+def _flat_row(record):
+    """Fila plana para Parquet: estadísticas como columnas y segmentos como JSON."""
+    row = {"file": record["file"], "error": record.get("error")}
+    for name, value in (record.get("stats") or {}).items():
+        row[name] = _clean(value)
+    for key in ("climbs", "descents"):
+        segments = record.get(key)
+        row[f"num_{key}"] = None if segments is None else len(segments)
+        row[key] = (
+            None
+            if segments is None
+            else json.dumps(
+                [{k: _clean(v) for k, v in s.items()} for s in segments],
+                default=_json_default,
+            )
+        )
+    row["elapsed_s"] = record["elapsed_s"]
+    return row
+
+
+class JsonLinesWriter:
+    def __init__(self, stream) -> None:
+        self.stream = stream
+
+    def write(self, record) -> None:
+        record = dict(record)
+        if "stats" in record:
+            record["stats"] = {k: _clean(v) for k, v in record["stats"].items()}
+        for key in ("climbs", "descents"):
+            if key in record:
+                record[key] = [
+                    {k: _clean(v) for k, v in s.items()} for s in record[key]
+                ]
+        self.write_event(record)
+
+    def write_event(self, event) -> None:
+        event = {k: _clean(v) for k, v in event.items()}
+        if "stats" in event:
+            event["stats"] = {k: _clean(v) for k, v in event["stats"].items()}
+        self.stream.write(json.dumps(event, default=_json_default) + "\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+class ParquetWriter:
+    """Escribe por lotes de filas con un esquema fijo derivado de compute_gpx_stats."""
+
+    def __init__(self, path) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow") from None
+
+        from components.core.stats import STATS_FIELDS
+
+        self._pa = pa
+        fields = [pa.field("file", pa.string()), pa.field("error", pa.string())]
+        fields += [pa.field(name, pa.float64()) for name in STATS_FIELDS]
+        for key in ("climbs", "descents"):
+            fields += [pa.field(f"num_{key}", pa.int64()), pa.field(key, pa.string())]
+        fields.append(pa.field("elapsed_s", pa.float64()))
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(path, self.schema)
+        self._rows = []
+
+    def write(self, record) -> None:
+        self._rows.append(_flat_row(record))
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            table = self._pa.Table.from_pylist(self._rows, schema=self.schema)
+            self._writer.write_table(table)
+            self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def _open_writer(output, fmt):
+    if fmt == "parquet":
+        if output in (None, "-"):
+            raise SystemExit("--format parquet needs an output file (-o)")
+        return ParquetWriter(output)
+    if output in (None, "-"):
+        return JsonLinesWriter(sys.stdout)
+    return JsonLinesWriter(open(output, "w", encoding="utf-8"))
+
+
+def run_batch(
+    files,
+    writer,
+    workers=None,
+    max_points_per_km: int = 20,
+    sensitivity: str = "Balanced",
+    progress=None,
+    dem_dir=None,
+    save_dir=None,
+) -> int:
+    """
+    Procesa `files` con un pool de `workers` procesos y pasa cada resultado a
+    `writer` según va llegando. Devuelve el número de ficheros con error. Con
+    `save_dir`, los nombres de salida salen de `track_file_names` (ValueError
+    antes de empezar si dos ficheros chocan).
+    """
+    names = track_file_names(files) if save_dir else [None] * len(files)
+    jobs = [
+        (path, max_points_per_km, sensitivity, dem_dir, save_dir, name)
+        for path, name in zip(files, names)
+    ]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    # Lotes pequeños para repartir bien rutas de tamaños muy distintos
+    chunksize = max(1, len(jobs) // (workers * 8))
+
+    start = time.perf_counter()
+    failed = 0
+    if workers == 1:
+        results = map(_analyze_job, jobs)
+        pool = None
+    else:
+        pool = get_context("spawn").Pool(workers)
+        results = pool.imap_unordered(_analyze_job, jobs, chunksize=chunksize)
+    try:
+        for done, record in enumerate(results, start=1):
+            writer.write(record)
+            if "error" in record:
+                failed += 1
+            if progress is not None:
+                progress(done, len(jobs), record, time.perf_counter() - start)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+
+def _print_progress(done, total, record, elapsed) -> None:
+    status = "error: " + record["error"] if "error" in record else "ok"
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(
+        f"[{done}/{total}] {record['file']} {status} "
+        f"({record['elapsed_s']:.2f} s, {rate:.1f} files/s)",
+        file=sys.stderr,
+    )
+
+
+def _feed_points(stream):
+    for line in stream:
+        if line.strip():
+            point = json.loads(line)
+            yield point["lat"], point["lon"], point["ele"], point.get("time")
+
+
+def _replay_points(path):
+    with open(path, "rb") as f:
+        lat, lon, ele, times = _read_track_arrays(f.read())
+    for k in range(len(lat)):
+        yield lat[k], lon[k], ele[k], times[k]
+
+
+def run_live(points, writer, sensitivity: str = "Balanced") -> None:
+    """Alimenta el analizador en directo y escribe sus eventos según salen."""
+    analyzer = LiveTrackAnalyzer(**DETECTION_PRESETS[sensitivity])
+    for point in points:
+        for event in analyzer.append(*point):
+            writer.write_event(event)
+    for event in analyzer.finish():
+        writer.write_event(event)
+    if len(analyzer):
+        writer.write_event({"event": "finished", "stats": analyzer.stats()})
+
+
+def _parse_bbox(text):
+    values = [float(v) for v in text.split(",")]
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError("bbox must be min_lat,min_lon,max_lat,max_lon")
+    return tuple(values)
+
+
+def _run_archive(args) -> int:
+    archive = ActivityArchive(
+        args.db,
+        max_points_per_km=args.max_points_per_km,
+        sensitivity=args.sensitivity,
+        dem_dir=args.dem,
+    )
+    if args.archive_command == "sync":
+        files = find_gpx_files(args.paths)
+
+        def progress(done, total, path, error):
+            if not args.quiet:
+                status = "error: " + error if error else "ok"
+                print(f"[{done}/{total}] {path} {status}", file=sys.stderr)
+
+        counts = archive.sync(files, workers=args.workers, progress=progress)
+        print(
+            ", ".join(f"{count} {name}" for name, count in counts.items()),
+            file=sys.stderr,
+        )
+        return 1 if counts["failed"] else 0
+
+    result = archive.query(
+        min_gain=args.min_gain,
+        max_gain=args.max_gain,
+        min_distance_km=args.min_km,
+        max_distance_km=args.max_km,
+        bbox=args.bbox,
+        categories=args.category,
+        order_by=args.order_by,
+    )
+    if args.fmt == "jsonl":
+        writer = JsonLinesWriter(sys.stdout)
+        for record in result.to_dict("records"):
+            writer.write_event(record)
+    else:
+        columns = [
+            "name",
+            "total_distance_km",
+            "elevation_gain",
+            "num_climbs",
+            "start_time",
+        ]
+        print(result[columns].to_string(index=False, float_format="{:.1f}".format))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Headless GPX batch analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+    analyze = sub.add_parser("analyze", help="Analyze GPX files and directories")
+    analyze.add_argument("paths", nargs="+", help="GPX files or directories")
+    analyze.add_argument("-o", "--output", help="Output file (default: stdout)")
+    analyze.add_argument(
+        "--format", choices=["jsonl", "parquet"], default="jsonl", dest="fmt"
+    )
+    analyze.add_argument(
+        "-j", "--workers", type=int, default=None, help="Processes (default: CPUs)"
+    )
+    analyze.add_argument("--max-points-per-km", type=int, default=20)
+    analyze.add_argument(
+        "--sensitivity", choices=list(DETECTION_PRESETS), default="Balanced"
+    )
+    analyze.add_argument("-q", "--quiet", action="store_true", help="No progress")
+    analyze.add_argument("--dem", default=DEM_DIR, help="DEM tiles (.hgt/GeoTIFF)")
+    analyze.add_argument(
+        "--save-tracks", metavar="DIR", help="Save each analysed track as .gpxtrack"
+    )
+
+    live = sub.add_parser("live", help="Stream climb events from appended points")
+    live.add_argument("--replay", help="Feed the points of a GPX file")
+    live.add_argument("-o", "--output", help="Output file (default: stdout)")
+    live.add_argument(
+        "--sensitivity", choices=list(DETECTION_PRESETS), default="Balanced"
+    )
+
+    archive = sub.add_parser("archive", help="Activity index (SQLite)")
+    archive.add_argument("--db", default=ARCHIVE_PATH, help="Index file")
+    archive.add_argument("--max-points-per-km", type=int, default=20)
+    archive.add_argument("--dem", default=DEM_DIR, help="DEM tiles (.hgt/GeoTIFF)")
+    archive.add_argument(
+        "--sensitivity", choices=list(DETECTION_PRESETS), default="Balanced"
+    )
+    archive_sub = archive.add_subparsers(dest="archive_command", required=True)
+    sync = archive_sub.add_parser("sync", help="Index new and changed GPX files")
+    sync.add_argument("paths", nargs="+", help="GPX files or directories")
+    sync.add_argument("-j", "--workers", type=int, default=1, help="Processes")
+    sync.add_argument("-q", "--quiet", action="store_true", help="No progress")
+    query = archive_sub.add_parser("query", help="Search indexed activities")
+    query.add_argument("--min-gain", type=float, help="Minimum elevation gain (m)")
+    query.add_argument("--max-gain", type=float, help="Maximum elevation gain (m)")
+    query.add_argument("--min-km", type=float, help="Minimum distance (km)")
+    query.add_argument("--max-km", type=float, help="Maximum distance (km)")
+    query.add_argument(
+        "--bbox", type=_parse_bbox, help="min_lat,min_lon,max_lat,max_lon"
+    )
+    query.add_argument(
+        "--category", action="append", help="Has a climb of this category"
+    )
+    query.add_argument("--order-by", default="name")
+    query.add_argument(
+        "--format", choices=["table", "jsonl"], default="table", dest="fmt"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "archive":
+        return _run_archive(args)
+
+    if args.command == "live":
+        points = _replay_points(args.replay) if args.replay else _feed_points(sys.stdin)
+        writer = _open_writer(args.output, "jsonl")
+        try:
+            run_live(points, writer, sensitivity=args.sensitivity)
+        finally:
+            writer.close()
+        return 0
+
+    files = find_gpx_files(args.paths)
+    if not files:
+        print("No GPX files found", file=sys.stderr)
+        return 1
+
+    if args.save_tracks:
+        try:
+            track_file_names(files)
+        except ValueError as e:
+            print(f"--save-tracks: {e}", file=sys.stderr)
+            return 2
+
+    writer = _open_writer(args.output, args.fmt)
+    try:
+        failed = run_batch(
+            files,
+            writer,
+            workers=args.workers,
+            max_points_per_km=args.max_points_per_km,
+            sensitivity=args.sensitivity,
+            progress=None if args.quiet else _print_progress,
+            dem_dir=args.dem,
+            save_dir=args.save_tracks,
+        )
+    finally:
+        writer.close()
+
+    print(f"{len(files) - failed}/{len(files)} files analyzed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
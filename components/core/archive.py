@@ -0,0 +1,509 @@
+# components/core/archive.py
+"""
+Archivo persistente de actividades: un índice SQLite con el resumen de cada GPX.
+
+Por fichero se guarda el hash del contenido, la salida de `compute_gpx_stats`,
+las subidas y bajadas detectadas, la caja envolvente y una geometría
+simplificada (lat/lon float32 en un BLOB). Las consultas ("rutas con más de
+2000 m de desnivel", "actividades que cruzan esta caja") se resuelven en SQL,
+con un índice R*Tree para las cajas si SQLite lo trae, sin abrir ningún GPX.
+
+`sync()` es incremental: un fichero cuyo tamaño y fecha no han cambiado no se
+lee; si han cambiado pero el hash es el mismo, solo se actualiza la fecha.
+
+    python -m components.cli archive sync data/
+    python -m components.cli archive query --min-gain 2000
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from .cache import content_key
+from .climb_detector import DETECTION_PRESETS, detect_significant_segments
+from .dem import DEM_DIR, get_dem_source
+from .gpx_parser import parse_gpx
+from .range_stats import grade_range_stats
+from .simplify import simplify_indices
+from .stats import STATS_FIELDS
+from .utils import smoothed_grade
+
+ARCHIVE_VERSION = 1
+ARCHIVE_PATH = os.environ.get(
+    "GPX_ARCHIVE_DB", os.path.join("data", "activities.sqlite")
+)
+GEOMETRY_MAX_POINTS = 256
+SEGMENT_COLUMNS = (
+    "kind",
+    "start_km",
+    "end_km",
+    "gain",
+    "length_m",
+    "avg_slope",
+    "max_slope",
+    "min_slope",
+    "category",
+)
+SUMMARY_COLUMNS = (
+    "id",
+    "path",
+    "name",
+    "start_time",
+    *STATS_FIELDS,
+    "num_climbs",
+    "num_descents",
+    "min_lat",
+    "min_lon",
+    "max_lat",
+    "max_lon",
+    "error",
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    error TEXT,
+    start_time TEXT,
+    {", ".join(f"{name} REAL" for name in STATS_FIELDS)},
+    num_climbs INTEGER,
+    num_descents INTEGER,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL,
+    geometry BLOB
+);
+CREATE INDEX IF NOT EXISTS activities_gain ON activities (elevation_gain);
+CREATE INDEX IF NOT EXISTS activities_distance ON activities (total_distance_km);
+CREATE TABLE IF NOT EXISTS segments (
+    activity_id INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    start_km REAL,
+    end_km REAL,
+    gain REAL,
+    length_m REAL,
+    avg_slope REAL,
+    max_slope REAL,
+    min_slope REAL,
+    category TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_activity ON segments (activity_id);
+"""
+
+
+def summarize_gpx(
+    gpx_content, max_points_per_km: int = 20, sensitivity="Balanced", dem_dir=None
+):
+    """
+    Resumen indexable de un GPX: estadísticas, segmentos, caja envolvente,
+    hora de inicio y geometría simplificada.
+    """
+    df, stats = parse_gpx(
+        gpx_content, max_points_per_km=max_points_per_km, dem=get_dem_source(dem_dir)
+    )
+    if df.empty:
+        raise ValueError("No track points found")
+
+    df["plot_grade"] = smoothed_grade(df)
+    grade_index = grade_range_stats(df)
+    params = DETECTION_PRESETS[sensitivity]
+    segments = []
+    counts = {}
+    for kind in ("climb", "descent"):
+        seg_df = detect_significant_segments(
+            df, kind=kind, grade_index=grade_index, **params
+        )
+        counts[kind] = len(seg_df)
+        if seg_df.empty:
+            continue
+        seg_df = seg_df.rename(columns={"elev_gain": "gain", "elev_loss": "gain"})
+        seg_df["kind"] = kind
+        segments += seg_df[list(SEGMENT_COLUMNS)].to_dict("records")
+
+    lat = df["lat"].to_numpy(dtype=np.float64)
+    lon = df["lon"].to_numpy(dtype=np.float64)
+    keep = simplify_indices(df, max_points=GEOMETRY_MAX_POINTS, space="horizontal")
+    geometry = np.column_stack((lat[keep], lon[keep])).astype(np.float32)
+    times = df["time"].dropna()
+
+    return {
+        "stats": stats,
+        "segments": segments,
+        "num_climbs": counts["climb"],
+        "num_descents": counts["descent"],
+        "bbox": (
+            float(np.nanmin(lat)),
+            float(np.nanmin(lon)),
+            float(np.nanmax(lat)),
+            float(np.nanmax(lon)),
+        ),
+        "start_time": times.iloc[0].isoformat() if len(times) else None,
+        "geometry": geometry.tobytes(),
+    }
+
+
+def _summarize_job(job):
+    """Trabajo del pool: (path, hash, params) -> (path, hash, resumen, error)."""
+    path, digest, max_points_per_km, sensitivity, dem_dir = job
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        return (
+            path,
+            digest,
+            summarize_gpx(content, max_points_per_km, sensitivity, dem_dir),
+            None,
+        )
+    except Exception as e:
+        return path, digest, None, f"{type(e).__name__}: {e}"
+
+
+def _sql_value(value):
+    """NaN -> NULL y escalares de numpy -> Python para sqlite3."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class ActivityArchive:
+    """
+    Índice de actividades en un fichero SQLite. Cada operación abre su propia
+    conexión, así que el objeto se puede compartir entre hilos (sesiones de
+    Streamlit); las escrituras las serializa el propio SQLite.
+    """
+
+    def __init__(
+        self,
+        path=ARCHIVE_PATH,
+        max_points_per_km: int = 20,
+        sensitivity: str = "Balanced",
+        dem_dir=DEM_DIR,
+    ) -> None:
+        self.path = path
+        self.max_points_per_km = max_points_per_km
+        self.sensitivity = sensitivity
+        self.dem_dir = os.path.abspath(dem_dir) if dem_dir else None
+        self.params = f"max_points_per_km={max_points_per_km};sensitivity={sensitivity}"
+        # Cambiar de DEM vuelve a resumir todo; sin DEM la clave no cambia
+        if self.dem_dir:
+            self.params += f";dem={self.dem_dir}"
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.has_rtree = self._create_schema()
+        self._sync_lock = threading.Lock()
+        self._sync_pool = None
+        self._sync_future = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _create_schema(self) -> bool:
+        with closing(self._connect()) as conn, conn:
+            version = None
+            if conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'"
+            ).fetchone():
+                row = conn.execute(
+                    "SELECT value FROM meta WHERE key = 'version'"
+                ).fetchone()
+                version = row and int(row[0])
+            if version not in (None, ARCHIVE_VERSION):
+                # Es un índice derivado de los GPX: con otro formato se rehace
+                for table in ("activity_bbox", "segments", "activities", "meta"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+            conn.executescript(_SCHEMA)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                (str(ARCHIVE_VERSION),),
+            )
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS activity_bbox "
+                    "USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+                )
+                return True
+            except sqlite3.OperationalError:
+                # SQLite sin el módulo R*Tree: la caja se filtra por columnas
+                return False
+
+    # ───────────────────────── Actualización
+
+    def sync(self, files, workers: int = 1, progress=None) -> dict:
+        """
+        Pone el índice al día con `files` y elimina las actividades cuyo
+        fichero ya no existe. Devuelve cuántos ficheros se han añadido,
+        actualizado, dejado igual, eliminado o han fallado.
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        with closing(self._connect()) as conn:
+            known = {
+                row[0]: row[1:]
+                for row in conn.execute(
+                    "SELECT path, size, mtime_ns, content_hash, params FROM activities"
+                )
+            }
+
+        jobs, touched = [], []
+        for path in files:
+            path = os.path.abspath(path)
+            st = os.stat(path)
+            previous = known.get(path)
+            if (
+                previous
+                and previous[:2] == (st.st_size, st.st_mtime_ns)
+                and previous[3] == self.params
+            ):
+                counts["unchanged"] += 1
+                continue
+            with open(path, "rb") as f:
+                digest = content_key(f.read())
+            if previous and previous[2] == digest and previous[3] == self.params:
+                touched.append((st.st_size, st.st_mtime_ns, path))
+                counts["unchanged"] += 1
+                continue
+            counts["updated" if previous else "added"] += 1
+            jobs.append(
+                (path, digest, self.max_points_per_km, self.sensitivity, self.dem_dir)
+            )
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE activities SET size = ?, mtime_ns = ? WHERE path = ?", touched
+            )
+            missing = [p for p in known if not os.path.exists(p)]
+            for path in missing:
+                self._delete(conn, path)
+            counts["removed"] = len(missing)
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+        pool = get_context("spawn").Pool(workers) if workers > 1 else None
+        results = (
+            pool.imap_unordered(_summarize_job, jobs)
+            if pool is not None
+            else map(_summarize_job, jobs)
+        )
+        try:
+            for done, (path, digest, summary, error) in enumerate(results, start=1):
+                with closing(self._connect()) as conn, conn:
+                    self._store(conn, path, digest, summary, error)
+                if error:
+                    counts["failed"] += 1
+                if progress is not None:
+                    progress(done, len(jobs), path, error)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return counts
+
+    def sync_in_background(self, files):
+        """
+        `sync(files)` en un hilo aparte, para no bloquear a quien llama (p. ej.
+        el primer render de la app). Si ya hay una sincronización en curso se
+        devuelve esa. Devuelve un Future con los recuentos de `sync`.
+        """
+        with self._sync_lock:
+            if self._sync_future is None or self._sync_future.done():
+                if self._sync_pool is None:
+                    self._sync_pool = ThreadPoolExecutor(
+                        1, thread_name_prefix="archive-sync"
+                    )
+                self._sync_future = self._sync_pool.submit(self.sync, list(files))
+            return self._sync_future
+
+    def _delete(self, conn, path) -> None:
+        row = conn.execute(
+            "SELECT id FROM activities WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return
+        if self.has_rtree:
+            conn.execute("DELETE FROM activity_bbox WHERE id = ?", row)
+        conn.execute("DELETE FROM activities WHERE id = ?", row)
+
+    def _store(self, conn, path, digest, summary, error) -> None:
+        """Sustituye la fila de `path` por el resumen nuevo (o por el error)."""
+        self._delete(conn, path)
+        st = os.stat(path)
+        record = {
+            "path": path,
+            "name": os.path.basename(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "content_hash": digest,
+            "params": self.params,
+            "indexed_at": time.time(),
+            "error": error,
+        }
+        if summary is not None:
+            record.update(summary["stats"])
+            record["start_time"] = summary["start_time"]
+            record["num_climbs"] = summary["num_climbs"]
+            record["num_descents"] = summary["num_descents"]
+            record.update(
+                zip(("min_lat", "min_lon", "max_lat", "max_lon"), summary["bbox"])
+            )
+            record["geometry"] = summary["geometry"]
+
+        columns = ", ".join(record)
+        placeholders = ", ".join("?" * len(record))
+        cursor = conn.execute(
+            f"INSERT INTO activities ({columns}) VALUES ({placeholders})",
+            [_sql_value(v) for v in record.values()],
+        )
+        activity_id = cursor.lastrowid
+        if summary is None:
+            return
+
+        conn.executemany(
+            f"INSERT INTO segments (activity_id, {', '.join(SEGMENT_COLUMNS)}) "
+            f"VALUES (?{', ?' * len(SEGMENT_COLUMNS)})",
+            [
+                [activity_id, *(_sql_value(s[c]) for c in SEGMENT_COLUMNS)]
+                for s in summary["segments"]
+            ],
+        )
+        if self.has_rtree:
+            min_lat, min_lon, max_lat, max_lon = summary["bbox"]
+            conn.execute(
+                "INSERT INTO activity_bbox VALUES (?, ?, ?, ?, ?)",
+                (activity_id, min_lat, max_lat, min_lon, max_lon),
+            )
+
+    # ───────────────────────── Consultas
+
+    def query(
+        self,
+        min_gain=None,
+        max_gain=None,
+        min_distance_km=None,
+        max_distance_km=None,
+        bbox=None,
+        categories=None,
+        order_by: str = "name",
+    ):
+        """
+        Actividades (sin errores) que cumplen todos los filtros, como DataFrame
+        con `SUMMARY_COLUMNS`. `bbox` es (min_lat, min_lon, max_lat, max_lon) y
+        selecciona las actividades cuya caja la corta; `categories` las que
+        tienen alguna subida de esas categorías.
+        """
+        if order_by not in SUMMARY_COLUMNS:
+            raise ValueError(f"Cannot order by {order_by!r}")
+
+        where, args = ["a.error IS NULL"], []
+        for column, op, value in (
+            ("elevation_gain", ">=", min_gain),
+            ("elevation_gain", "<=", max_gain),
+            ("total_distance_km", ">=", min_distance_km),
+            ("total_distance_km", "<=", max_distance_km),
+        ):
+            if value is not None:
+                where.append(f"a.{column} {op} ?")
+                args.append(value)
+
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            overlap = "max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?"
+            if self.has_rtree:
+                where.append(f"a.id IN (SELECT id FROM activity_bbox WHERE {overlap})")
+            else:
+                where.append(" AND ".join(f"a.{c}" for c in overlap.split(" AND ")))
+            args += [min_lat, max_lat, min_lon, max_lon]
+
+        if categories:
+            where.append(
+                "EXISTS (SELECT 1 FROM segments s WHERE s.activity_id = a.id "
+                "AND s.kind = 'climb' "
+                f"AND s.category IN ({', '.join('?' * len(categories))}))"
+            )
+            args += list(categories)
+
+        columns = ", ".join(f"a.{c}" for c in SUMMARY_COLUMNS)
+        sql = (
+            f"SELECT {columns} FROM activities a WHERE {' AND '.join(where)} "
+            f"ORDER BY a.{order_by}"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=args)
+
+    def summary(self, path):
+        """Fila del índice para `path` (dict) o None si no está indexado."""
+        columns = ", ".join(SUMMARY_COLUMNS)
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT {columns} FROM activities WHERE path = ?",
+                (os.path.abspath(path),),
+            ).fetchone()
+        return None if row is None else dict(zip(SUMMARY_COLUMNS, row))
+
+    def segments(self, path, kind=None):
+        """Subidas y bajadas guardadas de `path`."""
+        sql = (
+            f"SELECT {', '.join('s.' + c for c in SEGMENT_COLUMNS)} FROM segments s "
+            "JOIN activities a ON a.id = s.activity_id WHERE a.path = ?"
+        )
+        args = [os.path.abspath(path)]
+        if kind is not None:
+            sql += " AND s.kind = ?"
+            args.append(kind)
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql + " ORDER BY s.rowid", conn, params=args)
+
+    def geometry(self, path):
+        """Geometría simplificada de `path` como array (n, 2) de lat/lon."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT geometry FROM activities WHERE path = ?",
+                (os.path.abspath(path),),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).reshape(-1, 2)
+
+    def info(self) -> dict:
+        with closing(self._connect()) as conn:
+            activities, failed = conn.execute(
+                "SELECT COUNT(*), COUNT(error) FROM activities"
+            ).fetchone()
+            segments = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {
+            "activities": activities,
+            "failed": failed,
+            "segments": segments,
+            "rtree": self.has_rtree,
+            "bytes": os.path.getsize(self.path),
+        }
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def get_activity_archive(path=ARCHIVE_PATH) -> ActivityArchive:
+    """Archivo compartido por proceso para `path` (con los parámetros por defecto)."""
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None:
+            archive = _archives[path] = ActivityArchive(path)
+        return archive
@@ -0,0 +1,339 @@
+# components/core/building_store.py
+"""
+Índice local de edificios, particionado en teselas geográficas fijas.
+
+Se construye una vez a partir de un extracto de OSM (GeoJSON, p. ej. la salida
+de `osmium export`, o un volcado JSON de Overpass con `out center`) y se guarda
+en disco como un `.npy` sin comprimir por tesela con columnas
+lat/lon/height/levels, que se abre proyectado en memoria. Al analizar una ruta
+solo se cargan las teselas que toca, cada una con su propio BallTree, y se
+mantienen en una LRU acotada para reutilizarlas entre rutas.
+
+Cada construcción escribe sus teselas en un directorio nuevo (`tiles-*`) y
+luego sustituye `index.json`, así que reconstruir sobre un índice existente
+no deja teselas viejas y quien tenga abierto el anterior lo sigue leyendo.
+
+    python -m components.core.building_store build extract.geojson data/buildings
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .gps_risk import EARTH_RADIUS_M, flatten_neighbours
+
+STORE_VERSION = 2
+DEFAULT_TILE_DEG = 0.02
+DEFAULT_MAX_TILES = 64
+INDEX_FILE = "index.json"
+TILES_PREFIX = "tiles-"
+TILE_DTYPE = np.dtype(
+    [("dlat", "<f4"), ("dlon", "<f4"), ("height", "<f4"), ("levels", "<f4")]
+)
+# Teselas sueltas de la versión 1 (`<i>_<j>.npz` en la raíz)
+_V1_TILE = re.compile(r"-?\d+_-?\d+\.npz")
+
+
+def _tile_key(i: int, j: int) -> str:
+    return f"{i}_{j}"
+
+
+def _parse_number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _feature_center(geometry):
+    """Centro aproximado (media de vértices del anillo exterior) de una geometría."""
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates")
+    if not coords:
+        return None
+    if kind == "Point":
+        ring = [coords]
+    elif kind == "Polygon":
+        ring = coords[0]
+    elif kind == "MultiPolygon":
+        ring = coords[0][0]
+    else:
+        return None
+    ring = np.asarray(ring, dtype=np.float64)
+    return ring[:, 1].mean(), ring[:, 0].mean()
+
+
+def read_buildings_extract(path):
+    """Lee un GeoJSON o un volcado de Overpass y devuelve un DataFrame de edificios."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    rows = []
+    if "elements" in raw:
+        for el in raw["elements"]:
+            lat = el.get("lat") or el.get("center", {}).get("lat")
+            lon = el.get("lon") or el.get("center", {}).get("lon")
+            if lat is None or lon is None:
+                continue
+            rows.append((lat, lon, el.get("tags", {})))
+    else:
+        for feature in raw.get("features", []):
+            center = _feature_center(feature.get("geometry") or {})
+            if center is None:
+                continue
+            rows.append((*center, feature.get("properties") or {}))
+
+    return pd.DataFrame(
+        {
+            "lat": [r[0] for r in rows],
+            "lon": [r[1] for r in rows],
+            "height": [_parse_number(r[2].get("height")) for r in rows],
+            "levels": [_parse_number(r[2].get("building:levels"), int) for r in rows],
+        },
+        columns=["lat", "lon", "height", "levels"],
+    )
+
+
+def route_tiles(lats, lons, tile_deg: float, radius: int = 10):
+    """
+    Teselas de `tile_deg` grados (rejilla fija) que toca cada punto ampliado en
+    `radius` metros. Devuelve {(i, j): índices de los puntos que la tocan}.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    margin_lat = np.degrees(radius / EARTH_RADIUS_M)
+    margin_lon = margin_lat / np.maximum(np.cos(np.radians(lats)), 1e-6)
+
+    point_ids, keys = [], []
+    for d_lat in (-margin_lat, margin_lat):
+        for sign in (-1, 1):
+            ti = np.floor((lats + d_lat) / tile_deg).astype(np.int64)
+            tj = np.floor((lons + sign * margin_lon) / tile_deg).astype(np.int64)
+            point_ids.append(np.arange(len(lats)))
+            keys.append(np.column_stack((ti, tj)))
+
+    point_ids = np.concatenate(point_ids)
+    keys = np.concatenate(keys)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    order = np.argsort(inverse, kind="stable")
+    splits = np.cumsum(np.bincount(inverse, minlength=len(unique_keys)))[:-1]
+    return {
+        (int(i), int(j)): np.unique(ids)
+        for (i, j), ids in zip(unique_keys, np.split(point_ids[order], splits))
+    }
+
+
+def build_store(buildings_df, root, tile_deg: float = DEFAULT_TILE_DEG) -> dict:
+    """
+    Reparte los edificios en teselas de `tile_deg` grados y las escribe en
+    `root`. Las coordenadas se guardan como desplazamiento float32 respecto a la
+    esquina SO de la tesela (precisión submétrica con la mitad de espacio).
+    Sustituye lo que hubiera de una construcción anterior.
+    """
+    os.makedirs(root, exist_ok=True)
+    lat = buildings_df["lat"].to_numpy(dtype=np.float64)
+    lon = buildings_df["lon"].to_numpy(dtype=np.float64)
+    ti = np.floor(lat / tile_deg).astype(np.int64)
+    tj = np.floor(lon / tile_deg).astype(np.int64)
+
+    order = np.lexsort((tj, ti))
+    keys = np.column_stack((ti[order], tj[order]))
+    bounds = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+    starts = np.concatenate(([0], bounds)) if len(order) else np.zeros(0, int)
+    ends = np.concatenate((bounds, [len(order)]))
+
+    height = buildings_df["height"].to_numpy(dtype=np.float32)
+    levels = buildings_df["levels"].to_numpy(dtype=np.float32)
+    tiles_dir = tempfile.mkdtemp(prefix=TILES_PREFIX, dir=root)
+    tiles = {}
+    for start, end in zip(starts, ends):
+        rows = order[start:end]
+        i, j = int(ti[rows[0]]), int(tj[rows[0]])
+        records = np.empty(len(rows), dtype=TILE_DTYPE)
+        records["dlat"] = lat[rows] - i * tile_deg
+        records["dlon"] = lon[rows] - j * tile_deg
+        records["height"] = height[rows]
+        records["levels"] = levels[rows]
+        np.save(os.path.join(tiles_dir, _tile_key(i, j) + ".npy"), records)
+        tiles[_tile_key(i, j)] = int(end - start)
+
+    index = {
+        "version": STORE_VERSION,
+        "tile_deg": tile_deg,
+        "tiles_dir": os.path.basename(tiles_dir),
+        "tiles": tiles,
+    }
+    tmp_path = os.path.join(root, INDEX_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(root, INDEX_FILE))
+
+    # Construcciones anteriores: solo lo que escribe este módulo
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(TILES_PREFIX) and name != index["tiles_dir"]:
+            shutil.rmtree(path, ignore_errors=True)
+        elif _V1_TILE.fullmatch(name):
+            os.remove(path)
+    return index
+
+
+class BuildingTileStore:
+    """
+    Acceso perezoso a un índice de edificios en disco. Las teselas cargadas
+    (DataFrame + BallTree) se comparten entre rutas y se expulsan por LRU a
+    partir de `max_tiles`.
+    """
+
+    def __init__(self, root, max_tiles: int = DEFAULT_MAX_TILES) -> None:
+        with open(os.path.join(root, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(
+                f"Unsupported building store version in {root}; rebuild it with "
+                "`python -m components.core.building_store build`"
+            )
+
+        self.root = root
+        self.tiles_dir = os.path.join(root, index["tiles_dir"])
+        self.tile_deg = index["tile_deg"]
+        self.tiles = index["tiles"]
+        self.max_tiles = max_tiles
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.tile_loads = 0
+
+    def _load_tile(self, key: str):
+        with self._lock:
+            tile = self._loaded.get(key)
+            if tile is not None:
+                self._loaded.move_to_end(key)
+                return tile
+
+        i, j = (int(v) for v in key.split("_"))
+        data = np.load(os.path.join(self.tiles_dir, key + ".npy"), mmap_mode="r")
+        buildings = pd.DataFrame(
+            {
+                "lat": data["dlat"].astype(np.float64) + i * self.tile_deg,
+                "lon": data["dlon"].astype(np.float64) + j * self.tile_deg,
+                "height": data["height"].astype(np.float64),
+                "levels": data["levels"].astype(np.float64),
+            }
+        )
+        from sklearn.neighbors import BallTree  # importación lenta, ver gps_risk
+
+        tree = BallTree(
+            np.radians(buildings[["lat", "lon"]].to_numpy()), metric="haversine"
+        )
+        tile = (buildings, tree)
+
+        with self._lock:
+            self._loaded[key] = tile
+            self.tile_loads += 1
+            while len(self._loaded) > self.max_tiles:
+                self._loaded.popitem(last=False)
+        return tile
+
+    def tiles_for_points(self, lats, lons, radius: int = 10):
+        """
+        Teselas existentes que tocan cada punto ampliado en `radius` metros.
+        Devuelve {tesela: índices de los puntos que la tocan}.
+        """
+        return {
+            _tile_key(i, j): ids
+            for (i, j), ids in route_tiles(lats, lons, self.tile_deg, radius).items()
+            if _tile_key(i, j) in self.tiles
+        }
+
+    def buildings_near(self, lats, lons, radius: int = 10, progress=None):
+        """
+        Edificios de las teselas que toca la ruta y pares (punto, edificio) a
+        menos de `radius` metros. Devuelve (buildings_df, point_idx,
+        building_idx), con `building_idx` referido a las filas de buildings_df.
+        `progress(hechas, total)` se llama tras cada tesela.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        points_rad = np.radians(np.column_stack((lats, lons)))
+
+        frames, point_parts, building_parts = [], [], []
+        offset = 0
+        tiles = self.tiles_for_points(lats, lons, radius)
+        for done, (key, point_ids) in enumerate(tiles.items(), start=1):
+            buildings, tree = self._load_tile(key)
+            neighbours = tree.query_radius(
+                points_rad[point_ids], r=radius / EARTH_RADIUS_M
+            )
+            local_points, local_buildings = flatten_neighbours(neighbours)
+            frames.append(buildings)
+            point_parts.append(point_ids[local_points])
+            building_parts.append(local_buildings + offset)
+            offset += len(buildings)
+            if progress is not None:
+                progress(done, len(tiles))
+
+        if not frames:
+            empty = np.zeros(0, dtype=np.int64)
+            return (
+                pd.DataFrame(columns=["lat", "lon", "height", "levels"]),
+                empty,
+                empty,
+            )
+
+        return (
+            pd.concat(frames, ignore_index=True),
+            np.concatenate(point_parts),
+            np.concatenate(building_parts),
+        )
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "tiles_on_disk": len(self.tiles),
+                "tiles_loaded": len(self._loaded),
+                "max_tiles": self.max_tiles,
+                "tile_loads": self.tile_loads,
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_building_store(root, max_tiles: int = DEFAULT_MAX_TILES):
+    """Store compartido por proceso para `root`, o None si no hay índice."""
+    if not root or not os.path.isfile(os.path.join(root, INDEX_FILE)):
+        return None
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = BuildingTileStore(root, max_tiles=max_tiles)
+        return store
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline building tile store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build a tile store from an OSM extract")
+    build.add_argument("source", help="GeoJSON or Overpass JSON with buildings")
+    build.add_argument("root", help="Output directory")
+    build.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG)
+    args = parser.parse_args(argv)
+
+    buildings = read_buildings_extract(args.source)
+    index = build_store(buildings, args.root, tile_deg=args.tile_deg)
+    print(f"{len(buildings)} buildings in {len(index['tiles'])} tiles -> {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# components/core/cache.py
+import hashlib
+import logging
+import os
+
+from .dem import get_dem_source
+from .gpx_parser import parse_gpx
+from .track_file import (
+    TrackFileError,
+    load_track_file,
+    save_track_file,
+    track_file_path,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(gpx_content, *params) -> str:
+    """Clave de caché: hash SHA-256 del contenido GPX más los parámetros."""
+    if isinstance(gpx_content, str):
+        gpx_content = gpx_content.encode("utf-8")
+    digest = hashlib.sha256(gpx_content)
+    for param in params:
+        digest.update(b"\0" + repr(param).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _block_arrays(df):
+    for block in df._mgr.blocks:
+        yield getattr(block.values, "_ndarray", block.values)
+
+
+def freeze_frame(df):
+    """Marca como solo lectura todos los bloques de datos del DataFrame."""
+    for values in _block_arrays(df):
+        values.flags.writeable = False
+    return df
+
+
+def is_frozen(df) -> bool:
+    """True si ningún bloque del DataFrame se puede modificar (p. ej. un Track)."""
+    return not any(values.flags.writeable for values in _block_arrays(df))
+
+
+def cached_parse_gpx(
+    gpx_content, max_points_per_km: int = 20, dem_dir=None, track_dir=None, key=None
+):
+    """
+    `parse_gpx` con caché en disco: con `track_dir` el resultado se guarda
+    como `.gpxtrack` (ver track_file.py), de modo que otro proceso (o la app
+    tras reiniciarse) lo proyecta en memoria en vez de volver a leer el XML.
+    Con `dem_dir` la altitud se corrige con las teselas DEM de ese directorio.
+    `key` es el `content_key(gpx_content)` si quien llama ya lo tiene, para no
+    volver a calcular el hash del contenido.
+
+    No guarda nada en memoria: en la app es la etapa "parse" de la caché de
+    etapas (pipeline.py) la que conserva el resultado.
+    """
+    path = None
+    if track_dir:
+        if key is None:
+            key = content_key(gpx_content)
+        path = track_file_path(track_dir, content_key(key, max_points_per_km, dem_dir))
+    try:
+        saved = load_track_file(path) if path and os.path.exists(path) else None
+    except (OSError, TrackFileError) as e:
+        logger.warning("ignoring track file %s: %s", path, e)
+        saved = None
+    if saved is not None:
+        return saved["frame"], saved["stats"]
+
+    df, stats = parse_gpx(gpx_content, max_points_per_km, dem=get_dem_source(dem_dir))
+    if path:
+        try:
+            meta = {"max_points_per_km": max_points_per_km, "dem_dir": dem_dir}
+            save_track_file(path, df, stats, meta=meta)
+        except OSError as e:
+            logger.warning("could not save track file %s: %s", path, e)
+    return df, stats
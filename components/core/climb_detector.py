@@ -1,7 +1,32 @@
 # components/core/climb_detector.py
+import numpy as np
 import pandas as pd
 
-
+from .profiler import profiled
+from .range_stats import grade_range_stats
+from .utils import classify_climb_categories_strava
+
+# Parámetros de detección para cada nivel de sensibilidad de la app
+DETECTION_PRESETS = {
+    "Lenient": {
+        "max_pause_length_m": 400,
+        "max_pause_descent_m": 20,
+        "start_threshold_slope": 1.5,
+    },
+    "Balanced": {
+        "max_pause_length_m": 200,
+        "max_pause_descent_m": 10,
+        "start_threshold_slope": 2.0,
+    },
+    "Strict": {
+        "max_pause_length_m": 100,
+        "max_pause_descent_m": 5,
+        "start_threshold_slope": 3.0,
+    },
+}
+
+
+@profiled
 def detect_significant_segments(
     df,
     kind: str = "climb",
@@ -10,108 +35,141 @@ def detect_significant_segments(
     end_threshold_slope: float = 1.0,  # Si la pendiente baja de esto, entramos en "pausa"
     max_pause_length_m: int = 200,  # Si el descansillo dura más de esto, se acaba la subida
     max_pause_descent_m: int = 10,  # Si perdemos más de esta elevación, se acaba la subida
+    grade_index=None,  # RangeStats sobre plot_grade, para compartirlo entre llamadas
 ):
+    """
+    Máquina de estados SEARCHING -> IN_CLIMB -> EVALUATING_PAUSE sobre arrays.
+
+    En lugar de recorrer punto a punto, cada estado salta directamente al
+    siguiente evento relevante con `searchsorted` sobre índices precalculados
+    (cruces de umbral de pendiente) y sobre sumas acumuladas (longitud y
+    desnivel perdido durante la pausa). Los segmentos son solo rangos de
+    índices [start_idx, end_idx]; nunca se copian filas.
+
+    Los segmentos salen ya enriquecidos con `category`, `max_slope` y
+    `min_slope` (ver `_enrich_segments`).
+    """
     segments = []
-    state = "SEARCHING"
+    n = len(df)
 
     # Signo para diferenciar entre subidas (1) y bajadas (-1)
     slope_sign = 1 if kind == "climb" else -1
 
-    start_idx = 0
-    current_segment_points = []
-
-    for i in range(1, len(df)):
-        point_data = df.iloc[i]
-        slope = point_data["plot_grade"] * slope_sign
-        elev_diff = (df["ele"].iloc[i] - df["ele"].iloc[i - 1]) * slope_sign
-        dist_diff = point_data["distance"] - df["distance"].iloc[i - 1]
-
-        # ---- MÁQUINA DE ESTADOS ----
-        if state == "SEARCHING":
-            if slope >= start_threshold_slope:
-                state = "IN_CLIMB"
-                start_idx = i - 1
-                current_segment_points = [
-                    df.iloc[i - 1].to_dict(),
-                    point_data.to_dict(),
-                ]  # Empezamos con 2 puntos
-
-        elif state == "IN_CLIMB":
-            if slope >= end_threshold_slope:
-                # La subida continúa, añadimos el punto
-                current_segment_points.append(point_data.to_dict())
-            else:
-                # La pendiente ha bajado, iniciamos una posible pausa
-                state = "EVALUATING_PAUSE"
-                pause_start_idx = i - 1
-                pause_length = 0
-                pause_descent = 0
-                current_segment_points.append(point_data.to_dict())
-
-        elif state == "EVALUATING_PAUSE":
-            current_segment_points.append(point_data.to_dict())
-            pause_length += dist_diff
-            if elev_diff < 0:  # Solo contamos el desnivel negativo
-                pause_descent += abs(elev_diff)
-
-            # Criterio 1: La pendiente vuelve a subir, la pausa termina y la subida continúa
-            if slope >= end_threshold_slope:
-                state = "IN_CLIMB"
-
-            # Criterio 2 y 3: La pausa es demasiado larga o hemos bajado demasiado
-            elif (
-                pause_length > max_pause_length_m or pause_descent > max_pause_descent_m
-            ):
-                # Fin de la subida. Guardamos el segmento ANTES de la pausa
-                final_segment_df = pd.DataFrame(
-                    current_segment_points[: -(i - pause_start_idx)]
-                )
-                # Aquí validaríamos y guardaríamos el segmento si cumple los requisitos (longitud, desnivel...)
-                _validate_and_append_segment(
-                    segments, final_segment_df, kind, start_idx
-                )
-
-                # Volvemos a buscar una nueva subida
-                state = "SEARCHING"
-                current_segment_points = []
-
-    # Al final del bucle, comprobar si estábamos en medio de una subida
-    if state in ["IN_CLIMB", "EVALUATING_PAUSE"] and current_segment_points:
-        _validate_and_append_segment(
-            segments, pd.DataFrame(current_segment_points), kind, start_idx
-        )
-
-    return pd.DataFrame(segments)
-
-
-def _validate_and_append_segment(
+    slope = df["plot_grade"].to_numpy(dtype=np.float64) * slope_sign
+    ele = df["ele"].to_numpy(dtype=np.float64)
+    distance = df["distance"].to_numpy(dtype=np.float64)
+
+    elev_diff = np.zeros(n)
+    elev_diff[1:] = np.diff(ele) * slope_sign
+
+    gain_bounds = _gain_bounds(ele, elev_diff)
+
+    # Desnivel negativo acumulado: la pausa solo cuenta lo que se pierde
+    descent_cum = np.cumsum(np.where(elev_diff < 0, -elev_diff, 0.0))
+
+    # Índices (>= 1) donde cada umbral se cumple / se rompe. NaN nunca cumple.
+    start_hits = np.flatnonzero(slope >= start_threshold_slope)
+    start_hits = start_hits[start_hits >= 1]
+    continue_hits = np.flatnonzero(slope >= end_threshold_slope)
+    pause_hits = np.flatnonzero(~(slope >= end_threshold_slope))
+
+    def _next(hits, i):
+        k = np.searchsorted(hits, i)
+        return hits[k] if k < len(hits) else n
+
+    i = 1
+    while i < n:
+        # ---- SEARCHING ----
+        first = _next(start_hits, i)
+        if first >= n:
+            break
+        start_idx = first - 1
+        i = first + 1
+
+        # ---- IN_CLIMB / EVALUATING_PAUSE ----
+        while True:
+            trigger = _next(pause_hits, i)
+            if trigger >= n:
+                _append_segment(segments, distance, gain_bounds, kind, start_idx, n - 1)
+                return _enrich_segments(segments, df, grade_index)
+
+            pause_start_idx = trigger - 1
+            resume = _next(continue_hits, trigger + 1)
+            too_long = np.searchsorted(
+                distance, distance[trigger] + max_pause_length_m, side="right"
+            )
+            too_deep = np.searchsorted(
+                descent_cum, descent_cum[trigger] + max_pause_descent_m, side="right"
+            )
+            stop = max(trigger + 1, min(too_long, too_deep))
+
+            if resume <= stop and resume < n:
+                # La pendiente vuelve a subir antes de agotar la pausa
+                i = resume + 1
+                continue
+
+            if stop >= n:
+                # Terminamos el track en plena pausa: el segmento llega al final
+                _append_segment(segments, distance, gain_bounds, kind, start_idx, n - 1)
+                return _enrich_segments(segments, df, grade_index)
+
+            # Fin de la subida. Guardamos el segmento ANTES de la pausa
+            _append_segment(
+                segments, distance, gain_bounds, kind, start_idx, pause_start_idx
+            )
+            i = stop + 1
+            break
+
+    return _enrich_segments(segments, df, grade_index)
+
+
+def _enrich_segments(segments, df, grade_index=None):
+    """
+    DataFrame de segmentos con la categoría tipo Strava y la pendiente
+    máxima/mínima de `plot_grade` en cada rango, calculadas de una vez para
+    todos los segmentos (sparse table + umbrales vectorizados).
+    """
+    seg_df = pd.DataFrame(segments)
+    if seg_df.empty:
+        return seg_df
+
+    if grade_index is None:
+        grade_index = grade_range_stats(df)
+    lo = seg_df["start_idx"].to_numpy()
+    hi = seg_df["end_idx"].to_numpy()
+    seg_df["category"] = classify_climb_categories_strava(
+        seg_df["length_m"], np.abs(seg_df["avg_slope"])
+    )
+    seg_df["max_slope"] = grade_index.max(lo, hi)
+    seg_df["min_slope"] = grade_index.min(lo, hi)
+    return seg_df
+
+
+def _append_segment(
     segments_list,
-    segment_df,
+    distance,
+    gain_bounds,
     kind,
     start_idx,
+    end_idx,
     min_gain: int = 20,
     min_length: int = 300,
 ) -> None:
-    """Función auxiliar para no repetir código de validación."""
-    if segment_df.empty or len(segment_df) < 2:
+    """Valida el rango [start_idx, end_idx] y lo añade si cumple los requisitos."""
+    if end_idx - start_idx < 1:
         return
 
-    length = segment_df["distance"].iloc[-1] - segment_df["distance"].iloc[0]
-
-    if kind == "climb":
-        gain = segment_df[segment_df["ele"].diff() > 0]["ele"].diff().sum()
-    else:  # descent
-        gain = abs(segment_df[segment_df["ele"].diff() < 0]["ele"].diff().sum())
+    length = distance[end_idx] - distance[start_idx]
+    gain = _segment_gain(*gain_bounds, kind, start_idx, end_idx)
 
     if length > min_length and gain > min_gain:
         avg_slope = (gain / length) * 100 if length > 0 else 0
-        end_idx = start_idx + len(segment_df) - 1
 
         segments_list.append(
             {
                 "type": kind,
-                "start_km": segment_df["distance"].iloc[0] / 1000,
-                "end_km": segment_df["distance"].iloc[-1] / 1000,
+                "start_km": distance[start_idx] / 1000,
+                "end_km": distance[end_idx] / 1000,
                 "elev_gain" if kind == "climb" else "elev_loss": gain,
                 "length_m": length,
                 "avg_slope": avg_slope if kind == "climb" else -avg_slope,
@@ -119,3 +177,31 @@ def _validate_and_append_segment(
                 "end_idx": end_idx,
             }
         )
+
+
+def _gain_bounds(ele, elev_diff):
+    """
+    Prefijos para calcular el desnivel de cualquier rango en O(1).
+
+    El desnivel se mide como siempre lo ha hecho la app: se toman los puntos
+    con paso a favor (positivo en subidas, negativo en bajadas) y se suman las
+    diferencias *entre esos puntos*, lo que telescopa a ele[último] - ele[primero].
+    Basta con saber, para cada índice, cuál es el siguiente y el anterior punto
+    a favor.
+    """
+    n = len(ele)
+    positions = np.arange(n)
+    picked = elev_diff > 0
+    last_pick = np.maximum.accumulate(np.where(picked, positions, -1))
+    next_pick = np.minimum.accumulate(np.where(picked, positions, n)[::-1])[::-1]
+    return ele, next_pick, last_pick
+
+
+def _segment_gain(ele, next_pick, last_pick, kind, start_idx, end_idx):
+    first = next_pick[start_idx + 1]
+    last = last_pick[end_idx]
+    if first >= last:
+        return 0.0
+
+    gain = ele[last] - ele[first]
+    return gain if kind == "climb" else abs(gain)
@@ -0,0 +1,392 @@
+# components/core/dem.py
+"""
+Corrección de la elevación con un modelo digital del terreno (DEM) local.
+
+La altitud de los GPX de móvil es ruidosa: infla el desnivel acumulado y
+genera subidas que no existen. `DemSource` lee teselas locales y devuelve la
+altitud del terreno en cada punto del track:
+
+- SRTM `.hgt` (N42E001.hgt: enteros big-endian de 16 bits, 1201x1201 o
+  3601x3601, la fila 0 es el borde norte, -32768 = sin dato);
+- GeoTIFF sin comprimir en coordenadas geográficas (EPSG:4326), de una sola
+  banda y en tiras (no en bloques). Los comprimidos se rechazan con un error
+  claro: no se pueden leer con memmap.
+
+Las teselas se abren con `numpy.memmap`, así que solo se leen del disco las
+páginas que tocan los puntos consultados; las abiertas se guardan en una LRU.
+La interpolación es bilineal y se hace de una vez para todos los puntos de
+cada tesela.
+
+    dem = get_dem_source("dem/")            # o GPX_DEM_DIR=dem/
+    df, stats = parse_gpx(gpx_content, dem=dem)
+"""
+
+import math
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEM_DIR = os.environ.get("GPX_DEM_DIR") or None
+DEFAULT_MAX_OPEN_TILES = 16
+HGT_VOID = -32768
+
+_HGT_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+_TIFF_SUFFIXES = (".tif", ".tiff")
+
+# Etiquetas TIFF / GeoTIFF que hacen falta
+_TIFF_TYPES = {
+    1: "B",
+    2: "s",
+    3: "H",
+    4: "I",
+    5: "II",
+    6: "b",
+    8: "h",
+    9: "i",
+    11: "f",
+    12: "d",
+}
+_IMAGE_WIDTH = 256
+_IMAGE_LENGTH = 257
+_BITS_PER_SAMPLE = 258
+_COMPRESSION = 259
+_STRIP_OFFSETS = 273
+_SAMPLES_PER_PIXEL = 277
+_STRIP_BYTE_COUNTS = 279
+_TILE_WIDTH = 322
+_SAMPLE_FORMAT = 339
+_MODEL_PIXEL_SCALE = 33550
+_MODEL_TIEPOINT = 33922
+_GEO_KEY_DIRECTORY = 34735
+_GDAL_NODATA = 42113
+_GT_MODEL_TYPE = 1024
+_GT_RASTER_TYPE = 1025
+_MODEL_TYPE_GEOGRAPHIC = 2
+_RASTER_PIXEL_IS_POINT = 2
+
+
+class DemTile:
+    """
+    Rejilla de una tesela abierta con memmap: `data[row, col]` es la altitud en
+    lat = north - row * dlat, lon = west + col * dlon.
+    """
+
+    __slots__ = ("data", "dlat", "dlon", "nodata", "north", "path", "west")
+
+    def __init__(self, path, data, north, west, dlat, dlon, nodata=None) -> None:
+        if data.shape[0] < 2 or data.shape[1] < 2:
+            raise ValueError(f"{path}: DEM tile needs at least 2x2 samples")
+        self.path = path
+        self.data = data
+        self.north = north
+        self.west = west
+        self.dlat = dlat
+        self.dlon = dlon
+        self.nodata = nodata
+
+    @property
+    def bounds(self):
+        """(south, west, north, east) de los centros de muestra."""
+        rows, cols = self.data.shape
+        return (
+            self.north - (rows - 1) * self.dlat,
+            self.west,
+            self.north,
+            self.west + (cols - 1) * self.dlon,
+        )
+
+    def sample(self, lat, lon):
+        """Altitud bilineal en cada punto; NaN fuera de la tesela o sin dato."""
+        rows = (self.north - np.asarray(lat, dtype=np.float64)) / self.dlat
+        cols = (np.asarray(lon, dtype=np.float64) - self.west) / self.dlon
+        height, width = self.data.shape
+        inside = (rows >= 0) & (rows <= height - 1) & (cols >= 0) & (cols <= width - 1)
+
+        # La celda se recorta al borde: el último punto de la rejilla usa la
+        # celda anterior con peso 1
+        r0 = np.clip(np.floor(np.where(inside, rows, 0)), 0, height - 2).astype(np.intp)
+        c0 = np.clip(np.floor(np.where(inside, cols, 0)), 0, width - 2).astype(np.intp)
+        fr = np.where(inside, rows - r0, 0.0)
+        fc = np.where(inside, cols - c0, 0.0)
+
+        corners = np.stack(
+            (
+                self.data[r0, c0],
+                self.data[r0, c0 + 1],
+                self.data[r0 + 1, c0],
+                self.data[r0 + 1, c0 + 1],
+            )
+        ).astype(np.float64)
+        if self.nodata is not None:
+            corners[corners == self.nodata] = np.nan
+        z = (
+            corners[0] * (1 - fr) * (1 - fc)
+            + corners[1] * (1 - fr) * fc
+            + corners[2] * fr * (1 - fc)
+            + corners[3] * fr * fc
+        )
+        z[~inside] = np.nan
+        return z
+
+
+def _hgt_origin(name):
+    """(lat, lon) de la esquina suroeste según el nombre del fichero, o None."""
+    match = _HGT_NAME.match(name)
+    if match is None:
+        return None
+    ns, lat, ew, lon = match.groups()
+    lat = int(lat) * (1 if ns.upper() == "N" else -1)
+    lon = int(lon) * (1 if ew.upper() == "E" else -1)
+    return lat, lon
+
+
+def open_hgt(path) -> DemTile:
+    lat, lon = _hgt_origin(os.path.basename(path))
+    size = os.path.getsize(path)
+    n = math.isqrt(size // 2)
+    if n * n * 2 != size:
+        raise ValueError(f"{path}: not a square SRTM .hgt tile ({size} bytes)")
+    data = np.memmap(path, dtype=">i2", mode="r", shape=(n, n))
+    step = 1 / (n - 1)
+    return DemTile(path, data, lat + 1, lon, step, step, nodata=HGT_VOID)
+
+
+def _read_tiff_tags(f):
+    """Byte order y {etiqueta: tupla de valores} del primer IFD de un TIFF."""
+    header = f.read(8)
+    order = {b"II": "<", b"MM": ">"}.get(header[:2])
+    if order is None:
+        raise ValueError("not a TIFF file")
+    magic, offset = struct.unpack(order + "HI", header[2:])
+    if magic != 42:
+        raise ValueError("only classic TIFF is supported (not BigTIFF)")
+
+    f.seek(offset)
+    (count,) = struct.unpack(order + "H", f.read(2))
+    entries = f.read(12 * count)
+    tags = {}
+    for k in range(count):
+        tag, kind, n, raw = struct.unpack(
+            order + "HHI4s", entries[12 * k : 12 * k + 12]
+        )
+        fmt = _TIFF_TYPES.get(kind)
+        if fmt is None:
+            continue
+        size = struct.calcsize(order + fmt) * n
+        if size > 4:
+            (value_offset,) = struct.unpack(order + "I", raw)
+            position = f.tell()
+            f.seek(value_offset)
+            raw = f.read(size)
+            f.seek(position)
+        if kind == 2:
+            tags[tag] = raw[:size].rstrip(b"\0").decode("ascii", "replace")
+        else:
+            tags[tag] = struct.unpack(order + fmt * n, raw[:size])
+    return order, tags
+
+
+def _geo_keys(tags):
+    directory = tags.get(_GEO_KEY_DIRECTORY, ())
+    keys = {}
+    for k in range(4, len(directory) - 3, 4):
+        key, location, _, value = directory[k : k + 4]
+        if location == 0:
+            keys[key] = value
+    return keys
+
+
+def open_geotiff(path) -> DemTile:
+    with open(path, "rb") as f:
+        order, tags = _read_tiff_tags(f)
+
+    def tag(name, default=None):
+        value = tags.get(name, default)
+        if value is None:
+            raise ValueError(f"{path}: missing TIFF tag {name}")
+        return value
+
+    if tag(_COMPRESSION, (1,))[0] != 1:
+        raise ValueError(f"{path}: compressed GeoTIFF cannot be memory-mapped")
+    if _TILE_WIDTH in tags:
+        raise ValueError(f"{path}: tiled GeoTIFF is not supported, use strips")
+    if tag(_SAMPLES_PER_PIXEL, (1,))[0] != 1:
+        raise ValueError(f"{path}: DEM GeoTIFF must have a single band")
+    keys = _geo_keys(tags)
+    if keys.get(_GT_MODEL_TYPE, _MODEL_TYPE_GEOGRAPHIC) != _MODEL_TYPE_GEOGRAPHIC:
+        raise ValueError(f"{path}: DEM must use geographic coordinates (EPSG:4326)")
+
+    width = tag(_IMAGE_WIDTH)[0]
+    height = tag(_IMAGE_LENGTH)[0]
+    bits = tag(_BITS_PER_SAMPLE)[0]
+    kind = {1: "u", 2: "i", 3: "f"}[tag(_SAMPLE_FORMAT, (1,))[0]]
+    dtype = np.dtype(f"{order}{kind}{bits // 8}")
+
+    offsets = tag(_STRIP_OFFSETS)
+    counts = tag(_STRIP_BYTE_COUNTS)
+    contiguous = all(
+        offsets[k] + counts[k] == offsets[k + 1] for k in range(len(offsets) - 1)
+    )
+    if not contiguous or sum(counts) < width * height * dtype.itemsize:
+        raise ValueError(f"{path}: GeoTIFF strips are not contiguous")
+    data = np.memmap(
+        path, dtype=dtype, mode="r", offset=offsets[0], shape=(height, width)
+    )
+
+    sx, sy = tag(_MODEL_PIXEL_SCALE)[:2]
+    i, j, _, x, y, _ = tag(_MODEL_TIEPOINT)[:6]
+    west, north = x - i * sx, y + j * sy
+    if keys.get(_GT_RASTER_TYPE) != _RASTER_PIXEL_IS_POINT:
+        # PixelIsArea: el punto de enlace es la esquina del píxel, no su centro
+        west, north = west + sx / 2, north - sy / 2
+    nodata = tags.get(_GDAL_NODATA)
+    nodata = float(nodata) if nodata not in (None, "", "nan") else None
+    return DemTile(path, data, north, west, sy, sx, nodata=nodata)
+
+
+class DemSource:
+    """
+    Teselas DEM de un directorio (se indexan al crearlo; se abren al usarlas).
+    Es seguro compartirlo entre hilos.
+    """
+
+    def __init__(self, directory, max_open_tiles: int = DEFAULT_MAX_OPEN_TILES):
+        self.directory = os.path.abspath(directory)
+        self.max_open_tiles = max_open_tiles
+        self._hgt = {}
+        self._tiffs = []
+        for root, _, names in os.walk(self.directory):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                origin = _hgt_origin(name)
+                if origin is not None:
+                    self._hgt[origin] = path
+                elif name.lower().endswith(_TIFF_SUFFIXES):
+                    # La cabecera es pequeña: se abre para saber su extensión
+                    self._tiffs.append((open_geotiff(path).bounds, path))
+        if not self._hgt and not self._tiffs:
+            raise ValueError(f"No .hgt or GeoTIFF DEM tiles in {directory}")
+
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "hits": 0}
+
+    def _tile(self, path) -> DemTile:
+        with self._lock:
+            tile = self._open.get(path)
+            if tile is not None:
+                self._open.move_to_end(path)
+                self.counters["hits"] += 1
+                return tile
+        if path.lower().endswith(_TIFF_SUFFIXES):
+            tile = open_geotiff(path)
+        else:
+            tile = open_hgt(path)
+        with self._lock:
+            self._open[path] = tile
+            self.counters["opened"] += 1
+            while len(self._open) > self.max_open_tiles:
+                self._open.popitem(last=False)
+        return tile
+
+    def _sample_hgt(self, z, lat, lon, idx, cell_lat, cell_lon) -> None:
+        """Rellena `z[idx]` con la tesela .hgt de cada celda (grado entero)."""
+        # Los puntos se agrupan por celda: una pasada por tesela
+        cells = (cell_lat + 90) * 360 + (cell_lon + 180)
+        order = np.argsort(cells, kind="stable")
+        keys, starts = np.unique(cells[order], return_index=True)
+        for key, group in zip(keys, np.split(order, starts[1:])):
+            row, col = divmod(int(key), 360)
+            path = self._hgt.get((row - 90, col - 180))
+            if path is None:
+                continue
+            points = idx[group]
+            z[points] = self._tile(path).sample(lat[points], lon[points])
+
+    def elevations(self, lat, lon):
+        """Altitud del DEM en cada punto; NaN donde no hay tesela o dato."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        z = np.full(len(lat), np.nan)
+        finite = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+
+        if self._hgt and len(finite):
+            cell_lat = np.floor(lat[finite]).astype(np.int64)
+            cell_lon = np.floor(lon[finite]).astype(np.int64)
+            self._sample_hgt(z, lat, lon, finite, cell_lat, cell_lon)
+
+            # Un punto justo en el borde norte o este de una tesela (latitud o
+            # longitud entera) cae en la celda vecina; si esa tesela no está,
+            # se usa la de la celda anterior, que también incluye el borde
+            on_north = cell_lat == lat[finite]
+            on_east = cell_lon == lon[finite]
+            for d_lat, d_lon in ((1, 0), (0, 1), (1, 1)):
+                retry = np.isnan(z[finite])
+                retry &= (on_north if d_lat else True) & (on_east if d_lon else True)
+                if retry.any():
+                    self._sample_hgt(
+                        z,
+                        lat,
+                        lon,
+                        finite[retry],
+                        cell_lat[retry] - d_lat,
+                        cell_lon[retry] - d_lon,
+                    )
+
+        for (south, west, north, east), path in self._tiffs:
+            idx = np.flatnonzero(np.isnan(z))
+            idx = idx[
+                (lat[idx] >= south)
+                & (lat[idx] <= north)
+                & (lon[idx] >= west)
+                & (lon[idx] <= east)
+            ]
+            if len(idx):
+                z[idx] = self._tile(path).sample(lat[idx], lon[idx])
+        return z
+
+    def correct(self, lat, lon, ele):
+        """
+        Altitud corregida: la del DEM donde la hay. Los puntos sin DEM
+        conservan la del GPS desplazada por la diferencia mediana entre ambas,
+        para no meter un escalón al entrar o salir de la cobertura.
+        """
+        ele = np.asarray(ele, dtype=np.float64)
+        z = self.elevations(lat, lon)
+        missing = np.isnan(z)
+        if missing.all():
+            return ele.copy()
+        if missing.any():
+            offsets = z[~missing] - ele[~missing]
+            offset = np.nanmedian(offsets) if np.isfinite(offsets).any() else 0.0
+            z[missing] = ele[missing] + offset
+        return z
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "hgt_tiles": len(self._hgt),
+                "geotiff_tiles": len(self._tiffs),
+                "open_tiles": len(self._open),
+                **self.counters,
+            }
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def get_dem_source(directory=DEM_DIR):
+    """DemSource compartido por directorio, o None si no se indica ninguno."""
+    if not directory:
+        return None
+    directory = os.path.abspath(directory)
+    with _sources_lock:
+        if directory not in _sources:
+            _sources[directory] = DemSource(directory)
+        return _sources[directory]
@@ -0,0 +1,155 @@
+# components/core/geodesy.py
+"""
+Núcleo geodésico compartido: distancias y rumbos vectorizados.
+
+Dos métodos de distancia:
+  - "haversine": esfera de radio medio (rápido; es el que usa el parser),
+  - "vincenty": elipsoide WGS-84 (equivalente a geopy.distance.geodesic).
+"""
+
+import numpy as np
+
+# Radio medio de la Tierra (IUGG), el mismo que usa el paquete `haversine`
+MEAN_EARTH_RADIUS_M = 6371008.8
+
+# Elipsoide WGS-84 (el mismo que usa geopy.distance.geodesic)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Distancia ortodrómica en metros sobre una esfera de radio medio."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2)
+    )
+    d = (
+        np.sin((lat2 - lat1) * 0.5) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    )
+    return MEAN_EARTH_RADIUS_M * (2 * np.arcsin(np.sqrt(d)))
+
+
+def vincenty_distance(lat1, lon1, lat2, lon2, max_iter: int = 200, tol=1e-12):
+    """
+    Distancia geodésica en metros sobre WGS-84 (fórmula inversa de Vincenty),
+    vectorizada sobre arrays. Coincide con `geopy.distance.geodesic` por debajo
+    del milímetro salvo para puntos casi antipodales, que no se dan en un track.
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2)
+    )
+    f = WGS84_F
+    u1 = np.arctan((1 - f) * np.tan(lat1))
+    u2 = np.arctan((1 - f) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    big_l = lon2 - lon1
+    lam = big_l.copy() if np.ndim(big_l) else np.array(big_l)
+    active = np.ones(lam.shape, dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            cos_2sigma_m = np.where(
+                cos2_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0
+            )
+            c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_new = big_l + (1 - c) * f * sin_alpha * (
+                sigma
+                + c
+                * sin_sigma
+                * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+            )
+            delta = np.abs(lam_new - lam)
+            lam = np.where(active, lam_new, lam)
+            active &= delta > tol
+            if not active.any():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = (
+            big_b
+            * sin_sigma
+            * (
+                cos_2sigma_m
+                + big_b
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                    - big_b
+                    / 6
+                    * cos_2sigma_m
+                    * (-3 + 4 * sin_sigma**2)
+                    * (-3 + 4 * cos_2sigma_m**2)
+                )
+            )
+        )
+        distance = WGS84_B * big_a * (sigma - delta_sigma)
+
+    return np.where(sin_sigma > 0, distance, 0.0)
+
+
+_DISTANCE_METHODS = {
+    "haversine": haversine_distance,
+    "vincenty": vincenty_distance,
+}
+
+
+def pairwise_distance(lat1, lon1, lat2, lon2, method: str = "haversine"):
+    """Distancia en metros entre cada par (lat1[i], lon1[i]) - (lat2[i], lon2[i])."""
+    try:
+        kernel = _DISTANCE_METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown distance method: {method}") from None
+    return kernel(lat1, lon1, lat2, lon2)
+
+
+def consecutive_distances(lats, lons, method: str = "haversine"):
+    """Distancia de cada punto al anterior (0 para el primero)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    distances = np.zeros(len(lats))
+    if len(lats) > 1:
+        distances[1:] = pairwise_distance(
+            lats[:-1], lons[:-1], lats[1:], lons[1:], method=method
+        )
+    return distances
+
+
+def cumulative_distance(lats, lons, method: str = "haversine"):
+    """Distancia acumulada a lo largo del track, empezando en 0."""
+    return np.cumsum(consecutive_distances(lats, lons, method=method))
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Rumbo inicial en grados [0, 360) del punto 1 hacia el punto 2."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2)
+    )
+    d_lon = lon2 - lon1
+    x = np.sin(d_lon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(d_lon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def consecutive_bearings(lats, lons):
+    """Rumbo de cada punto al siguiente (NaN para el último)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    bearings = np.full(len(lats), np.nan)
+    if len(lats) > 1:
+        bearings[:-1] = initial_bearing(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    return bearings
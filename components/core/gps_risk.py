@@ -0,0 +1,121 @@
+# components/core/gps_risk.py
+import numpy as np
+import pandas as pd
+
+from .geodesy import vincenty_distance
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_LEVEL = 3
+
+
+def impute_building_heights(buildings_df):
+    """
+    Altura de cada edificio: `height` si existe; si no, `levels` * 3 m; si no
+    hay ninguno de los dos, 0.
+    """
+    height = pd.to_numeric(buildings_df["height"], errors="coerce")
+    levels = pd.to_numeric(buildings_df["levels"], errors="coerce").fillna(0)
+    return np.where(height.notna(), height, levels * METERS_PER_LEVEL).astype(
+        np.float64
+    )
+
+
+def neighbour_pairs(lats, lons, building_lats, building_lons, radius: int = 10):
+    """
+    Pares (punto, edificio) a menos de `radius` metros, con una única consulta
+    al BallTree para todos los puntos. Devuelve (point_idx, building_idx).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    if len(lats) == 0 or len(building_lats) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # scikit-learn tarda segundos en importarse: solo cuando hay que buscar
+    from sklearn.neighbors import BallTree
+
+    tree = BallTree(
+        np.radians(np.column_stack((building_lats, building_lons))),
+        metric="haversine",
+    )
+    neighbours = tree.query_radius(
+        np.radians(np.column_stack((lats, lons))), r=radius / EARTH_RADIUS_M
+    )
+    return flatten_neighbours(neighbours)
+
+
+def flatten_neighbours(neighbours):
+    """Convierte la salida de `query_radius` en dos arrays planos de índices."""
+    counts = np.fromiter(map(len, neighbours), dtype=np.int64, count=len(neighbours))
+    point_idx = np.repeat(np.arange(len(neighbours)), counts)
+    if counts.sum() == 0:
+        return point_idx, np.zeros(0, dtype=np.int64)
+    return point_idx, np.concatenate(neighbours).astype(np.int64)
+
+
+def score_pairs(
+    lats,
+    lons,
+    building_lats,
+    building_lons,
+    building_heights,
+    point_idx,
+    building_idx,
+):
+    """
+    Σ altura / distancia por punto sobre los pares ya encontrados (ignorando
+    edificios sin altura o a <= 1 m). Las distancias geodésicas se calculan de
+    golpe. Devuelve (scores por punto, máscara de edificios que han contribuido).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    building_heights = np.asarray(building_heights, dtype=np.float64)
+
+    scores = np.zeros(len(lats))
+    used = np.zeros(len(building_heights), dtype=bool)
+    if len(point_idx) == 0:
+        return scores, used
+
+    distances = vincenty_distance(
+        lats[point_idx],
+        lons[point_idx],
+        np.asarray(building_lats, dtype=np.float64)[building_idx],
+        np.asarray(building_lons, dtype=np.float64)[building_idx],
+    )
+    heights = building_heights[building_idx]
+    contributes = (heights > 0) & (distances > 1)
+
+    scores = np.bincount(
+        point_idx[contributes],
+        weights=heights[contributes] / distances[contributes],
+        minlength=len(lats),
+    )
+    used[building_idx[contributes]] = True
+    return scores, used
+
+
+def compute_risk_scores(
+    lats, lons, building_lats, building_lons, building_heights, radius: int = 10
+):
+    """
+    Interferencia estimada en cada punto: Σ altura / distancia de los edificios
+    a menos de `radius` metros. Devuelve (scores por punto, máscara de
+    edificios que han contribuido).
+    """
+    point_idx, building_idx = neighbour_pairs(
+        lats, lons, building_lats, building_lons, radius
+    )
+    return score_pairs(
+        lats,
+        lons,
+        building_lats,
+        building_lons,
+        building_heights,
+        point_idx,
+        building_idx,
+    )
+
+
+def smooth_risk_scores(scores, window: int = 5):
+    """Media móvil centrada; los extremos se rellenan con el valor más cercano."""
+    return (
+        pd.Series(scores).rolling(window=window, center=True).mean().bfill().ffill()
+    ).to_numpy()
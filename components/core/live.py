@@ -0,0 +1,459 @@
+# components/core/live.py
+"""
+Análisis incremental para seguimiento en directo.
+
+`LiveTrackAnalyzer` recibe los puntos según llegan (`append`) y mantiene al
+día la distancia acumulada, la pendiente suavizada, el desnivel, el tiempo en
+movimiento y la máquina de estados de subidas y bajadas con coste constante
+amortizado por punto. Cada cambio de la máquina se devuelve como un evento:
+
+    {"event": "opened", "type": "climb", "start_idx": 120, ...}
+    {"event": "closed", "type": "climb", "start_km": ..., "category": ...}
+    {"event": "discarded", "type": "climb", "start_idx": 120, "end_idx": 131}
+
+La pendiente suavizada de un punto necesita los puntos hasta `smoothing_m / 2`
+metros por delante, así que la detección va con ese retraso respecto al
+último punto recibido; `finish()` procesa lo pendiente y cierra los segmentos
+abiertos. Con todos los puntos de un GPX, `stats()`, `segments()` y
+`to_frame()` coinciden exactamente con `parse_gpx(..., max_points_per_km=None)`
++ `smoothed_grade` + `detect_significant_segments`: cada paso hace las mismas
+operaciones en el mismo orden que la versión por lotes.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .geodesy import haversine_distance
+from .stats import MOVING_STEP_SECONDS
+from .track import MAX_STEP_SECONDS, Track
+from .utils import classify_climb_categories_strava
+
+SEARCHING, IN_CLIMB, PAUSE = "searching", "in_climb", "pause"
+# Marca de "sin hora" en los instantes guardados como enteros (ns)
+_NAT = np.iinfo(np.int64).min
+
+
+class _ExactSum:
+    """Suma exacta incremental (parciales de Shewchuk, como `math.fsum`)."""
+
+    __slots__ = ("partials",)
+
+    def __init__(self) -> None:
+        self.partials = []
+
+    def add(self, x: float) -> None:
+        i = 0
+        for y in self.partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                self.partials[i] = lo
+                i += 1
+            x = hi
+        self.partials[i:] = [x]
+
+    @property
+    def value(self) -> float:
+        return math.fsum(self.partials)
+
+
+def _timestamp_ns(time) -> int:
+    if time is None:
+        return _NAT
+    ts = pd.Timestamp(time)
+    if ts is pd.NaT:
+        return _NAT
+    ts = ts.tz_convert("UTC") if ts.tz else ts.tz_localize("UTC")
+    return ts.as_unit("ns").value
+
+
+class _SegmentTracker:
+    """
+    La máquina de estados de `detect_significant_segments` para un tipo de
+    segmento, alimentada punto a punto con la pendiente suavizada ya
+    definitiva.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        kind,
+        start_threshold_slope,
+        end_threshold_slope,
+        max_pause_length_m,
+        max_pause_descent_m,
+        min_gain: int = 20,
+        min_length: int = 300,
+    ) -> None:
+        self.analyzer = analyzer
+        self.kind = kind
+        self.sign = 1 if kind == "climb" else -1
+        self.start_threshold_slope = start_threshold_slope
+        self.end_threshold_slope = end_threshold_slope
+        self.max_pause_length_m = max_pause_length_m
+        self.max_pause_descent_m = max_pause_descent_m
+        self.min_gain = min_gain
+        self.min_length = min_length
+
+        # Por punto, según llegan: desnivel perdido acumulado y último punto a favor
+        self.descent_cum = []
+        self.last_pick = []
+        self.picks = []
+        self._pick_pos = 0
+
+        self.state = SEARCHING
+        self.start_idx = None
+        self.segments = []
+        self.extremes = []
+
+    def add_point(self, elev_diff: float) -> None:
+        """Registra un punto recién llegado (`elev_diff` sin signo aplicado)."""
+        i = len(self.descent_cum)
+        elev_diff = elev_diff * self.sign
+        previous = self.descent_cum[-1] if i else 0.0
+        self.descent_cum.append(previous + (-elev_diff if elev_diff < 0 else 0.0))
+        if elev_diff > 0:
+            self.picks.append(i)
+        self.last_pick.append(self.picks[-1] if self.picks else -1)
+
+    def feed(self, j: int, grade: float):
+        """Avanza la máquina con la pendiente suavizada del punto `j`."""
+        slope = grade * self.sign
+        if self.state == SEARCHING:
+            if j >= 1 and slope >= self.start_threshold_slope:
+                self.start_idx = j - 1
+                first = self.analyzer.plot_grade[j - 1]
+                self.max_slope = np.fmax(first, grade)
+                self.min_slope = np.fmin(first, grade)
+                self.state = IN_CLIMB
+                distance = self.analyzer.distance
+                return {
+                    "event": "opened",
+                    "type": self.kind,
+                    "start_idx": self.start_idx,
+                    "start_km": distance[self.start_idx] / 1000,
+                    "detected_idx": j,
+                }
+            return None
+
+        if self.state == IN_CLIMB:
+            if not slope >= self.end_threshold_slope:
+                # Empieza una pausa: el segmento terminaría en j - 1
+                self.state = PAUSE
+                self.trigger = j
+                self.pause_extremes = (self.max_slope, self.min_slope)
+                self.pause_max_distance = (
+                    self.analyzer.distance[j] + self.max_pause_length_m
+                )
+                self.pause_max_descent = self.descent_cum[j] + self.max_pause_descent_m
+            self._update_extremes(grade)
+            return None
+
+        self._update_extremes(grade)
+        if slope >= self.end_threshold_slope:
+            self.state = IN_CLIMB
+            return None
+        if (
+            self.analyzer.distance[j] > self.pause_max_distance
+            or self.descent_cum[j] > self.pause_max_descent
+        ):
+            self.state = SEARCHING
+            return self._close(self.trigger - 1, *self.pause_extremes)
+        return None
+
+    def finish(self):
+        """Cierra el segmento abierto (si lo hay) en el último punto."""
+        if self.state == SEARCHING:
+            return None
+        self.state = SEARCHING
+        return self._close(
+            len(self.analyzer.distance) - 1, self.max_slope, self.min_slope
+        )
+
+    def _update_extremes(self, grade: float) -> None:
+        self.max_slope = np.fmax(self.max_slope, grade)
+        self.min_slope = np.fmin(self.min_slope, grade)
+
+    def _segment_gain(self, start_idx: int, end_idx: int) -> float:
+        # Los inicios de segmento solo avanzan: el puntero nunca retrocede
+        while (
+            self._pick_pos < len(self.picks)
+            and self.picks[self._pick_pos] < start_idx + 1
+        ):
+            self._pick_pos += 1
+        if self._pick_pos == len(self.picks):
+            return 0.0
+        first = self.picks[self._pick_pos]
+        last = self.last_pick[end_idx]
+        if first >= last:
+            return 0.0
+
+        ele = self.analyzer.ele
+        gain = ele[last] - ele[first]
+        return gain if self.kind == "climb" else abs(gain)
+
+    def _close(self, end_idx, max_slope, min_slope):
+        """Valida [start_idx, end_idx] igual que `_append_segment`."""
+        start_idx = self.start_idx
+        discarded = {
+            "event": "discarded",
+            "type": self.kind,
+            "start_idx": start_idx,
+            "end_idx": end_idx,
+        }
+        if end_idx - start_idx < 1:
+            return discarded
+
+        distance = self.analyzer.distance
+        length = distance[end_idx] - distance[start_idx]
+        gain = self._segment_gain(start_idx, end_idx)
+        if not (length > self.min_length and gain > self.min_gain):
+            return discarded
+
+        avg_slope = (gain / length) * 100 if length > 0 else 0
+        segment = {
+            "type": self.kind,
+            "start_km": distance[start_idx] / 1000,
+            "end_km": distance[end_idx] / 1000,
+            "elev_gain" if self.kind == "climb" else "elev_loss": gain,
+            "length_m": length,
+            "avg_slope": avg_slope if self.kind == "climb" else -avg_slope,
+            "start_idx": start_idx,
+            "end_idx": end_idx,
+        }
+        self.segments.append(segment)
+        self.extremes.append((max_slope, min_slope))
+
+        category = classify_climb_categories_strava([length], [abs(avg_slope)])[0]
+        return {
+            "event": "closed",
+            **segment,
+            "category": category,
+            "max_slope": float(max_slope),
+            "min_slope": float(min_slope),
+        }
+
+    def to_frame(self):
+        """Los segmentos cerrados con las columnas de `detect_significant_segments`."""
+        seg_df = pd.DataFrame(self.segments)
+        if seg_df.empty:
+            return seg_df
+
+        seg_df["category"] = classify_climb_categories_strava(
+            seg_df["length_m"], np.abs(seg_df["avg_slope"])
+        )
+        extremes = np.array(self.extremes, dtype=np.float64)
+        seg_df["max_slope"] = extremes[:, 0]
+        seg_df["min_slope"] = extremes[:, 1]
+        return seg_df
+
+
+class LiveTrackAnalyzer:
+    """
+    Análisis de un track que crece punto a punto. Los parámetros de detección
+    son los de `detect_significant_segments` (p. ej. `**DETECTION_PRESETS[...]`)
+    y `smoothing_m` la ventana de `smoothed_grade`.
+    """
+
+    def __init__(
+        self,
+        smoothing_m: int = 300,
+        start_threshold_slope: float = 2.0,
+        end_threshold_slope: float = 1.0,
+        max_pause_length_m: int = 200,
+        max_pause_descent_m: int = 10,
+    ) -> None:
+        self.half_window_m = smoothing_m / 2
+        self.lat, self.lon, self.ele, self.times = [], [], [], []
+        self.distance, self.plot_grade = [], []
+        self.finished = False
+
+        # Sumas prefijas de la pendiente (NaN cuenta 0) para la ventana móvil
+        self._grade_sum, self._grade_count = [0.0], [0]
+        self._window_lo = 0
+
+        self._gain, self._loss = _ExactSum(), _ExactSum()
+        self._grade_total, self._grade_points = _ExactSum(), 0
+        self._moving, self._total_time = _ExactSum(), _ExactSum()
+        self._min_ele = self._max_ele = self._max_grade = np.nan
+
+        params = (
+            start_threshold_slope,
+            end_threshold_slope,
+            max_pause_length_m,
+            max_pause_descent_m,
+        )
+        self.trackers = {
+            kind: _SegmentTracker(self, kind, *params) for kind in ("climb", "descent")
+        }
+
+    def __len__(self) -> int:
+        return len(self.distance)
+
+    def append(self, lat, lon, ele, time=None):
+        """Añade un punto y devuelve los eventos que provoca (lista de dicts)."""
+        if self.finished:
+            raise RuntimeError("finish() was already called")
+
+        lat, lon, ele = float(lat), float(lon), float(ele)
+        t = _timestamp_ns(time)
+        i = len(self.distance)
+
+        if i == 0:
+            distance = 0.0
+            grade = 0.0
+            elev_diff = 0.0
+            duration = 0.0
+        else:
+            # Mismas operaciones que `consecutive_distances` + `Track.take`
+            step = haversine_distance([self.lat[-1]], [self.lon[-1]], [lat], [lon])[0]
+            distance = self.distance[-1] + step
+            step = distance - self.distance[-1]
+            elev_diff = ele - self.ele[-1]
+            grade = (elev_diff / step) * 100 if step > 0 else 0.0
+
+            previous = self.times[-1]
+            if t == _NAT or previous == _NAT:
+                duration = 0.0
+            else:
+                duration = (t - previous) / 1e9
+            if not duration < MAX_STEP_SECONDS:
+                duration = 0.0
+
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.ele.append(ele)
+        self.times.append(t)
+        self.distance.append(float(distance))
+        self._update_stats(i, elev_diff, grade, duration)
+        for tracker in self.trackers.values():
+            tracker.add_point(elev_diff)
+
+        valid = not math.isnan(grade)
+        self._grade_sum.append(self._grade_sum[-1] + (grade if valid else 0.0))
+        self._grade_count.append(self._grade_count[-1] + valid)
+
+        # Los puntos cuya ventana ya no puede cambiar tienen pendiente definitiva
+        events = []
+        while (
+            len(self.plot_grade) < i
+            and distance > self.distance[len(self.plot_grade)] + self.half_window_m
+        ):
+            events += self._finalize(len(self.plot_grade), i)
+        return events
+
+    def extend(self, points):
+        """Añade varios puntos `(lat, lon, ele[, time])`; devuelve todos los eventos."""
+        events = []
+        for point in points:
+            events += self.append(*point)
+        return events
+
+    def finish(self):
+        """Fin del track: fija la pendiente pendiente y cierra los segmentos."""
+        if self.finished:
+            return []
+        self.finished = True
+        events = []
+        n = len(self.distance)
+        while len(self.plot_grade) < n:
+            events += self._finalize(len(self.plot_grade), n)
+        for tracker in self.trackers.values():
+            event = tracker.finish()
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _finalize(self, j: int, hi: int):
+        """Pendiente suavizada de `j` con la ventana [lo, hi) de `smooth_grade_by_distance`."""
+        distance = self.distance
+        while distance[self._window_lo] < distance[j] - self.half_window_m:
+            self._window_lo += 1
+        lo = self._window_lo
+
+        count = self._grade_count[hi] - self._grade_count[lo]
+        grade = (
+            (self._grade_sum[hi] - self._grade_sum[lo]) / count if count > 0 else np.nan
+        )
+        self.plot_grade.append(grade)
+
+        events = []
+        for tracker in self.trackers.values():
+            event = tracker.feed(j, grade)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _update_stats(self, i, elev_diff, grade, duration) -> None:
+        if i:
+            if elev_diff > 0:
+                self._gain.add(elev_diff)
+            elif elev_diff < 0:
+                self._loss.add(elev_diff)
+        self._min_ele = np.fmin(self._min_ele, self.ele[-1])
+        self._max_ele = np.fmax(self._max_ele, self.ele[-1])
+        if not math.isnan(grade):
+            self._grade_total.add(grade)
+            self._grade_points += 1
+            self._max_grade = np.fmax(self._max_grade, grade)
+        if duration < MOVING_STEP_SECONDS:
+            self._moving.add(duration)
+        self._total_time.add(duration)
+
+    def stats(self) -> dict:
+        """Las estadísticas de `compute_gpx_stats` hasta el último punto."""
+        if not self.distance:
+            raise ValueError("No track points yet")
+
+        total_distance = np.float64(self.distance[-1])
+        num_points = len(self.distance)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            density_per_km = num_points / (total_distance / 1000)
+            density_per_100m = num_points / (total_distance / 100)
+
+        return {
+            "total_distance_km": total_distance / 1000,
+            "elevation_gain": self._gain.value,
+            "elevation_loss": -self._loss.value,
+            "min_elevation": self._min_ele,
+            "max_elevation": self._max_ele,
+            "average_grade": (
+                self._grade_total.value / self._grade_points
+                if self._grade_points
+                else np.nan
+            ),
+            "max_grade": self._max_grade,
+            "moving_time_min": self._moving.value / 60,
+            "total_time_min": self._total_time.value / 60,
+            "num_points": num_points,
+            "point_density_km": density_per_km,
+            "point_density_100m": density_per_100m,
+            "precision_score": min(100.0, (density_per_km / 20) * 100),
+        }
+
+    def segments(self, kind: str = "climb"):
+        """Segmentos ya cerrados de `kind`, como `detect_significant_segments`."""
+        return self.trackers[kind].to_frame()
+
+    def open_segment(self, kind: str = "climb"):
+        """Inicio (índice) del segmento de `kind` en curso, o None."""
+        tracker = self.trackers[kind]
+        return None if tracker.state == SEARCHING else tracker.start_idx
+
+    def to_frame(self):
+        """El track recibido con las columnas de `parse_gpx` (y `plot_grade`)."""
+        track = Track(
+            self.lat,
+            self.lon,
+            self.ele,
+            np.array(self.times, dtype=np.int64).view("M8[ns]"),
+            self.distance,
+        )
+        df = track.to_frame()
+        if len(self.plot_grade) == len(df):
+            df["plot_grade"] = np.array(self.plot_grade, dtype=np.float64)
+        return df
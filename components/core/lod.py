@@ -0,0 +1,117 @@
+# components/core/lod.py
+"""
+Pirámide de niveles de detalle (LOD) de un track.
+
+Se calcula una sola vez el orden de refinamiento del track entero (ver
+`simplify.refinement_order`); cada nivel es un prefijo de ese orden, de
+LEVEL_SIZES en adelante multiplicando por LEVEL_FACTOR hasta la resolución
+completa. Una consulta "puntos entre a y b metros, como mucho N" busca el
+nivel más grueso que tenga al menos N puntos en el rango (`searchsorted`) y se
+queda con los N más importantes de ese tramo: al acercarse a un tramo corto se
+baja de nivel y aparece el detalle, y el coste depende de N y no de la
+longitud del track.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from .simplify import refinement_order
+from .utils import _memo_key
+
+LEVEL_SIZES = (256, 1024, 4096)
+LEVEL_FACTOR = 4
+
+_PYRAMID_MEMO = OrderedDict()
+_PYRAMID_MEMO_SIZE = 16
+_PYRAMID_MEMO_LOCK = threading.Lock()
+
+
+class TrackPyramid:
+    """
+    Niveles simplificados de un track. `levels[k]` son los índices (ordenados)
+    de las filas del DataFrame original que sobreviven en el nivel k; tras el
+    último nivel viene el track completo. `ranks[i]` es la posición de la fila
+    i en el orden de refinamiento (0 = la más importante).
+    """
+
+    def __init__(self, df, level_sizes=LEVEL_SIZES, space: str = "both") -> None:
+        self.distance = df["distance"].to_numpy(dtype=np.float64)
+        self.num_points = len(df)
+
+        order = refinement_order(df, space=space)
+        self.ranks = np.empty(self.num_points, dtype=np.int64)
+        self.ranks[order] = np.arange(self.num_points)
+
+        sizes = sorted(level_sizes)
+        while sizes and sizes[-1] * LEVEL_FACTOR < self.num_points:
+            sizes.append(sizes[-1] * LEVEL_FACTOR)
+        self.levels = [np.sort(order[:size]) for size in sizes if size < len(order)]
+
+    def index_range(self, start_m=None, end_m=None):
+        """Filas [lo, hi) del track completo entre `start_m` y `end_m` metros."""
+        lo = 0 if start_m is None else np.searchsorted(self.distance, start_m, "left")
+        hi = (
+            self.num_points
+            if end_m is None
+            else np.searchsorted(self.distance, end_m, "right")
+        )
+        return int(lo), int(hi)
+
+    def query(self, start_m=None, end_m=None, max_points: int = 2000):
+        """
+        Índices (ordenados) de como mucho `max_points` puntos del rango de
+        distancias pedido. Si el rango cabe entero se devuelve a resolución
+        completa; si no, los puntos más importantes del rango (del nivel más
+        grueso que tenga bastantes), más los dos extremos del rango.
+        """
+        lo, hi = self.index_range(start_m, end_m)
+        if hi - lo <= max_points:
+            return np.arange(lo, hi)
+
+        budget = max(max_points - 2, 0)
+        candidates = np.arange(lo, hi)
+        for level in self.levels:
+            a, b = np.searchsorted(level, (lo, hi))
+            if b - a >= budget:
+                candidates = level[a:b]
+                break
+
+        if len(candidates) > budget:
+            ranks = self.ranks[candidates]
+            keep = np.argpartition(ranks, budget)[:budget] if budget else []
+            candidates = candidates[keep]
+        return np.union1d(candidates, [lo, hi - 1])
+
+    def info(self) -> dict:
+        return {
+            "points": self.num_points,
+            "levels": [len(level) for level in self.levels],
+        }
+
+
+def track_pyramid(df, level_sizes=LEVEL_SIZES) -> TrackPyramid:
+    """
+    Pirámide de `df`. Para tracks de la caché compartida (columnas de solo
+    lectura) se construye una vez y se reutiliza entre vistas y sesiones.
+    """
+    distance = df["distance"].to_numpy(dtype=np.float64)
+    key = _memo_key(distance)
+    if key is None:
+        return TrackPyramid(df, level_sizes)
+
+    memo_key = (key[:3], tuple(level_sizes))
+    with _PYRAMID_MEMO_LOCK:
+        entry = _PYRAMID_MEMO.get(memo_key)
+        if entry is not None and entry[0]() is key[3]:
+            _PYRAMID_MEMO.move_to_end(memo_key)
+            return entry[1]
+
+    pyramid = TrackPyramid(df, level_sizes)
+    with _PYRAMID_MEMO_LOCK:
+        _PYRAMID_MEMO[memo_key] = (weakref.ref(key[3]), pyramid)
+        if len(_PYRAMID_MEMO) > _PYRAMID_MEMO_SIZE:
+            _PYRAMID_MEMO.popitem(last=False)
+    return pyramid
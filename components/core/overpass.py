@@ -0,0 +1,375 @@
+# components/core/overpass.py
+"""
+Cliente de Overpass para descargar edificios alrededor de una ruta.
+
+- Hedging: cada consulta sale primero hacia un espejo y, si no ha respondido
+  en `hedge_delay_s` (o falla), también hacia el siguiente; gana la primera
+  respuesta válida. Un espejo lento ya no bloquea la pestaña 25 s.
+- Teselas: la zona se parte en teselas de una rejilla fija de `tile_deg`
+  grados y solo se piden las que toca la ruta, en paralelo. Las teselas se
+  guardan en una LRU compartida por todas las sesiones, así que dos rutas por
+  la misma zona reutilizan las descargas.
+- Prefetch: `prefetch()` lanza la descarga en segundo plano (p. ej. en cuanto
+  se carga el GPX) y la consulta posterior se une a las peticiones en curso.
+- Fallos: una tesela que no se ha podido descargar de ningún espejo se
+  recuerda `failed_tile_ttl_s` segundos; mientras tanto se devuelve el mismo
+  error sin volver a llamar a los espejos.
+- Conexiones: una `requests.Session` con pool de conexiones por espejo. Los
+  espejos se prueban en orden de latencia media observada. `requests` se
+  importa al crear el primer cliente, no al importar el módulo, para que la
+  app arranque sin cargarlo.
+
+Los espejos se pueden cambiar con GPX_OVERPASS_ENDPOINTS (separados por
+comas), por ejemplo para apuntar a un servidor local de pruebas.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from .building_store import _parse_number, route_tiles
+
+DEFAULT_ENDPOINTS = (
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass.openstreetmap.ru/api/interpreter",
+)
+OVERPASS_ENDPOINTS = tuple(
+    e.strip()
+    for e in os.environ.get(
+        "GPX_OVERPASS_ENDPOINTS", ",".join(DEFAULT_ENDPOINTS)
+    ).split(",")
+    if e.strip()
+)
+DEFAULT_TILE_DEG = 0.05
+DEFAULT_MAX_TILES = 256
+FAILED_TILE_TTL_S = 60
+BUILDING_COLUMNS = ["lat", "lon", "height", "levels"]
+PROGRESS_POLL_S = 0.25
+
+_QUERY = """
+[out:json][timeout:{timeout}];
+(
+    way["building"]({s},{w},{n},{e});
+    relation["building"]({s},{w},{n},{e});
+);
+out center;
+"""
+
+
+class OverpassError(RuntimeError):
+    """Todos los espejos han fallado; `errors` es {espejo: mensaje}."""
+
+    def __init__(self, errors) -> None:
+        self.errors = dict(errors)
+        detail = "; ".join(f"{url} — {msg}" for url, msg in self.errors.items())
+        super().__init__(f"All Overpass endpoints failed: {detail}")
+
+
+def buildings_frame(elements):
+    """
+    DataFrame de edificios (lat, lon, height, levels, osm_id) a partir de los
+    elementos de una respuesta `out center`.
+    """
+    rows = []
+    for el in elements:
+        lat = el.get("lat") or el.get("center", {}).get("lat")
+        lon = el.get("lon") or el.get("center", {}).get("lon")
+        if lat is None or lon is None:
+            continue
+        tags = el.get("tags", {})
+        rows.append(
+            (
+                lat,
+                lon,
+                _parse_number(tags.get("height")),
+                _parse_number(tags.get("building:levels"), int),
+                f"{el.get('type', '')}/{el.get('id', len(rows))}",
+            )
+        )
+    return pd.DataFrame(rows, columns=[*BUILDING_COLUMNS, "osm_id"])
+
+
+class OverpassClient:
+    """
+    Cliente con hedging entre espejos y caché LRU de teselas. Es seguro
+    compartirlo entre hilos; `close()` libera los pools.
+    """
+
+    def __init__(
+        self,
+        endpoints=OVERPASS_ENDPOINTS,
+        timeout: float = 25,
+        connect_timeout: float = 5,
+        hedge_delay_s: float = 2.0,
+        tile_deg: float = DEFAULT_TILE_DEG,
+        max_parallel_tiles: int = 4,
+        max_tiles: int = DEFAULT_MAX_TILES,
+        failed_tile_ttl_s: float = FAILED_TILE_TTL_S,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("At least one Overpass endpoint is required")
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.endpoints = tuple(endpoints)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.hedge_delay_s = hedge_delay_s
+        self.tile_deg = tile_deg
+        self.max_tiles = max_tiles
+        self.failed_tile_ttl_s = failed_tile_ttl_s
+
+        # Errores de una petición que cuentan como fallo del espejo
+        self._request_errors = (requests.RequestException, ValueError)
+        self._sessions = {}
+        for url in self.endpoints:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_parallel_tiles)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "GPX-Analyzer"
+            self._sessions[url] = session
+
+        # Dos pools: las teselas esperan a las peticiones, así que no pueden compartirlo
+        self._tile_pool = ThreadPoolExecutor(
+            max_parallel_tiles, thread_name_prefix="overpass-tile"
+        )
+        # Holgura para las peticiones perdedoras, que siguen hasta su timeout
+        self._request_pool = ThreadPoolExecutor(
+            2 * max_parallel_tiles * len(self.endpoints),
+            thread_name_prefix="overpass-request",
+        )
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self._in_flight = {}
+        # Teselas fallidas: {clave: (caduca, future con el error)}
+        self._failed = {}
+        self.counters = {
+            "requests": 0,
+            "hedged": 0,
+            "failed_requests": 0,
+            "tile_hits": 0,
+            "tile_downloads": 0,
+            "wins": dict.fromkeys(self.endpoints, 0),
+        }
+        # Latencia media (exponencial) de cada espejo: el más rápido sale primero
+        self.latency_s = dict.fromkeys(self.endpoints, 0.0)
+
+    # ───────────────────────── Peticiones
+
+    def _get(self, url, query):
+        start = time.perf_counter()
+        try:
+            response = self._sessions[url].post(
+                url,
+                data={"data": query},
+                timeout=(self.connect_timeout, self.timeout),
+            )
+            response.raise_for_status()
+            payload = response.json()
+            if not isinstance(payload, dict):  # p. ej. una lista o null
+                payload = {}
+            remark = payload.get("remark", "")
+            if "elements" not in payload or "runtime error" in remark:
+                raise ValueError(remark or "Unexpected Overpass response")
+        except Exception:
+            # Un fallo cuenta como una respuesta tan lenta como el timeout
+            self._record_latency(url, self.timeout)
+            raise
+        self._record_latency(url, time.perf_counter() - start)
+        return payload
+
+    def _record_latency(self, url, seconds) -> None:
+        with self._lock:
+            self.latency_s[url] = 0.7 * self.latency_s[url] + 0.3 * seconds
+
+    def query(self, query):
+        """
+        Respuesta JSON de la primera petición válida. Se lanza un espejo más
+        cada `hedge_delay_s` sin respuesta, o en cuanto uno falla; si fallan
+        todos se lanza `OverpassError` con el error de cada uno.
+        """
+        pending, errors = {}, {}
+        with self._lock:
+            remaining = sorted(self.endpoints, key=self.latency_s.get)
+
+        def launch():
+            url = remaining.pop(0)
+            future = self._request_pool.submit(self._get, url, query)
+            pending[future] = (url, time.perf_counter())
+            with self._lock:
+                self.counters["requests"] += 1
+                self.counters["hedged"] += len(pending) > 1
+
+        launch()
+        while pending:
+            done, _ = wait(
+                pending,
+                timeout=self.hedge_delay_s if remaining else None,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                launch()
+                continue
+            # Primero las que han ido bien: no hace falta lanzar otro espejo
+            for future in sorted(done, key=lambda f: f.exception() is not None):
+                url, _ = pending.pop(future)
+                try:
+                    payload = future.result()
+                except self._request_errors as e:
+                    errors[url] = f"{type(e).__name__}: {e}"
+                    with self._lock:
+                        self.counters["failed_requests"] += 1
+                    if remaining:
+                        launch()
+                    continue
+                # Las demás peticiones terminan solas y su resultado se ignora;
+                # ya sabemos que son más lentas que la ganadora
+                now = time.perf_counter()
+                for other, (other_url, launched) in pending.items():
+                    other.cancel()
+                    self._record_latency(other_url, now - launched)
+                with self._lock:
+                    self.counters["wins"][url] += 1
+                return payload
+        raise OverpassError(errors)
+
+    def fetch_bbox(self, bbox):
+        """Edificios de la caja (min_lat, min_lon, max_lat, max_lon)."""
+        s, w, n, e = bbox
+        query = _QUERY.format(s=s, w=w, n=n, e=e, timeout=int(self.timeout))
+        return buildings_frame(self.query(query)["elements"])
+
+    # ───────────────────────── Teselas
+
+    def _tile_bbox(self, key):
+        i, j = key
+        return (
+            round(i * self.tile_deg, 6),
+            round(j * self.tile_deg, 6),
+            round((i + 1) * self.tile_deg, 6),
+            round((j + 1) * self.tile_deg, 6),
+        )
+
+    def _download_tile(self, key):
+        buildings = self.fetch_bbox(self._tile_bbox(key))
+        with self._lock:
+            self._tiles[key] = buildings
+            self.counters["tile_downloads"] += 1
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return buildings
+
+    def _tile_future(self, key, count_hit: bool = True):
+        """
+        Tesela en caché (ya resuelta), en curso, fallida hace poco (el future
+        con su error) o una descarga nueva.
+        """
+        with self._lock:
+            buildings = self._tiles.get(key)
+            if buildings is not None:
+                self._tiles.move_to_end(key)
+                self.counters["tile_hits"] += count_hit
+                return buildings
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            failed = self._failed.get(key)
+            if failed is not None:
+                if failed[0] > time.monotonic():
+                    return failed[1]
+                del self._failed[key]
+            future = self._in_flight[key] = self._tile_pool.submit(
+                self._download_tile, key
+            )
+        # Fuera del lock: si ya ha terminado, el callback se ejecuta aquí mismo
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key, future) -> None:
+        failed = not future.cancelled() and future.exception() is not None
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+                if failed:
+                    expires = time.monotonic() + self.failed_tile_ttl_s
+                    self._failed[key] = (expires, future)
+
+    def prefetch(self, lats, lons, radius: int = 10) -> int:
+        """
+        Lanza en segundo plano la descarga de las teselas de la ruta. Las que
+        ya están en caché no cuentan como aciertos.
+        """
+        keys = route_tiles(lats, lons, self.tile_deg, radius)
+        for key in keys:
+            self._tile_future(key, count_hit=False)
+        return len(keys)
+
+    def buildings_near(self, lats, lons, radius: int = 10, progress=None):
+        """
+        Edificios de todas las teselas que toca la ruta (ampliada en `radius`
+        metros), sin duplicados. Lanza `OverpassError` si alguna tesela no se
+        ha podido descargar de ningún espejo (ahora o en los últimos
+        `failed_tile_ttl_s` segundos).
+
+        `progress(hechas, total)` se llama al menos cada PROGRESS_POLL_S
+        mientras se espera, para que quien llama pueda informar o cancelar
+        (p. ej. lanzando una excepción desde el callback). Las descargas ya
+        lanzadas terminan igualmente y quedan en la caché de teselas.
+        """
+        results = [
+            self._tile_future(key)
+            for key in route_tiles(lats, lons, self.tile_deg, radius)
+        ]
+        pending = {r for r in results if not isinstance(r, pd.DataFrame)}
+        while pending and progress is not None:
+            progress(len(results) - len(pending), len(results))
+            _, pending = wait(
+                pending, timeout=PROGRESS_POLL_S, return_when=FIRST_COMPLETED
+            )
+        if progress is not None:
+            progress(len(results), len(results))
+        frames = [r if isinstance(r, pd.DataFrame) else r.result() for r in results]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=BUILDING_COLUMNS)
+
+        # Un edificio que cruza el borde de dos teselas llega en las dos
+        buildings = pd.concat(frames, ignore_index=True)
+        buildings = buildings.drop_duplicates("osm_id", ignore_index=True)
+        return buildings[BUILDING_COLUMNS]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "wins": dict(self.counters["wins"]),
+                "latency_s": dict(self.latency_s),
+                "tiles_cached": len(self._tiles),
+                "tiles_in_flight": len(self._in_flight),
+                "tiles_failed": len(self._failed),
+            }
+
+    def close(self) -> None:
+        self._tile_pool.shutdown(wait=False, cancel_futures=True)
+        self._request_pool.shutdown(wait=False, cancel_futures=True)
+        for session in self._sessions.values():
+            session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_overpass_client() -> OverpassClient:
+    """Cliente compartido por proceso (caché de teselas común a las sesiones)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OverpassClient()
+        return _client
@@ -0,0 +1,228 @@
+# components/core/pipeline.py
+"""
+Pipeline de la app en etapas con memoización por dependencias.
+
+Cada etapa se identifica por una clave calculada a partir de su nombre, las
+claves de las etapas de las que depende y sus parámetros (los valores de los
+widgets que la afectan). Si cambia un widget, solo cambian las claves de las
+etapas que lo usan y de las que cuelgan de ellas; el resto sale de la caché.
+
+    run = PipelineRun()
+    gpx = run.source("gpx", content_key(gpx_data), gpx_data)
+    parsed = run.stage("parse", cached_parse_gpx, gpx, key=gpx.key)
+    ...
+    run.summary()  # {"stages": 5, "hits": 4, "computed_s": 0.012, ...}
+
+Los resultados se comparten entre sesiones: los DataFrames se guardan
+congelados (solo lectura) y cada acierto devuelve una copia superficial, así
+que una sesión puede añadir columnas a su copia pero no modificar los datos
+que ven las demás. Por eso una etapa no debe devolver objetos mutables que
+cada sesión vaya a modificar (un mapa folium, una figura): se guarda lo ya
+renderizado (HTML, PNG) y se pinta en cada sesión.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .cache import freeze_frame, is_frozen
+from .profiler import clock_ns, span
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _share(value):
+    """Copia superficial de los DataFrames (también dentro de tuplas/listas)."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, (tuple, list)):
+        return type(value)(_share(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _share(v) for k, v in value.items()}
+    return value
+
+
+def _freeze(value):
+    """Deja de solo lectura los DataFrames que se van a compartir."""
+    if isinstance(value, pd.DataFrame):
+        if not is_frozen(value):
+            freeze_frame(value)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
+    return value
+
+
+def _nbytes(value) -> int:
+    """
+    Tamaño aproximado: DataFrames (con el contenido de las columnas de
+    objetos), arrays, bytes y texto por su contenido; cualquier otro objeto,
+    por lo que dice `sys.getsizeof` (sin lo que referencia).
+    """
+    if isinstance(value, pd.DataFrame):
+        # Lo mismo que memory_usage(deep=True), que falla con columnas de
+        # objetos de solo lectura (las de un frame ya congelado)
+        objects = value.select_dtypes(include=object).to_numpy().ravel()
+        return int(value.memory_usage(deep=False).sum()) + sum(
+            sys.getsizeof(v) for v in objects
+        )
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+def stage_key(name, input_keys=(), params=None) -> str:
+    """Clave de una etapa: nombre + claves de sus entradas + parámetros."""
+    digest = hashlib.sha256(name.encode())
+    for key in input_keys:
+        digest.update(b"\0" + key.encode())
+    for param, value in sorted((params or {}).items()):
+        digest.update(f"\0{param}={value!r}".encode())
+    return digest.hexdigest()
+
+
+class StageResult:
+    __slots__ = ("key", "name", "value")
+
+    def __init__(self, name, key, value) -> None:
+        self.name = name
+        self.key = key
+        self.value = value
+
+
+class StageCache:
+    """
+    LRU de resultados de etapas compartida por todas las sesiones del proceso,
+    acotada en número de entradas y en bytes (aproximados).
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(True, valor) si está en caché; (False, None) si no."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key][0]
+        return True, _share(value)
+
+    def put(self, key, value):
+        _freeze(value)
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries
+                or self.current_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return _share(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_stage_cache = StageCache()
+
+
+def get_stage_cache() -> StageCache:
+    return _stage_cache
+
+
+class PipelineRun:
+    """
+    Una ejecución del pipeline (un rerun de Streamlit). Guarda, por etapa, si
+    salió de la caché y cuánto tardó; cada etapa es además un span de la
+    traza activa.
+    """
+
+    def __init__(self, cache=None) -> None:
+        self.cache = cache or get_stage_cache()
+        self.records = []
+
+    def source(self, name, key, value) -> StageResult:
+        """Entrada externa (p. ej. el contenido del GPX) con su clave."""
+        return StageResult(name, key, value)
+
+    def stage(self, name, func, *inputs, progress=None, **params) -> StageResult:
+        """
+        Resultado de `func(*valores de inputs, **params)`, recalculado solo si
+        cambia alguna entrada o algún parámetro. `progress`, si se da, se pasa
+        a `func` tal cual y no forma parte de la clave. Si `func` se
+        interrumpe (excepción), no se guarda nada y el siguiente rerun la
+        vuelve a calcular.
+        """
+        key = stage_key(name, [i.key for i in inputs], params)
+        start = clock_ns()
+        hit, value = self.cache.get(key)
+        with span(f"Stage {name}", cached=hit):
+            if not hit:
+                if progress is not None:
+                    params = {**params, "progress": progress}
+                value = self.cache.put(key, func(*(i.value for i in inputs), **params))
+        self.records.append((name, hit, (clock_ns() - start) / 1e9))
+        return StageResult(name, key, value)
+
+    def summary(self) -> dict:
+        computed = [r for r in self.records if not r[1]]
+        return {
+            "stages": len(self.records),
+            "hits": len(self.records) - len(computed),
+            "computed": [r[0] for r in computed],
+            "computed_s": sum(r[2] for r in computed),
+            "total_s": sum(r[2] for r in self.records),
+        }
+
+    def describe(self) -> str:
+        """Una línea para la UI: qué etapas salieron de la caché y cuánto costó el resto."""
+        parts = [
+            f"{name} ✓" if hit else f"{name} {elapsed * 1000:.0f} ms"
+            for name, hit, elapsed in self.records
+        ]
+        summary = self.summary()
+        return f"{summary['hits']}/{summary['stages']} stages cached · " + " · ".join(
+            parts
+        )
@@ -1,18 +1,331 @@
+# components/core/profiler.py
+"""
+Instrumentación por spans anidados.
+
+    with span("Detect climbs"):
+        ...
+
+    @profiled("parse_gpx")
+    def parse_gpx(...): ...
+
+Los spans se guardan en la `Trace` activa del contexto actual (una por sesión
+de Streamlit o por petición). Sin traza activa, `span` no hace nada más que
+leer una ContextVar, así que la instrumentación puede quedarse siempre puesta.
+`Trace.flush()` entrega una copia del buffer a un hilo escritor en segundo
+plano que genera el log de texto y un JSON de trace events de Chrome
+(abrible en chrome://tracing o en https://ui.perfetto.dev).
+
+Escribir trazas a disco es opcional: solo se hace si GPX_PROFILE_DIR indica
+un directorio, y en él se conservan las de las últimas GPX_PROFILE_KEEP
+trazas (por defecto MAX_TRACE_FILES); las más antiguas se borran. Todos los
+ficheros llevan el prefijo TRACE_PREFIX y solo esos se borran, así que el
+directorio se puede compartir con otros logs.
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
 import time
+from collections import deque
+
+# Reloj monotónico en ns (no le afectan los cambios de hora del sistema)
+clock_ns = time.perf_counter_ns
+
+# Sin directorio no se escribe nada (las trazas siguen en memoria)
+PROFILE_DIR = os.environ.get("GPX_PROFILE_DIR") or None
+MAX_TRACE_FILES = 50
+PROFILE_KEEP = int(os.environ.get("GPX_PROFILE_KEEP", MAX_TRACE_FILES))
+TRACE_PREFIX = "gpx-trace-"
+TRACE_SUFFIXES = (".log", ".trace.json")
+DEFAULT_MAX_SPANS = 10_000
+LOG_HEADER = "---- GPX Analyzer Execution Log ----"
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar("gpx_trace", default=None)
+_trace_ids = itertools.count(1)
+
+
+class Trace:
+    """
+    Buffer de spans terminados de una sesión. Cada span es una tupla
+    (nombre, inicio_ns, fin_ns, profundidad, id de hilo, args). El buffer está
+    acotado a `max_spans`: se descartan los más antiguos.
+    """
+
+    def __init__(self, name=None, max_spans: int = DEFAULT_MAX_SPANS) -> None:
+        self.name = name or f"trace-{os.getpid()}-{next(_trace_ids)}"
+        self.origin_ns = clock_ns()
+        self.spans = deque(maxlen=max_spans)
+        self._local = threading.local()
+
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def _set_depth(self, depth: int) -> None:
+        self._local.depth = depth
+
+    def record(self, name, start_ns, end_ns, depth=None, args=None) -> None:
+        self.spans.append(
+            (
+                name,
+                start_ns,
+                end_ns,
+                self._depth() if depth is None else depth,
+                threading.get_ident(),
+                args,
+            )
+        )
+
+    def span(self, name, **args):
+        return _Span(self, name, args or None)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def to_text(self) -> str:
+        """El mismo formato que el antiguo execution_log.txt, indentado por nivel."""
+        lines = [LOG_HEADER]
+        for name, start, end, depth, _, _ in sorted(self.spans, key=lambda s: s[1]):
+            lines.append(f"{'  ' * depth}[TIME] {name}: {(end - start) / 1e9:.3f} s")
+        return "\n".join(lines) + "\n"
+
+    def to_chrome(self) -> dict:
+        """Trace events completos ("ph": "X") con tiempos en microsegundos."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": self.name},
+            }
+        ]
+        for name, start, end, _, tid, args in self.spans:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin_ns) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = {k: _jsonable(v) for k, v in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def flush(self, directory=None) -> None:
+        """
+        Encola la escritura de `gpx-trace-<nombre>.log` y
+        `gpx-trace-<nombre>.trace.json` en `directory` (o PROFILE_DIR). Sin
+        directorio no hace nada.
+        """
+        directory = directory or PROFILE_DIR
+        if not directory:
+            return
+        base = os.path.join(directory, TRACE_PREFIX + _safe_filename(self.name))
+        get_writer().submit(
+            [
+                (base + ".log", self.to_text()),
+                (base + ".trace.json", json.dumps(self.to_chrome())),
+            ]
+        )
+
+
+class _Span:
+    __slots__ = ("args", "depth", "name", "start", "trace")
+
+    def __init__(self, trace, name, args) -> None:
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.depth = self.trace._depth()
+        self.trace._set_depth(self.depth + 1)
+        self.start = clock_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end = clock_ns()
+        self.trace._set_depth(self.depth)
+        self.trace.record(self.name, self.start, end, self.depth, self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """Context manager que mide `name` en la traza activa (o no hace nada)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, args or None)
+
+
+def profiled(name=None):
+    """Decorador: cada llamada a la función es un span."""
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Span(trace, label, None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    if callable(name):
+        func, name = name, None
+        return decorator(func)
+    return decorator
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def activate(trace):
+    """Hace de `trace` la traza activa del contexto actual. Devuelve un token."""
+    return _current_trace.set(trace)
+
+
+def deactivate(token) -> None:
+    _current_trace.reset(token)
+
+
+class use_trace:
+    """`with use_trace(trace):` activa la traza solo dentro del bloque."""
+
+    def __init__(self, trace) -> None:
+        self.trace = trace
+
+    def __enter__(self):
+        self._token = activate(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        deactivate(self._token)
+        return False
 
 
 class Timer:
-    def __init__(self, log_file: str = "execution_log.txt") -> None:
-        self.start = time.perf_counter()
-        self.log_file = log_file
-        with open(self.log_file, "w") as f:
-            f.write("---- GPX Analyzer Execution Log ----\n")
+    """
+    Cronómetro por vueltas: cada `log(label)` registra un span con el tiempo
+    desde la vuelta anterior en la traza activa y lo manda al logger.
+    """
+
+    def __init__(self, trace=None) -> None:
+        self.trace = trace or _current_trace.get()
+        self.start = clock_ns()
 
     def log(self, label: str) -> None:
-        now = time.perf_counter()
-        elapsed = now - self.start
-        message = f"[⏱️] {label}: {elapsed:.3f} s"
-        print(message)
-        with open(self.log_file, "a") as f:
-            f.write(message + "\n")
+        now = clock_ns()
+        logger.info("[TIME] %s: %.3f s", label, (now - self.start) / 1e9)
+        if self.trace is not None:
+            self.trace.record(label, self.start, now)
         self.start = now
+
+
+class TraceWriter:
+    """
+    Hilo daemon que escribe a disco lo que le encolan las trazas y deja en
+    cada directorio solo las `keep` trazas más recientes.
+    """
+
+    def __init__(self, keep: int = PROFILE_KEEP) -> None:
+        self.keep = keep
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="trace-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, files) -> None:
+        self._queue.put(files)
+
+    def drain(self) -> None:
+        """Espera a que se hayan escrito todas las trazas encoladas."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            files = self._queue.get()
+            try:
+                for path, content in files:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    tmp = f"{path}.tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.write(content)
+                    os.replace(tmp, path)
+                for directory in {os.path.dirname(path) or "." for path, _ in files}:
+                    self._prune(directory)
+            except OSError as e:
+                logger.warning("could not write trace: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _prune(self, directory) -> None:
+        """
+        Borra los ficheros de las trazas más antiguas por encima de `keep`.
+        Solo cuenta los que ha escrito un TraceWriter (prefijo TRACE_PREFIX).
+        """
+        traces = {}
+        for entry in os.scandir(directory):
+            if not entry.name.startswith(TRACE_PREFIX) or not entry.is_file():
+                continue
+            for suffix in TRACE_SUFFIXES:
+                if entry.name.endswith(suffix):
+                    base = entry.name[: -len(suffix)]
+                    mtime = entry.stat().st_mtime_ns
+                    traces[base] = max(traces.get(base, 0), mtime)
+        oldest = sorted(traces, key=traces.get)[: max(len(traces) - self.keep, 0)]
+        for base in oldest:
+            for suffix in TRACE_SUFFIXES:
+                try:
+                    os.remove(os.path.join(directory, base + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> TraceWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TraceWriter()
+        return _writer
+
+
+def _safe_filename(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(name))
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
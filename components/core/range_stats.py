@@ -0,0 +1,100 @@
+# components/core/range_stats.py
+"""
+Estadísticas de rango en O(1) sobre una serie del track (p. ej. plot_grade).
+
+Máximo y mínimo con una sparse table (O(n log n) de preparación) y suma/media
+con sumas prefijas. Todas las consultas aceptan arrays de rangos, así que los
+segmentos detectados o cualquier tramo elegido por el usuario se resuelven de
+una vez sin bucles en Python. Los NaN se ignoran, como en `Series.max()`.
+"""
+
+import numpy as np
+
+
+class SparseTable:
+    """`op` (np.fmax o np.fmin) de cualquier rango cerrado [lo, hi] en O(1)."""
+
+    def __init__(self, values, op=np.fmax) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        self.op = op
+        self.num_levels = max(int(n).bit_length(), 1)
+        # table[k, i] = op(values[i : i + 2**k]); el relleno NaN nunca se consulta
+        self.table = np.full((self.num_levels, n), np.nan)
+        if n:
+            self.table[0] = values
+        for k in range(1, self.num_levels):
+            half = 1 << (k - 1)
+            prev = self.table[k - 1]
+            self.table[k, : n - 2 * half + 1] = op(
+                prev[: n - 2 * half + 1], prev[half : n - half + 1]
+            )
+
+    def query(self, lo, hi):
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        level = np.log2(np.maximum(hi - lo + 1, 1)).astype(np.int64)
+        return self.op(self.table[level, lo], self.table[level, hi - (1 << level) + 1])
+
+
+class RangeStats:
+    """
+    Índice de rangos sobre `values`. Los rangos son índices cerrados
+    [lo, hi], igual que start_idx/end_idx de los segmentos; con `distance` se
+    pueden consultar también por metros.
+    """
+
+    def __init__(self, values, distance=None) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self._max = SparseTable(values, np.fmax)
+        self._min = SparseTable(values, np.fmin)
+        self._sum = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+        self._count = np.concatenate(([0], np.cumsum(valid)))
+        self.distance = (
+            None if distance is None else np.asarray(distance, dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self._count) - 1
+
+    def max(self, lo, hi):
+        return self._max.query(lo, hi)
+
+    def min(self, lo, hi):
+        return self._min.query(lo, hi)
+
+    def sum(self, lo, hi):
+        return self._sum[np.asarray(hi) + 1] - self._sum[np.asarray(lo)]
+
+    def count(self, lo, hi):
+        return self._count[np.asarray(hi) + 1] - self._count[np.asarray(lo)]
+
+    def mean(self, lo, hi):
+        count = self.count(lo, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(count > 0, self.sum(lo, hi) / count, np.nan)
+
+    def index_range(self, start_m, end_m):
+        """Rango cerrado de índices cuyos puntos están entre start_m y end_m."""
+        if self.distance is None:
+            raise ValueError("RangeStats was built without distances")
+        lo = np.searchsorted(self.distance, start_m, side="left")
+        hi = np.searchsorted(self.distance, end_m, side="right") - 1
+        return lo, hi
+
+    def span(self, start_m, end_m) -> dict:
+        """Mínimo, máximo y media entre dos distancias (en metros)."""
+        lo, hi = self.index_range(start_m, end_m)
+        if hi < lo:
+            return {"min": np.nan, "max": np.nan, "mean": np.nan, "points": 0}
+        return {
+            "min": float(self.min(lo, hi)),
+            "max": float(self.max(lo, hi)),
+            "mean": float(self.mean(lo, hi)),
+            "points": int(hi - lo + 1),
+        }
+
+
+def grade_range_stats(df, column: str = "plot_grade") -> RangeStats:
+    return RangeStats(df[column].to_numpy(dtype=np.float64), df["distance"])
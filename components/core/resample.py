@@ -0,0 +1,227 @@
+# components/core/resample.py
+"""
+Remuestreo de un track sobre una rejilla uniforme de tiempo o de distancia.
+
+`resample()` interpola linealmente todos los canales a la vez (una sola
+búsqueda de índices para la matriz de canales) sobre una rejilla de paso
+fijo, con:
+
+- huecos explícitos: si dos puntos consecutivos de la entrada están más lejos
+  que `max_gap`, las muestras entre ellos quedan a NaN y `gap` a True en vez
+  de inventar una recta entre ambos;
+- suavizado opcional: media móvil centrada de `window` (en unidades del eje)
+  que ignora los NaN, así que no arrastra los huecos a sus vecinos;
+- número de puntos acotado: con `max_points` el paso crece lo necesario.
+
+`resample_by_time()` y `resample_by_distance()` preparan los ejes de un
+DataFrame del parser y derivan velocidad y ritmo de la serie ya uniforme, sin
+las divisiones entre deltas de tiempo nulos o diminutos de los puntos crudos.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .geodesy import cumulative_distance
+
+DEFAULT_TIME_STEP_S = 1.0
+DEFAULT_DISTANCE_STEP_M = 10.0
+# Diez minutos sin puntos: el dispositivo dejó de grabar. Más cerca no se puede
+# afinar porque los tracks del parser están simplificados (hay tramos rectos de
+# varios minutos entre dos puntos conservados)
+DEFAULT_MAX_GAP_S = 600.0
+# Por debajo de esta velocidad no tiene sentido hablar de ritmo (parado)
+MIN_MOVING_KMH = 1.0
+
+
+def grid_step(span, step, max_points=None) -> float:
+    """`step`, ampliado si hace falta para que la rejilla no pase de `max_points`."""
+    if step <= 0:
+        raise ValueError("step must be positive")
+    if max_points is not None and max_points > 1:
+        step = max(step, span / (max_points - 1))
+    return float(step)
+
+
+def moving_average(values, samples: int):
+    """
+    Media móvil centrada de `samples` muestras por columna, ignorando los NaN.
+    Las muestras NaN siguen siendo NaN (los huecos no se rellenan).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if samples <= 1 or len(values) == 0:
+        return values.copy()
+    column = values.ndim == 1
+    if column:
+        values = values[:, None]
+
+    n = len(values)
+    valid = np.isfinite(values)
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.vstack((zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)))
+    counts = np.vstack((zeros, np.cumsum(valid, axis=0)))
+    half = samples // 2
+    lo = np.clip(np.arange(n) - half, 0, n)
+    hi = np.clip(np.arange(n) - half + samples, 0, n)
+    window_counts = counts[hi] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = (sums[hi] - sums[lo]) / window_counts
+    smoothed[~valid] = np.nan
+    return smoothed[:, 0] if column else smoothed
+
+
+def resample(
+    axis,
+    channels,
+    step,
+    max_gap=None,
+    window=None,
+    max_points=None,
+    axis_name: str = "x",
+):
+    """
+    DataFrame con `axis_name` en una rejilla uniforme (desde el primer valor
+    del eje, de `step` en `step`), cada canal de `channels` ({nombre: array})
+    interpolado sobre ella y la columna booleana `gap`.
+
+    El eje tiene que ser no decreciente; los valores no finitos se descartan y
+    de varios puntos con el mismo valor del eje se queda el último.
+    """
+    axis = np.asarray(axis, dtype=np.float64)
+    names = list(channels)
+    values = np.empty((len(axis), len(names)))
+    for i, name in enumerate(names):
+        values[:, i] = np.asarray(channels[name], dtype=np.float64)
+
+    keep = np.isfinite(axis)
+    axis, values = axis[keep], values[keep]
+    if np.any(axis[1:] < axis[:-1]):
+        raise ValueError("axis must be non-decreasing")
+    last = np.ones(len(axis), dtype=bool)
+    last[:-1] = axis[1:] != axis[:-1]
+    axis, values = axis[last], values[last]
+    if len(axis) < 2:
+        return pd.DataFrame(columns=[axis_name, *names, "gap"])
+
+    step = grid_step(axis[-1] - axis[0], step, max_points)
+    grid = axis[0] + np.arange(int((axis[-1] - axis[0]) // step) + 1) * step
+
+    # Punto de la entrada a cada lado de cada muestra; sin duplicados, width > 0
+    right = np.clip(np.searchsorted(axis, grid, side="right"), 1, len(axis) - 1)
+    left = right - 1
+    width = axis[right] - axis[left]
+    weight = (grid - axis[left]) / width
+    out = values[left] + weight[:, None] * (values[right] - values[left])
+
+    gap = np.zeros(len(grid), dtype=bool)
+    if max_gap is not None:
+        gap = (width > max_gap) & (grid > axis[left]) & (grid < axis[right])
+        out[gap] = np.nan
+    if window:
+        out = moving_average(out, round(window / step))
+
+    frame = pd.DataFrame({axis_name: grid}, copy=False)
+    for i, name in enumerate(names):
+        frame[name] = out[:, i]
+    frame["gap"] = gap
+    return frame
+
+
+def _track_axes(df):
+    """
+    Segundos desde el inicio (no decrecientes), distancia acumulada (m), lat y
+    lon de los puntos con hora válida.
+    """
+    timestamp = pd.to_datetime(df["time"], errors="coerce")
+    valid = timestamp.notna().to_numpy()
+    if not valid.any():
+        return (np.empty(0),) * 4
+    seconds = (timestamp - timestamp[valid].iloc[0]).dt.total_seconds().to_numpy()
+    # Reutilizamos la distancia acumulada del parser si viene en el DataFrame
+    if "distance" in df.columns:
+        distance = df["distance"].to_numpy(dtype=np.float64)
+    else:
+        distance = cumulative_distance(df["lat"], df["lon"], method="vincenty")
+    lat = df["lat"].to_numpy(dtype=np.float64)
+    lon = df["lon"].to_numpy(dtype=np.float64)
+    distance = distance[valid] - distance[valid][0]
+    # Una hora que va hacia atrás se trata como repetida (se queda el último punto)
+    seconds = np.maximum.accumulate(seconds[valid])
+    return seconds, distance, lat[valid], lon[valid]
+
+
+def _pace(speed_kmh):
+    """Ritmo en min/km; NaN si se está parado."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(speed_kmh >= MIN_MOVING_KMH, 60 / speed_kmh, np.nan)
+
+
+def resample_by_time(
+    df,
+    step_s: float = DEFAULT_TIME_STEP_S,
+    max_gap_s: float = DEFAULT_MAX_GAP_S,
+    window_s=None,
+    max_points=None,
+):
+    """
+    Track en una rejilla de tiempo: seconds, distance, lat, lon, gap,
+    speed_kmh y pace_min_per_km. La velocidad es la derivada de la distancia
+    interpolada (suavizada con `window_s` si se pide).
+    """
+    if df.empty or "time" not in df.columns:
+        return resample([], {}, step_s, axis_name="seconds")
+    seconds, distance, lat, lon = _track_axes(df)
+    frame = resample(
+        seconds,
+        {"distance": distance, "lat": lat, "lon": lon},
+        step_s,
+        max_gap=max_gap_s,
+        max_points=max_points,
+        axis_name="seconds",
+    )
+    if len(frame) < 2:
+        return frame
+
+    step = frame["seconds"].iloc[1] - frame["seconds"].iloc[0]
+    speed = np.gradient(frame["distance"].to_numpy(), step) * 3.6
+    if window_s:
+        speed = moving_average(speed, round(window_s / step))
+    frame["speed_kmh"] = speed
+    frame["pace_min_per_km"] = _pace(speed)
+    return frame
+
+
+def resample_by_distance(
+    df,
+    step_m: float = DEFAULT_DISTANCE_STEP_M,
+    max_gap_m=None,
+    window_m=None,
+    max_points=None,
+):
+    """
+    Track en una rejilla de distancia: distance, seconds, lat, lon, gap,
+    speed_kmh y pace_min_per_km. Una pausa sin movimiento aparece como una
+    muestra muy lenta (sin ritmo), no como un pico.
+    """
+    if df.empty or "time" not in df.columns:
+        return resample([], {}, step_m, axis_name="distance")
+    seconds, distance, lat, lon = _track_axes(df)
+    frame = resample(
+        distance,
+        {"seconds": seconds, "lat": lat, "lon": lon},
+        step_m,
+        max_gap=max_gap_m,
+        max_points=max_points,
+        axis_name="distance",
+    )
+    if len(frame) < 2:
+        return frame
+
+    step = frame["distance"].iloc[1] - frame["distance"].iloc[0]
+    seconds_per_m = np.gradient(frame["seconds"].to_numpy(), step)
+    if window_m:
+        seconds_per_m = moving_average(seconds_per_m, round(window_m / step))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(seconds_per_m > 0, 3.6 / seconds_per_m, np.nan)
+    frame["speed_kmh"] = speed
+    frame["pace_min_per_km"] = _pace(speed)
+    return frame
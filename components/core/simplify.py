@@ -0,0 +1,222 @@
+# components/core/simplify.py
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+# Por debajo de este número de puntos la eliminación es exacta, uno a uno
+EXACT_POINTS = 8192
+
+
+def _horizontal_xy(lat, lon):
+    """Proyección equirectangular local en metros (suficiente a escala de ruta)."""
+    lat_rad = np.radians(lat)
+    lat0 = np.nanmean(lat_rad)
+    x = EARTH_RADIUS_M * np.radians(lon) * np.cos(lat0)
+    y = EARTH_RADIUS_M * lat_rad
+    return x, y
+
+
+def _segment_errors(px, py, dx, dy):
+    """Distancia de (px, py) al segmento (0, 0)-(dx, dy), todo relativo al inicio."""
+    seg_len2 = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(seg_len2 > 0, (px * dx + py * dy) / seg_len2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - t * dx, py - t * dy)
+
+
+def _profile_errors(d, e, span, rise):
+    """Error vertical de (d, e) respecto a la cuerda (0, 0)-(span, rise)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(span > 0, d / span, 0.0)
+    return np.abs(e - frac * rise)
+
+
+def _chord_errors(x, y, distance, ele, i, p, q):
+    """Importancia de los puntos `i` respecto a la cuerda entre `p` y `q`."""
+    return np.fmax(
+        _segment_errors(x[i] - x[p], y[i] - y[p], x[q] - x[p], y[q] - y[p]),
+        _profile_errors(
+            distance[i] - distance[p],
+            ele[i] - ele[p],
+            distance[q] - distance[p],
+            ele[q] - ele[p],
+        ),
+    )
+
+
+def _alternate(mask):
+    """Uno sí y uno no de cada racha de True de `mask` (nunca dos contiguos)."""
+    starts = mask & ~np.concatenate([[False], mask[:-1]])
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(len(mask)), 0))
+    return mask & ((np.arange(len(mask)) - run_start) % 2 == 0)
+
+
+def simplify_indices(
+    df,
+    max_points: int | None = None,
+    tolerance_m: float | None = None,
+    space: str = "both",
+):
+    """
+    Simplificación por eliminación (Visvalingam-Whyatt): se quita cada vez el
+    punto menos importante y se recalcula la importancia de sus dos vecinos,
+    hasta quedar en `max_points` puntos o hasta que el menos importante
+    supere `tolerance_m`.
+
+    La importancia de un punto es su error, en metros, respecto a la cuerda
+    entre sus vecinos actuales; `space` elige dónde se mide:
+      - "horizontal": distancia en planta (conserva curvas y horquillas),
+      - "profile": error de elevación en el plano distancia-elevación
+        (conserva cimas y valles),
+      - "both": el mayor de los dos.
+
+    El primer y último punto y los extremos globales de elevación se conservan
+    siempre. Por encima de `EXACT_POINTS` puntos se quitan por rondas
+    vectorizadas (en cada una, puntos por debajo de la mediana que nunca son
+    vecinos entre sí); desde ahí, uno a uno con un montículo.
+    Cada ronda quita una fracción fija de los puntos, así que el total es
+    O(n log n) en cualquier track. Devuelve los índices conservados ordenados.
+    """
+    if max_points is None and tolerance_m is None:
+        raise ValueError("Either max_points or tolerance_m must be given")
+    return np.sort(refinement_order(df, max_points, tolerance_m, space))
+
+
+def refinement_order(
+    df,
+    max_points: int | None = None,
+    tolerance_m: float | None = None,
+    space: str = "both",
+):
+    """
+    Índices conservados por `simplify_indices` de más a menos importante
+    (primero los puntos fijos). Sin `max_points` ni `tolerance_m` se ordena el
+    track entero: cualquier prefijo de longitud k es entonces la
+    simplificación a k puntos, así que un solo cálculo sirve para todos los
+    niveles de detalle.
+    """
+    n = len(df)
+    if n <= 2:
+        return np.arange(n)
+
+    use_horizontal = space in ("horizontal", "both")
+    use_profile = space in ("profile", "both")
+    if not (use_horizontal or use_profile):
+        raise ValueError(f"Unknown simplification space: {space}")
+
+    x = y = distance = ele = np.zeros(n)
+    if use_horizontal:
+        x, y = _horizontal_xy(
+            df["lat"].to_numpy(dtype=np.float64), df["lon"].to_numpy(dtype=np.float64)
+        )
+    if use_profile:
+        distance = df["distance"].to_numpy(dtype=np.float64)
+        raw_ele = df["ele"].to_numpy(dtype=np.float64)
+        ele = np.nan_to_num(raw_ele)
+
+    # Puntos que nunca se pueden perder: extremos del track y de elevación
+    anchors = {0, n - 1}
+    if use_profile and not np.all(np.isnan(raw_ele)):
+        anchors.update((int(np.nanargmax(raw_ele)), int(np.nanargmin(raw_ele))))
+    fixed = np.zeros(n, dtype=bool)
+    fixed[sorted(anchors)] = True
+
+    budget = len(anchors) if max_points is None else max(int(max_points), len(anchors))
+    tolerance = math.inf if tolerance_m is None else float(tolerance_m)
+
+    def _importance(alive):
+        inner = alive[1:-1]
+        values = _chord_errors(x, y, distance, ele, inner, alive[:-2], alive[2:])
+        values = np.nan_to_num(values, nan=0.0)
+        values[fixed[inner]] = np.inf
+        return np.concatenate([[np.inf], values, [np.inf]])
+
+    # Importancia efectiva: nunca menor que la del último punto quitado, así el
+    # orden de eliminación es monótono y cada prefijo es una simplificación
+    floor = 0.0
+    removed = []
+    alive = np.arange(n)
+
+    # Rondas vectorizadas hasta EXACT_POINTS: en cada una se quitan, de menor
+    # a mayor, puntos por debajo de la mediana que no son vecinos entre sí (así
+    # la importancia de cada uno es la de su triángulo): del orden de una
+    # cuarta parte de los que quedan
+    while len(alive) > max(budget, EXACT_POINTS):
+        values = _importance(alive)
+        finite = np.isfinite(values)
+        if not finite.any():
+            break
+        cutoff = min(float(np.median(values[finite])), tolerance)
+        candidates = np.flatnonzero(_alternate(finite & (values <= cutoff)))
+        if not len(candidates):
+            break
+        candidates = candidates[np.argsort(values[candidates], kind="stable")]
+        candidates = candidates[: len(alive) - max(budget, EXACT_POINTS)]
+        floor = max(floor, float(values[candidates[-1]]))
+        removed.extend(alive[candidates].tolist())
+        keep = np.ones(len(alive), dtype=bool)
+        keep[candidates] = False
+        alive = alive[keep]
+
+    # Eliminación exacta sobre los puntos que quedan (lista doblemente enlazada
+    # sobre posiciones de `alive`)
+    m = len(alive)
+    importance = np.maximum(_importance(alive), floor).tolist()
+    xs, ys = x[alive].tolist(), y[alive].tolist()
+    ds, es = distance[alive].tolist(), ele[alive].tolist()
+    prev = list(range(-1, m - 1))
+    nxt = list(range(1, m + 1))
+
+    def _exact_importance(i):
+        p, q = prev[i], nxt[i]
+        dx, dy = xs[q] - xs[p], ys[q] - ys[p]
+        px, py = xs[i] - xs[p], ys[i] - ys[p]
+        seg_len2 = dx * dx + dy * dy
+        if seg_len2 > 0:
+            t = min(max((px * dx + py * dy) / seg_len2, 0.0), 1.0)
+            px, py = px - t * dx, py - t * dy
+        span = ds[q] - ds[p]
+        frac = (ds[i] - ds[p]) / span if span > 0 else 0.0
+        vertical = abs(es[i] - es[p] - frac * (es[q] - es[p]))
+        return max(math.hypot(px, py), vertical)
+
+    heap = [(importance[i], i) for i in range(1, m - 1) if importance[i] != math.inf]
+    heapq.heapify(heap)
+    count = m
+    while heap and count > budget:
+        value, i = heapq.heappop(heap)
+        if value != importance[i]:
+            continue  # entrada obsoleta: el punto ya se quitó o se recalculó
+        if value > tolerance:
+            break
+        floor = value
+        importance[i] = -1.0
+        removed.append(int(alive[i]))
+        count -= 1
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 <= importance[j] != math.inf:
+                importance[j] = max(_exact_importance(j), floor)
+                heapq.heappush(heap, (importance[j], j))
+
+    # Supervivientes por importancia; sin límite solo quedan los puntos fijos
+    # y detrás van los quitados, del último al primero
+    values = np.asarray(importance)
+    survivors = np.flatnonzero(values >= 0)
+    order = alive[survivors[np.argsort(-values[survivors], kind="stable")]]
+    if max_points is None and tolerance_m is None:
+        order = np.concatenate([order, np.asarray(removed[::-1], dtype=np.int64)])
+    return order.astype(np.int64)
+
+
+def simplify_track(
+    df, max_points: int | None = None, tolerance_m: float | None = None, space="both"
+):
+    idx = simplify_indices(
+        df, max_points=max_points, tolerance_m=tolerance_m, space=space
+    )
+    return df.iloc[idx].reset_index(drop=True)
@@ -1,10 +1,46 @@
+import math
+
+import numpy as np
+
+# Pasos más largos (paradas) no cuentan como tiempo en movimiento
+MOVING_STEP_SECONDS = 300
+
+# Claves del dict que devuelve compute_gpx_stats, en orden
+STATS_FIELDS = (
+    "total_distance_km",
+    "elevation_gain",
+    "elevation_loss",
+    "min_elevation",
+    "max_elevation",
+    "average_grade",
+    "max_grade",
+    "moving_time_min",
+    "total_time_min",
+    "num_points",
+    "point_density_km",
+    "point_density_100m",
+    "precision_score",
+)
+
+
+def exact_sum(values) -> float:
+    """
+    Suma correctamente redondeada (`math.fsum`): no depende del orden de los
+    sumandos, así que el análisis en directo (punto a punto) y el de un GPX
+    completo dan exactamente el mismo resultado.
+    """
+    return math.fsum(np.asarray(values, dtype=np.float64).tolist())
+
+
 def compute_gpx_stats(df):
     total_distance = df["distance"].iloc[-1]
-    elev_diff = df["ele"].diff()
+    elev_diff = np.diff(df["ele"].to_numpy(dtype=np.float64))
 
-    gain = elev_diff[elev_diff > 0].sum()
-    loss = -elev_diff[elev_diff < 0].sum()
-    duration = df["duration_sec"]
+    gain = exact_sum(elev_diff[elev_diff > 0])
+    loss = -exact_sum(elev_diff[elev_diff < 0])
+    duration = df["duration_sec"].to_numpy(dtype=np.float64)
+    grade = df["grade"].to_numpy(dtype=np.float64)
+    valid_grade = grade[~np.isnan(grade)]
 
     num_points = len(df)
     density_per_km = num_points / (total_distance / 1000)
@@ -16,10 +52,12 @@ def compute_gpx_stats(df):
         "elevation_loss": loss,
         "min_elevation": df["ele"].min(),
         "max_elevation": df["ele"].max(),
-        "average_grade": df["grade"].mean(),
+        "average_grade": (
+            exact_sum(valid_grade) / len(valid_grade) if len(valid_grade) else np.nan
+        ),
         "max_grade": df["grade"].max(),
-        "moving_time_min": duration[duration < 300].sum() / 60,
-        "total_time_min": duration.sum() / 60,
+        "moving_time_min": exact_sum(duration[duration < MOVING_STEP_SECONDS]) / 60,
+        "total_time_min": exact_sum(duration) / 60,
         "num_points": num_points,
         "point_density_km": density_per_km,
         "point_density_100m": density_per_100m,
@@ -0,0 +1,184 @@
+# components/core/track.py
+"""
+Contenedor compacto de un track: arrays tipados contiguos y de solo lectura.
+
+Solo se guardan las columnas leídas del GPX (lat, lon, ele, time). La
+distancia, la pendiente y la duración se calculan la primera vez que se piden
+y se memorizan en el propio objeto. `to_frame()` envuelve los arrays en un
+DataFrame sin copiarlos, así que el resto de la app sigue trabajando con
+pandas sin pagar copias ni exponer datos modificables.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .geodesy import consecutive_distances
+
+TRACK_COLUMNS = ("lat", "lon", "ele", "time", "distance", "grade", "duration_sec")
+# Saltos de tiempo mayores (pausas, tracks unidos) no cuentan como duración
+MAX_STEP_SECONDS = 3600
+
+
+def _readonly(values):
+    """Vista de solo lectura: el array de quien llama no cambia de flags."""
+    values = values.view()
+    values.flags.writeable = False
+    return values
+
+
+def _as_array(values, dtype):
+    return _readonly(np.ascontiguousarray(values, dtype=dtype))
+
+
+def _utc_times(time, n: int):
+    """
+    DatetimeArray UTC de solo lectura. El Track se queda con los datos que
+    recibe (p. ej. el resultado de `pd.to_datetime` del parser) sin copiarlos.
+    """
+    if time is None:
+        time = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+    times = pd.DatetimeIndex(time)
+    times = times.tz_convert("UTC") if times.tz else times.tz_localize("UTC")
+    times = times.as_unit("ns").array
+    getattr(times, "_ndarray", times).flags.writeable = False
+    return times
+
+
+class Track:
+    """
+    Track como arrays. `lat`/`lon` pueden ser float32 (`coord_dtype`) para
+    tracks muy largos: ~0.5 m de resolución y la mitad de memoria. Todo lo que
+    se devuelve son vistas de solo lectura.
+    """
+
+    __slots__ = (
+        "_distance",
+        "_duration",
+        "_grade",
+        "_step",
+        "_time",
+        "ele",
+        "lat",
+        "lon",
+    )
+
+    def __init__(self, lat, lon, ele, time=None, distance=None, coord_dtype=np.float64):
+        self.lat = _as_array(lat, coord_dtype)
+        self.lon = _as_array(lon, coord_dtype)
+        self.ele = _as_array(ele, np.float64)
+        n = len(self.lat)
+        if len(self.lon) != n or len(self.ele) != n:
+            raise ValueError("lat, lon and ele must have the same length")
+
+        self._time = _utc_times(time, n)
+        if len(self._time) != n:
+            raise ValueError("time must have one value per point")
+
+        self._distance = None
+        if distance is not None:
+            self._distance = _as_array(distance, np.float64)
+        self._step = self._grade = self._duration = None
+
+    @classmethod
+    def from_frame(cls, df, coord_dtype=np.float64):
+        """Track sobre las columnas de `df` (la hora se copia; el resto no)."""
+        return cls(
+            df["lat"].to_numpy(),
+            df["lon"].to_numpy(),
+            df["ele"].to_numpy(),
+            df["time"].array.copy() if "time" in df.columns else None,
+            df["distance"].to_numpy() if "distance" in df.columns else None,
+            coord_dtype=coord_dtype,
+        )
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def __repr__(self) -> str:
+        return f"Track({len(self)} points, {self.nbytes / 1024:.0f} KiB)"
+
+    @property
+    def time(self):
+        """Instantes como datetime64[ns] (UTC, sin zona) sobre los mismos datos."""
+        return self._time.view("M8[ns]").to_numpy()
+
+    @property
+    def step_distance(self):
+        """Distancia de cada punto al anterior (0 para el primero)."""
+        if self._step is None:
+            if self._distance is not None:
+                step = np.diff(self._distance, prepend=self._distance[:1])
+            else:
+                step = consecutive_distances(self.lat, self.lon, method="haversine")
+            self._step = _readonly(step)
+        return self._step
+
+    @property
+    def distance(self):
+        """Distancia acumulada en metros."""
+        if self._distance is None:
+            self._distance = _readonly(np.cumsum(self.step_distance))
+        return self._distance
+
+    @property
+    def grade(self):
+        """Pendiente en % respecto al punto anterior (0 si no hay avance)."""
+        if self._grade is None:
+            step = self.step_distance
+            elev_diff = np.diff(self.ele, prepend=self.ele[:1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                grade = np.where(step > 0, (elev_diff / step) * 100, 0)
+            self._grade = _readonly(grade)
+        return self._grade
+
+    @property
+    def duration_sec(self):
+        """Segundos desde el punto anterior; 0 si falta la hora o el salto es >= 1 h."""
+        if self._duration is None:
+            t = self._time.view("i8")
+            missing = np.isnat(self.time)
+            seconds = np.zeros(len(t))
+            seconds[1:] = np.diff(t) / 1e9
+            seconds[1:][missing[1:] | missing[:-1]] = 0
+            self._duration = _readonly(
+                np.where(seconds < MAX_STEP_SECONDS, seconds, 0.0)
+            )
+        return self._duration
+
+    def column(self, name):
+        if name == "time":
+            return self._time
+        if name not in TRACK_COLUMNS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def take(self, indices, keep_distance: bool = True):
+        """
+        Sub-track con los puntos `indices`. Con `keep_distance` se conserva la
+        distancia recorrida del track original (la de una simplificación); si
+        no, se recalcula entre los puntos conservados.
+        """
+        indices = np.asarray(indices)
+        return Track(
+            self.lat[indices],
+            self.lon[indices],
+            self.ele[indices],
+            self._time[indices],
+            self.distance[indices] if keep_distance else None,
+            coord_dtype=self.lat.dtype,
+        )
+
+    def to_frame(self, columns=TRACK_COLUMNS):
+        """DataFrame que comparte memoria con el track (un bloque por columna)."""
+        return pd.DataFrame({name: self.column(name) for name in columns}, copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de los arrays ya materializados."""
+        arrays = (self.lat, self.lon, self.ele, self._time.view("i8"))
+        arrays += tuple(
+            a
+            for a in (self._distance, self._step, self._grade, self._duration)
+            if a is not None
+        )
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,190 @@
+# components/core/track_file.py
+"""
+Formato binario por columnas para guardar un track ya analizado y reabrirlo
+sin volver a leer el XML.
+
+Un fichero `.gpxtrack` es:
+
+    GPXTRACK  versión (uint32)  longitud de la cabecera (uint32)
+    cabecera JSON (UTF-8): puntos, columnas (nombre, dtype, offset),
+                           estadísticas, segmentos y metadatos
+    una columna tras otra, cada una alineada a ALIGNMENT bytes
+
+Las columnas son arrays numéricos little-endian sin comprimir (la hora,
+datetime64[ns] en UTC), así que `load_track_file()` proyecta el fichero en
+memoria una sola vez y cada columna es una vista de solo lectura sobre esa
+proyección: no se copia nada y reabrir un track de un millón de puntos cuesta
+lo que leer la cabecera. Las páginas se leen del disco cuando se usan.
+
+Las estadísticas y los segmentos detectados son pequeños y van en la propia
+cabecera. Un fichero con otra versión se rechaza con `TrackFileError`.
+"""
+
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+TRACK_FILE_MAGIC = b"GPXTRACK"
+TRACK_FILE_VERSION = 1
+TRACK_FILE_SUFFIX = ".gpxtrack"
+ALIGNMENT = 64
+# Tracks analizados por la app y las herramientas por lotes (ver cache.py)
+TRACK_DIR = os.environ.get("GPX_TRACK_DIR", os.path.join("data", "tracks"))
+
+_PREFIX = struct.Struct(f"<{len(TRACK_FILE_MAGIC)}sII")
+
+
+class TrackFileError(ValueError):
+    """El fichero no es un `.gpxtrack` válido o es de otra versión."""
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _column_values(series):
+    """Array little-endian contiguo de la columna (sin copia si ya lo es)."""
+    values = series.array
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        values = values.tz_convert("UTC").as_unit("ns")
+        return np.ascontiguousarray(values._ndarray), "UTC"
+    if series.dtype.kind == "M":
+        return np.ascontiguousarray(values.as_unit("ns")._ndarray), None
+    values = series.to_numpy()
+    if values.dtype.kind not in "biuf":
+        raise TypeError(f"Column {series.name!r} is not numeric ({values.dtype})")
+    return np.ascontiguousarray(values, values.dtype.newbyteorder("<")), None
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_track_file(path, df, stats=None, segments=None, meta=None) -> str:
+    """
+    Guarda las columnas numéricas y de fecha de `df`, `stats`, los segmentos
+    ({tipo: DataFrame}, p. ej. "climb" y "descent") y `meta` en `path`. Se
+    escribe en un temporal y se renombra, así que quien tenga el fichero
+    anterior proyectado en memoria lo sigue viendo entero. Devuelve `path`.
+    """
+    columns, arrays = [], []
+    for name in df.columns:
+        values, tz = _column_values(df[name])
+        columns.append({"name": str(name), "dtype": values.dtype.str, "tz": tz})
+        arrays.append(values)
+
+    header = {
+        "points": len(df),
+        "columns": columns,
+        "stats": dict(stats or {}),
+        "segments": {
+            kind: {
+                "columns": [str(c) for c in seg_df.columns],
+                "data": seg_df.to_numpy(dtype=object).tolist(),
+            }
+            for kind, seg_df in (segments or {}).items()
+        },
+        "meta": dict(meta or {}),
+    }
+    # Los offsets dependen del tamaño de la cabecera y viceversa: se reservan
+    # dígitos de sobra y se rellena con espacios
+    for column in columns:
+        column["offset"] = 0
+    size = len(json.dumps(header, default=_json_default).encode("utf-8"))
+    data_start = _aligned(_PREFIX.size + size + 24 * len(columns))
+    offset = data_start
+    for column, values in zip(columns, arrays):
+        column["offset"] = offset
+        offset = _aligned(offset + values.nbytes)
+    encoded = json.dumps(header, default=_json_default).encode("utf-8")
+    encoded = encoded.ljust(data_start - _PREFIX.size)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(TRACK_FILE_MAGIC, TRACK_FILE_VERSION, len(encoded)))
+            f.write(encoded)
+            for column, values in zip(columns, arrays):
+                f.seek(column["offset"])
+                values.tofile(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _utc_array(values):
+    """DatetimeArray UTC sobre `values` (datetime64[ns]) sin copiarlo."""
+    dtype = pd.DatetimeTZDtype("ns", "UTC")
+    try:
+        return pd.arrays.DatetimeArray._simple_new(values, dtype=dtype)
+    except AttributeError:
+        # Otra versión de pandas: se copia, pero el resultado es el mismo
+        return pd.DatetimeIndex(values).tz_localize("UTC").array
+
+
+def load_track_file(path) -> dict:
+    """
+    Track guardado con `save_track_file`: {"frame", "stats", "segments",
+    "meta"}. Las columnas de "frame" son vistas de solo lectura sobre el
+    fichero proyectado en memoria (el DataFrame se puede ampliar con columnas
+    nuevas, pero no modificar).
+    """
+    try:
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    except ValueError:
+        raise TrackFileError(f"{path}: empty file") from None
+    if len(mapped) < _PREFIX.size:
+        raise TrackFileError(f"{path}: not a track file")
+    magic, version, header_size = _PREFIX.unpack_from(mapped)
+    if magic != TRACK_FILE_MAGIC:
+        raise TrackFileError(f"{path}: not a track file")
+    if version != TRACK_FILE_VERSION:
+        raise TrackFileError(
+            f"{path}: unsupported track file version {version} "
+            f"(expected {TRACK_FILE_VERSION})"
+        )
+    header_end = _PREFIX.size + header_size
+    try:
+        header = json.loads(bytes(mapped[_PREFIX.size : header_end]))
+    except ValueError as e:
+        raise TrackFileError(f"{path}: corrupt header ({e})") from None
+
+    points = header["points"]
+    data = {}
+    for column in header["columns"]:
+        dtype = np.dtype(column["dtype"])
+        if column["offset"] + points * dtype.itemsize > len(mapped):
+            raise TrackFileError(f"{path}: truncated column {column['name']!r}")
+        values = np.frombuffer(
+            mapped, dtype=dtype, count=points, offset=column["offset"]
+        )
+        if column.get("tz") == "UTC":
+            values = _utc_array(values)
+        data[column["name"]] = values
+
+    return {
+        "frame": pd.DataFrame(data, copy=False),
+        "stats": header["stats"],
+        "segments": {
+            kind: pd.DataFrame(segment["data"], columns=segment["columns"])
+            for kind, segment in header["segments"].items()
+        },
+        "meta": header["meta"],
+    }
+
+
+def track_file_path(directory, key) -> str:
+    """Fichero del track con clave `key` (p. ej. `content_key`) en `directory`."""
+    return os.path.join(directory, f"{key}{TRACK_FILE_SUFFIX}")
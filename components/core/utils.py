@@ -1,3 +1,7 @@
+import threading
+import weakref
+from collections import OrderedDict
+
 import numpy as np
 
 
@@ -18,6 +22,51 @@ def get_color(grade) -> str:
         return "#00008B"  # Dark Blue
 
 
+# Misma escala que `get_color`, de menor a mayor pendiente
+GRADE_COLORS = [
+    "#00008B",
+    "#0000FF",
+    "#ADD8E6",
+    "#ADFF2F",
+    "#FFFF00",
+    "#FF8C00",
+    "#8B0000",
+]
+GRADE_COLOR_EDGES = np.array([-10, -2, 0, 2, 10, 18])
+
+
+def get_color_bins(grades):
+    """Versión vectorizada de `get_color`: índice en `GRADE_COLORS` por punto."""
+    grades = np.asarray(grades, dtype=np.float64)
+    bins = np.searchsorted(GRADE_COLOR_EDGES, grades, side="right")
+    return np.where(np.isnan(grades), 0, bins)
+
+
+SLOPE_PALETTE = [
+    "#0d0887",  # Morado/Azul oscuro (Bajada > 12%)
+    "#0000FF",  # Azul (Bajada 6-12%)
+    "#ADD8E6",  # Azul claro (Bajada 0-6%)
+    "#E0E0E0",  # Gris claro (Llano -1% a 1%)
+    "#FFFF00",  # Amarillo (Subida 1-4%)
+    "#FFA500",  # Naranja (Subida 4-8%)
+    "#FF4500",  # Rojo-Naranja (Subida 8-12%)
+    "#B22222",  # Ladrillo (Subida 12-16%)
+    "#8B0000",  # Rojo Oscuro (Subida > 16%)
+]
+SLOPE_PALETTE_BINS = np.array([-15, -8, -3, -1, 1, 4, 8, 12, 20])
+_FLAT_PALETTE_IDX = 3
+
+
+def get_palette_indices(grades):
+    """
+    Versión vectorizada de `get_color_from_palette`: índice en `SLOPE_PALETTE`
+    para cada pendiente. Las pendientes NaN se pintan como llano.
+    """
+    grades = np.asarray(grades, dtype=np.float64)
+    idx = np.interp(grades, SLOPE_PALETTE_BINS, np.arange(len(SLOPE_PALETTE)))
+    return np.where(np.isnan(idx), _FLAT_PALETTE_IDX, np.round(idx)).astype(int)
+
+
 def get_color_from_palette(grade):
     """
     Asigna un color desde una paleta divergente profesional basada en la pendiente.
@@ -25,38 +74,86 @@ def get_color_from_palette(grade):
     - Llano: Gris claro
     - Subidas: Amarillo -> Naranja -> Rojo oscuro
     """
-    palette = [
-        "#0d0887",  # Morado/Azul oscuro (Bajada > 12%)
-        "#0000FF",  # Azul (Bajada 6-12%)
-        "#ADD8E6",  # Azul claro (Bajada 0-6%)
-        "#E0E0E0",  # Gris claro (Llano -1% a 1%)
-        "#FFFF00",  # Amarillo (Subida 1-4%)
-        "#FFA500",  # Naranja (Subida 4-8%)
-        "#FF4500",  # Rojo-Naranja (Subida 8-12%)
-        "#B22222",  # Ladrillo (Subida 12-16%)
-        "#8B0000",  # Rojo Oscuro (Subida > 16%)
-    ]
-    grade_bins = np.array([-15, -8, -3, -1, 1, 4, 8, 12, 20])
-    idx = np.interp(grade, grade_bins, range(len(palette)))
+    return SLOPE_PALETTE[int(get_palette_indices(grade))]
+
+
+_SMOOTHING_MEMO = OrderedDict()
+_SMOOTHING_MEMO_SIZE = 32
+_SMOOTHING_MEMO_LOCK = threading.Lock()
+
+
+def smooth_grade_by_distance(distance, grade, half_window_m: float):
+    """
+    Media de `grade` en una ventana de ±`half_window_m` metros alrededor de cada
+    punto, medida sobre la distancia real (no sobre número de puntos), así que
+    es correcta aunque la densidad de muestreo varíe. Usa sumas prefijas y
+    `searchsorted`: el coste no depende del tamaño de la ventana. Los NaN se
+    ignoran, como en `rolling(..., min_periods=1).mean()`.
+    """
+    grade = np.asarray(grade, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+    valid = ~np.isnan(grade)
 
-    color_idx = int(round(idx))
+    grade_sum = np.concatenate(([0.0], np.cumsum(np.where(valid, grade, 0.0))))
+    valid_count = np.concatenate(([0], np.cumsum(valid)))
 
-    return palette[color_idx]
+    lo = np.searchsorted(distance, distance - half_window_m, side="left")
+    hi = np.searchsorted(distance, distance + half_window_m, side="right")
+
+    count = valid_count[hi] - valid_count[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, (grade_sum[hi] - grade_sum[lo]) / count, np.nan)
+
+
+def _memo_key(array):
+    """Clave estable para arrays de solo lectura (p. ej. frames de la caché de etapas)."""
+    if array.flags.writeable:
+        return None
+    owner = array.base if array.base is not None else array
+    return array.__array_interface__["data"][0], array.strides, len(array), owner
+
+
+def smoothed_grade(df, target_meters: int = 300):
+    """
+    Pendiente suavizada en una ventana de `target_meters` centrada en cada punto.
+
+    No modifica `df`. Si las columnas de entrada son de solo lectura (tracks de
+    la caché compartida) el resultado se memoiza por (track, ventana), de forma
+    que el mapa, el perfil y la detección reutilizan el mismo cálculo.
+    """
+    distance = df["distance"].to_numpy(dtype=np.float64)
+    grade = df["grade"].to_numpy(dtype=np.float64)
+
+    dist_key, grade_key = _memo_key(distance), _memo_key(grade)
+    if dist_key is None or grade_key is None:
+        return smooth_grade_by_distance(distance, grade, target_meters / 2)
+
+    key = (dist_key[:3], grade_key[:3], target_meters)
+    with _SMOOTHING_MEMO_LOCK:
+        entry = _SMOOTHING_MEMO.get(key)
+        if entry is not None:
+            dist_owner, grade_owner, result = entry
+            if dist_owner() is dist_key[3] and grade_owner() is grade_key[3]:
+                _SMOOTHING_MEMO.move_to_end(key)
+                return result
+
+    result = smooth_grade_by_distance(distance, grade, target_meters / 2)
+    result.flags.writeable = False
+    with _SMOOTHING_MEMO_LOCK:
+        _SMOOTHING_MEMO[key] = (
+            weakref.ref(dist_key[3]),
+            weakref.ref(grade_key[3]),
+            result,
+        )
+        if len(_SMOOTHING_MEMO) > _SMOOTHING_MEMO_SIZE:
+            _SMOOTHING_MEMO.popitem(last=False)
+    return result
 
 
 def apply_slope_smoothing(df, target_meters: int = 300):
-    meters_per_point = df["distance"].iloc[-1] / len(df)
-    # Evitar una ventana demasiado grande o demasiado pequeña
-    if meters_per_point == 0:
-        return df  # No se puede calcular
-    window = max(3, int(target_meters / meters_per_point))
-    # Asegurarse de que la ventana sea un número impar para que el centro sea claro
-    if window % 2 == 0:
-        window += 1
-
-    df["plot_grade"] = (
-        df["grade"].rolling(window=window, center=True, min_periods=1).mean()
-    )
+    """Devuelve una copia superficial de `df` con la columna `plot_grade`."""
+    df = df.copy(deep=False)
+    df["plot_grade"] = smoothed_grade(df, target_meters)
     return df
 
 
@@ -102,3 +199,27 @@ def classify_climb_category_strava(length_m, avg_slope) -> str:
         return "Cat 4"
     else:
         return "Uncategorized"
+
+
+# Umbrales de puntuación (longitud × pendiente) de classify_climb_category_strava
+STRAVA_CATEGORY_SCORES = (8000, 16000, 32000, 64000, 80000)
+STRAVA_CATEGORY_LABELS = (
+    "Uncategorized",
+    "Cat 4",
+    "Cat 3",
+    "Cat 2",
+    "Cat 1",
+    "HC (Hors Catégorie)",
+)
+
+
+def classify_climb_categories_strava(length_m, avg_slope):
+    """Versión vectorizada de `classify_climb_category_strava` (mismos umbrales)."""
+    length_m = np.asarray(length_m, dtype=np.float64)
+    avg_slope = np.asarray(avg_slope, dtype=np.float64)
+    score = length_m * avg_slope
+
+    category = np.searchsorted(STRAVA_CATEGORY_SCORES, score, side="right")
+    uncategorized = (length_m <= 0) | (avg_slope < 3.0) | np.isnan(score)
+    category = np.where(uncategorized, 0, category)
+    return np.asarray(STRAVA_CATEGORY_LABELS, dtype=object)[category]
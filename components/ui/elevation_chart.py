@@ -1,17 +1,49 @@
 # components/ui/elevation_chart.py
 
+import io
+
 import matplotlib.pyplot as plt
+import numpy as np
 import streamlit as st
-
-from components.core.utils import apply_slope_smoothing, get_color_from_palette
+from matplotlib.collections import PolyCollection
+
+from components.core.lod import track_pyramid
+from components.core.profiler import profiled
+from components.core.utils import (
+    SLOPE_PALETTE,
+    apply_slope_smoothing,
+    get_color_from_palette,
+    get_palette_indices,
+)
+
+# Puntos del perfil: del orden del ancho en píxeles de la figura
+CHART_MAX_POINTS = 3000
+
+
+def figure_png(fig) -> bytes:
+    """PNG de la figura con las mismas opciones que `st.pyplot`; cierra la figura."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def elevation_chart_png(df, climbs_df=None, descents_df=None, **options) -> bytes:
+    """El perfil de `build_elevation_figure` ya rasterizado, para poder cachearlo."""
+    return figure_png(
+        build_elevation_figure(
+            df, climbs_df=climbs_df, descents_df=descents_df, **options
+        )
+    )
 
 
-def get_smoothed_grade(df):
-    return apply_slope_smoothing(df)["plot_grade"]
+def show_elevation_chart(png) -> None:
+    st.markdown("*Slope smoothed over ~300 meters*")
+    st.image(png, width="stretch", output_format="PNG")
 
 
-# 1. Modificamos la firma para aceptar 'color_mode'
-def update_plot_elevation_colored_by_slope(
+@profiled
+def build_elevation_figure(
     df,
     climbs_df=None,
     descents_df=None,
@@ -19,9 +51,15 @@ def update_plot_elevation_colored_by_slope(
     simplified: bool = False,
     show_markers: bool = True,
     color_mode: str = "Detailed Slope",
-) -> None:
-    st.markdown("*Slope smoothed over ~300 meters*")
+    max_points: int | None = CHART_MAX_POINTS,
+):
+    """
+    Figura del perfil. Se dibujan como mucho `max_points` puntos de la
+    pirámide de detalle (None: todos, p. ej. para medir el dibujo en sí).
+    """
     df = apply_slope_smoothing(df)
+    if max_points is not None:
+        df = df.iloc[track_pyramid(df).query(max_points=max_points)]
 
     fig, ax = plt.subplots(figsize=(10, 4))
 
@@ -37,7 +75,7 @@ def update_plot_elevation_colored_by_slope(
     ax.set_ylabel("Elevation [m]")
     ax.set_title("Elevation Profile")
     ax.grid(True)
-    st.pyplot(fig)
+    return fig
 
 
 def _draw_simplified_segments(ax, df, climbs_df, descents_df) -> None:
@@ -60,16 +98,33 @@ def _draw_detailed_colored_profile(
     ax, df, climbs_df, descents_df, color_by_slope, show_markers, color_mode
 ) -> None:
     if color_mode == "Detailed Slope":
-        # Este es el comportamiento que ya teníamos
-        for i in range(1, len(df)):
-            x = df["distance"].iloc[i - 1 : i + 1] / 1000
-            y = df["ele"].iloc[i - 1 : i + 1]
-            color = (
-                get_color_from_palette(df["plot_grade"].iloc[i])
-                if color_by_slope
-                else "#999999"
+        # Un único PolyCollection: los tramos consecutivos del mismo color se
+        # funden en un solo polígono, en vez de un fill_between por punto
+        x = df["distance"].to_numpy(dtype=np.float64) / 1000
+        y = df["ele"].to_numpy(dtype=np.float64)
+        if color_by_slope:
+            bins = get_palette_indices(df["plot_grade"].to_numpy()[1:])
+        else:
+            bins = np.zeros(len(df) - 1, dtype=int)
+        palette = np.array(SLOPE_PALETTE if color_by_slope else ["#999999"])
+
+        breaks = np.flatnonzero(bins[1:] != bins[:-1]) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(bins)]))
+        polygons = [
+            np.column_stack(
+                (
+                    np.concatenate(([x[a]], x[a : b + 1], [x[b]])),
+                    np.concatenate(([0.0], y[a : b + 1], [0.0])),
+                )
             )
-            ax.fill_between(x, 0, y, color=color, alpha=0.8)
+            for a, b in zip(starts, ends)
+        ]
+        colors = palette[bins[starts]]
+        ax.add_collection(
+            PolyCollection(polygons, facecolors=colors, edgecolors=colors, alpha=0.8)
+        )
+        ax.autoscale_view()
 
     else:  # Modo "Average per Segment"
         # Primero, dibujamos todo el perfil con un color neutro de base
@@ -82,8 +137,10 @@ def _draw_detailed_colored_profile(
                     # Obtenemos el color a partir de la pendiente MEDIA del segmento
                     avg_slope_color = get_color_from_palette(row["avg_slope"])
 
-                    # Seleccionamos los datos de este segmento específico del dataframe completo
-                    segment_data = df.iloc[row["start_idx"] : row["end_idx"] + 1]
+                    # Seleccionamos por distancia: `df` es el nivel de detalle del
+                    # perfil, no el track completo al que apuntan start_idx/end_idx
+                    km = df["distance"] / 1000
+                    segment_data = df[(km >= row["start_km"]) & (km <= row["end_km"])]
 
                     # Dibujamos solo este tramo con su color
                     ax.fill_between(
@@ -94,31 +151,26 @@ def _draw_detailed_colored_profile(
                         alpha=0.9,
                     )
 
-    # La lógica para los marcadores se mantiene igual y se aplica a ambos modos
+    # Marcadores de inicio/fin: una sola llamada a vlines por tipo de segmento
     if show_markers:
         for segment_df, color, label in [
             (climbs_df, "black", "Climbs"),
             (descents_df, "blue", "Descents"),
         ]:
             if segment_df is not None and not segment_df.empty:
-                row = segment_df.iloc[0]
                 style = "--" if color == "black" else ":"
-                ax.axvline(
-                    x=row["start_km"],
-                    color=color,
-                    linestyle=style,
+                ax.vlines(
+                    np.concatenate((segment_df["start_km"], segment_df["end_km"])),
+                    0,
+                    1,
+                    transform=ax.get_xaxis_transform(),
+                    colors=color,
+                    linestyles=style,
                     alpha=0.6,
                     label=label,
                 )
-                ax.axvline(x=row["end_km"], color=color, linestyle=style, alpha=0.6)
-
-                for _, row in segment_df.iloc[1:].iterrows():
-                    ax.axvline(
-                        x=row["start_km"], color=color, linestyle=style, alpha=0.6
-                    )
-                    ax.axvline(x=row["end_km"], color=color, linestyle=style, alpha=0.6)
 
         if (climbs_df is not None and not climbs_df.empty) or (
             descents_df is not None and not descents_df.empty
         ):
-            ax.legend()
+            ax.legend(loc="upper right")
@@ -1,31 +1,61 @@
-import folium
-from streamlit_folium import st_folium
+import numpy as np
 
-from components.core.utils import get_color
-from components.ui.elevation_chart import get_smoothed_grade
+from components.core.lod import track_pyramid
+from components.core.profiler import profiled
+from components.core.utils import GRADE_COLORS, get_color_bins, smoothed_grade
+from components.ui.route_layer import add_binned_route
 
+# Puntos de la polilínea: suficiente para la vista completa a zoom de ruta
+MAP_MAX_POINTS = 5000
 
-def update_display_route_map(
+
+def route_map_html(m) -> str:
+    """
+    Página HTML autónoma del mapa. Es lo que se guarda en la caché de etapas:
+    el mapa folium es mutable y no se comparte entre sesiones.
+    """
+    return m.get_root().render()
+
+
+def show_route_map(map_html) -> None:
+    """Pinta en Streamlit un mapa ya renderizado (p. ej. salido de la caché)."""
+    from streamlit.components.v1 import html
+
+    html(map_html, height=500)
+
+
+@profiled
+def build_route_map(
     df,
     tile_style: str = "OpenStreetMap",
     climbs_df=None,
     descents_df=None,
     color_by_slope: bool = True,
-) -> None:
-    df["plot_grade"] = get_smoothed_grade(df)
-    coords = df[["lat", "lon"]].values.tolist()
+):
+    """Construye el mapa folium de la ruta sin pintarlo en Streamlit."""
+    # folium se importa al primer mapa, no al arrancar la app
+    import folium
+
+    # La línea se dibuja con el nivel de detalle de la pirámide; los
+    # marcadores siguen usando los índices del track completo
+    route_idx = track_pyramid(df).query(max_points=MAP_MAX_POINTS)
+    plot_grade = smoothed_grade(df)[route_idx]
+    lats = df["lat"].to_numpy()[route_idx]
+    lons = df["lon"].to_numpy()[route_idx]
+    coords = [[lats[0], lons[0]], [lats[-1], lons[-1]]]
 
     # Map center and bounds
-    center = coords[len(coords) // 2]
+    center = [lats[len(lats) // 2], lons[len(lons) // 2]]
     m = folium.Map(location=center, zoom_start=13, control_scale=True, tiles=None)
 
     folium.TileLayer(tiles=tile_style, name=tile_style, opacity=0.3).add_to(m)
 
-    # Segment coloring
-    for i in range(1, len(coords)):
-        segment = [coords[i - 1], coords[i]]
-        color = get_color(df["plot_grade"].iloc[i]) if color_by_slope else "#999999"
-        folium.PolyLine(segment, color=color, weight=4, opacity=1).add_to(m)
+    # Segment coloring: el tramo i-1 -> i toma el color de la pendiente en i
+    if color_by_slope:
+        segment_bins, palette = get_color_bins(plot_grade[1:]), GRADE_COLORS
+    else:
+        segment_bins, palette = np.zeros(len(lats) - 1, dtype=int), ["#999999"]
+    add_binned_route(m, lats, lons, segment_bins, palette, weight=4, opacity=1)
 
     # Start and end markers
     folium.Marker(
@@ -67,15 +97,4 @@ def update_display_route_map(
     sw = df[["lat", "lon"]].min().values.tolist()
     ne = df[["lat", "lon"]].max().values.tolist()
     m.fit_bounds([sw, ne])
-
-    try:
-        st_folium(
-            m,
-            width=800,
-            height=500,
-            use_container_width=True,
-            key="main_map",
-            return_last_map=False,
-        )
-    except TypeError:
-        st_folium(m, width=800, height=500, key="main_map")
+    return m
@@ -1,46 +1,75 @@
-import altair as alt
-import folium
 import numpy as np
-import pandas as pd
 import streamlit as st
-from geopy.distance import geodesic
-from streamlit_folium import st_folium
 
+from components.core.profiler import profiled
+from components.core.resample import resample_by_distance, resample_by_time
+from components.ui.map_display import MAP_MAX_POINTS
+from components.ui.route_layer import add_binned_route, threshold_bins
+
+# Ventanas de suavizado de la velocidad
+SPEED_WINDOW_S = 30
+SPEED_WINDOW_M = 50
 
-def run_pace_analysis(df) -> None:
-    st.title("🏃‍♂️ Pace & Speed Analyzer")
 
+@profiled
+def pace_analysis(df) -> dict:
+    """
+    Cálculo de la pestaña, sin Streamlit: series remuestreadas en el tiempo
+    (gráficas) y en distancia (mapa y parciales por km). `error` explica por
+    qué no hay análisis.
+    """
     if (
         df.empty
         or "lat" not in df.columns
         or "lon" not in df.columns
         or "time" not in df.columns
     ):
-        st.warning("GPX data is missing required columns.")
-        return
+        return {"error": "GPX data is missing required columns."}
 
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["time"], errors="coerce")
-    df = df.dropna(subset=["timestamp"])
-
-    df["seconds"] = (df["timestamp"] - df["timestamp"].iloc[0]).dt.total_seconds()
-    df["distance"] = [0.0] + [
-        geodesic(
-            (df.loc[i - 1, "lat"], df.loc[i - 1, "lon"]),
-            (df.loc[i, "lat"], df.loc[i, "lon"]),
-        ).meters
-        for i in range(1, len(df))
-    ]
-    df["cum_dist"] = df["distance"].cumsum()
-    df["speed_kmh"] = (
-        df["distance"] / df["seconds"].diff().replace(0, np.nan).fillna(1) * 3.6
+    # Límite de puntos del perfil; aquí para no cargar matplotlib al arrancar
+    from components.ui.elevation_chart import CHART_MAX_POINTS
+
+    # Series uniformes y de tamaño acotado en vez de una fila por punto crudo:
+    # en el tiempo para las gráficas, en distancia para el mapa y los parciales
+    timeline = resample_by_time(
+        df, window_s=SPEED_WINDOW_S, max_points=CHART_MAX_POINTS
+    )
+    by_distance = resample_by_distance(
+        df, window_m=SPEED_WINDOW_M, max_points=MAP_MAX_POINTS
     )
-    df["pace_min_per_km"] = 60 / df["speed_kmh"].replace(0, np.nan)
+    if len(timeline) < 2 or len(by_distance) < 2:
+        return {"error": "GPX data has no usable timestamps for pace analysis."}
+
+    km_bin = (by_distance["distance"] // 1000).astype(int).rename("km_bin")
+    grouped = (
+        by_distance.groupby(km_bin)["pace_min_per_km"]
+        .agg(["mean", "std"])
+        .reset_index()
+    )
+    grouped.columns = ["km_segment", "mean_pace", "std_pace"]
+    return {"timeline": timeline, "by_distance": by_distance, "grouped": grouped}
+
+
+def show_pace_analysis(result) -> None:
+    """Pinta el resultado de `pace_analysis` (p. ej. salido de la caché)."""
+    # Dependencias de gráficos y mapas solo al pintar la pestaña (arranque en frío)
+    import altair as alt
+    import folium
+    from streamlit_folium import st_folium
+
+    st.title("🏃‍♂️ Pace & Speed Analyzer")
+
+    if "error" in result:
+        st.warning(result["error"])
+        return
+    timeline = result["timeline"]
+    by_distance = result["by_distance"]
+    grouped = result["grouped"]
 
     st.markdown("### 📈 Speed and Pace Over Time")
 
     st.altair_chart(
-        alt.Chart(df)
+        alt.Chart(timeline[["seconds", "speed_kmh"]])
         .mark_line(color="steelblue")
         .encode(
             x=alt.X("seconds", title="Time (s)"),
@@ -51,7 +80,7 @@ def run_pace_analysis(df) -> None:
     )
 
     st.altair_chart(
-        alt.Chart(df)
+        alt.Chart(timeline[["seconds", "pace_min_per_km"]])
         .mark_line(color="darkred")
         .encode(
             x=alt.X("seconds", title="Time (s)"),
@@ -63,25 +92,28 @@ def run_pace_analysis(df) -> None:
 
     st.markdown("### 🔁 Route Colored by Speed")
 
-    m = folium.Map(location=[df["lat"].mean(), df["lon"].mean()], zoom_start=13)
+    m = folium.Map(
+        location=[by_distance["lat"].mean(), by_distance["lon"].mean()],
+        zoom_start=13,
+    )
 
-    for i in range(len(df) - 1):
-        lat1, lon1 = df.loc[i, ["lat", "lon"]]
-        lat2, lon2 = df.loc[i + 1, ["lat", "lon"]]
-        spd = df.loc[i, "speed_kmh"]
-        color = "green" if spd < 8 else "orange" if spd < 14 else "red"
-        folium.PolyLine(
-            [(lat1, lon1), (lat2, lon2)], color=color, weight=4, opacity=0.9
-        ).add_to(m)
+    # Los tramos sin velocidad (paradas) van en gris, no como si fueran rápidos
+    speed = by_distance["speed_kmh"].to_numpy()[:-1]
+    bins = np.where(np.isnan(speed), 3, threshold_bins(speed, [8, 14]))
+    add_binned_route(
+        m,
+        by_distance["lat"],
+        by_distance["lon"],
+        bins,
+        ["green", "orange", "red", "gray"],
+        weight=4,
+        opacity=0.9,
+    )
 
     st_folium(m, width=1000, height=500)
 
     st.markdown("### 📏 Pacing Consistency by km")
 
-    df["km_bin"] = (df["cum_dist"] // 1000).astype(int)
-    grouped = df.groupby("km_bin")["pace_min_per_km"].agg(["mean", "std"]).reset_index()
-    grouped.columns = ["km_segment", "mean_pace", "std_pace"]
-
     st.dataframe(grouped, use_container_width=True)
 
     st.altair_chart(
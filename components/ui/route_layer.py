@@ -0,0 +1,66 @@
+# components/ui/route_layer.py
+import numpy as np
+
+# ~0.1 m de precisión: suficiente para pintar y reduce mucho el HTML
+COORD_DECIMALS = 6
+
+
+def add_binned_route(
+    m,
+    lats,
+    lons,
+    segment_bins,
+    palette,
+    weight: int = 4,
+    opacity: float = 1.0,
+) -> int:
+    """
+    Añade al mapa una ruta coloreada por tramos.
+
+    `segment_bins[i]` es el índice en `palette` del tramo entre el punto i y el
+    i+1. Los tramos consecutivos del mismo color se funden en una sola línea y
+    todas las líneas del mismo color se emiten como una única multi-polyline,
+    así que el mapa tiene como mucho `len(palette)` capas en lugar de una por
+    par de puntos. Devuelve el número de capas añadidas.
+    """
+    import folium
+
+    coords = np.round(
+        np.column_stack(
+            (np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        ),
+        COORD_DECIMALS,
+    )
+    bins = np.asarray(segment_bins)[: len(coords) - 1]
+    if len(bins) == 0:
+        return 0
+
+    breaks = np.flatnonzero(bins[1:] != bins[:-1]) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(bins)]))
+
+    runs_by_bin = {}
+    for start, end in zip(starts, ends):
+        runs_by_bin.setdefault(int(bins[start]), []).append(
+            coords[start : end + 1].tolist()
+        )
+
+    for color_bin, runs in runs_by_bin.items():
+        folium.PolyLine(
+            runs if len(runs) > 1 else runs[0],
+            color=palette[color_bin],
+            weight=weight,
+            opacity=opacity,
+        ).add_to(m)
+
+    return len(runs_by_bin)
+
+
+def threshold_bins(values, thresholds):
+    """
+    Índice de color para escalas tipo "verde < a <= naranja < b <= rojo".
+    Los NaN van al último color, igual que la cadena de `if` original.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    bins = np.searchsorted(np.asarray(thresholds), values, side="right")
+    return np.where(np.isnan(values), len(thresholds), bins)
@@ -1,10 +1,20 @@
-import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
+import streamlit as st
 from matplotlib.collections import LineCollection
 
-def show_segment_summary_and_details(df, full_df, kind="climb"):
-    """Display detailed segment (climb/descent) summaries with slope distribution and elevation profile."""
+from components.core.lod import track_pyramid
+from components.ui.elevation_chart import figure_png
+
+# Puntos del perfil de cada segmento (el histograma usa todos)
+SEGMENT_MAX_POINTS = 1000
+
+
+def show_segment_summary_and_details(df, full_df, kind="climb", images=None):
+    """
+    Display detailed segment (climb/descent) summaries with slope distribution and elevation profile.
+    `images` are the pre-rendered figures from `segment_images` (one per row), if cached.
+    """
     
     # Required columns check
     required_cols = [
@@ -39,71 +49,111 @@ def show_segment_summary_and_details(df, full_df, kind="climb"):
             st.markdown(summary)
             
             if "plot_grade" in full_df.columns:
-                # Extract segment data
-                segment_df = full_df.iloc[int(row["start_idx"]):int(row["end_idx"]) + 1]
-                st.write(segment_df.columns)
-                st.write("Segment DataFrame columns:", list(segment_df.columns))
-                # Create two plots side-by-side, slightly taller to fit colorbar
-                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
-
-                # Left: slope histogram
-                ax1.hist(segment_df["plot_grade"], bins=15, color="gray", edgecolor="black")
-                ax1.set_xlabel("Slope (%)")
-                ax1.set_ylabel("Frequency")
-                ax1.set_title("Slope Distribution")
-                ax1.grid(True, linestyle='--', alpha=0.6)
-
-                # Right: elevation profile, colored by slope
-                # <<< CAMBIO: Se busca la columna 'ele' en lugar de 'elevation'
-                if "ele" in segment_df.columns and not segment_df.empty: 
-                    x = (segment_df["distance_km"] - segment_df["distance_km"].iloc[0]).values
-                    # <<< CAMBIO: Se usan los datos de la columna 'ele'
-                    y = segment_df["ele"].values 
-                    slope = segment_df["plot_grade"].values
-
-                    # Create a series of line segments for coloring
-                    points = np.array([x, y]).T.reshape(-1, 1, 2)
-                    segments = np.concatenate([points[:-1], points[1:]], axis=1)
-                    
-                    # Use the average slope of each segment for its color
-                    segment_slopes = (slope[:-1] + slope[1:]) / 2
-
-                    # Choose a colormap based on whether it's a climb or descent
-                    if kind == "climb":
-                        cmap = plt.get_cmap('Reds')
-                        # Normalize colors based on typical climb slopes, ignoring extreme outliers
-                        norm = plt.Normalize(vmin=0, vmax=max(10, np.percentile(segment_slopes, 98)))
-                    else: # descent
-                        cmap = plt.get_cmap('Greens_r')
-                        # Normalize colors based on typical descent slopes
-                        norm = plt.Normalize(vmin=min(-10, np.percentile(segment_slopes, 2)), vmax=0)
-
-                    # Create the colored line collection
-                    lc = LineCollection(segments, cmap=cmap, norm=norm, linewidth=3)
-                    lc.set_array(segment_slopes)
-                    line = ax2.add_collection(lc)
-
-                    # Add a shaded area underneath the profile
-                    ax2.fill_between(x, y, y.min(), color='gray', alpha=0.15)
-                    
-                    # Set axis limits and labels
-                    ax2.set_xlim(x.min(), x.max())
-                    ax2.set_ylim(y.min() - 5, y.max() + 5) # Add padding
-                    ax2.set_xlabel("Distance (km)")
-                    ax2.set_ylabel("Elevation (m)")
-                    ax2.set_title("Elevation Profile")
-                    ax2.grid(True, linestyle='--', alpha=0.6)
-
-                    # Add a colorbar to explain the line colors
-                    cbar = fig.colorbar(line, ax=ax2)
-                    cbar.set_label('Slope (%)')
-
+                if images is not None:
+                    st.image(images[idx], width="stretch", output_format="PNG")
                 else:
-                    st.write(segment_df.columns)
-                    ax2.text(0.5, 0.5, "No elevation data", ha="center", va="center", fontsize=10)
-                    ax2.set_axis_off()
-
-                plt.tight_layout()
-                st.pyplot(fig)
+                    # Extract segment data
+                    segment_df = full_df.iloc[
+                        int(row["start_idx"]) : int(row["end_idx"]) + 1
+                    ]
+                    fig = build_segment_figure(segment_df, full_df, kind)
+                    st.pyplot(fig)
+                    plt.close(fig)
             else:
-                st.warning("No 'plot_grade' column found in full_df.")
\ No newline at end of file
+                st.warning("No 'plot_grade' column found in full_df.")
+
+
+def build_segment_figure(segment_df, full_df, kind="climb"):
+    """Slope histogram and slope-colored elevation profile of one segment."""
+    # Create two plots side-by-side, slightly taller to fit colorbar
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+
+    # Left: slope histogram
+    ax1.hist(segment_df["plot_grade"], bins=15, color="gray", edgecolor="black")
+    ax1.set_xlabel("Slope (%)")
+    ax1.set_ylabel("Frequency")
+    ax1.set_title("Slope Distribution")
+    ax1.grid(True, linestyle="--", alpha=0.6)
+
+    # Right: elevation profile, colored by slope
+    # <<< CAMBIO: Se busca la columna 'ele' en lugar de 'elevation'
+    if "ele" in segment_df.columns and not segment_df.empty:
+        # Perfil con el nivel de detalle de la pirámide para este rango
+        view_df = full_df.iloc[
+            track_pyramid(full_df).query(
+                segment_df["distance"].iloc[0],
+                segment_df["distance"].iloc[-1],
+                max_points=SEGMENT_MAX_POINTS,
+            )
+        ]
+        x = (view_df["distance"].values - view_df["distance"].iloc[0]) / 1000
+        # <<< CAMBIO: Se usan los datos de la columna 'ele'
+        y = view_df["ele"].values
+        slope = view_df["plot_grade"].values
+
+        # Create a series of line segments for coloring
+        points = np.array([x, y]).T.reshape(-1, 1, 2)
+        segments = np.concatenate([points[:-1], points[1:]], axis=1)
+
+        # Use the average slope of each segment for its color
+        segment_slopes = (slope[:-1] + slope[1:]) / 2
+
+        # Choose a colormap based on whether it's a climb or descent
+        if kind == "climb":
+            cmap = plt.get_cmap("Reds")
+            # Normalize colors based on typical climb slopes, ignoring extreme outliers
+            norm = plt.Normalize(
+                vmin=0, vmax=max(10, np.percentile(segment_slopes, 98))
+            )
+        else:  # descent
+            cmap = plt.get_cmap("Greens_r")
+            # Normalize colors based on typical descent slopes
+            norm = plt.Normalize(
+                vmin=min(-10, np.percentile(segment_slopes, 2)), vmax=0
+            )
+
+        # Create the colored line collection
+        lc = LineCollection(segments, cmap=cmap, norm=norm, linewidth=3)
+        lc.set_array(segment_slopes)
+        line = ax2.add_collection(lc)
+
+        # Add a shaded area underneath the profile
+        ax2.fill_between(x, y, y.min(), color="gray", alpha=0.15)
+
+        # Set axis limits and labels
+        ax2.set_xlim(x.min(), x.max())
+        ax2.set_ylim(y.min() - 5, y.max() + 5)  # Add padding
+        ax2.set_xlabel("Distance (km)")
+        ax2.set_ylabel("Elevation (m)")
+        ax2.set_title("Elevation Profile")
+        ax2.grid(True, linestyle="--", alpha=0.6)
+
+        # Add a colorbar to explain the line colors
+        cbar = fig.colorbar(line, ax=ax2)
+        cbar.set_label("Slope (%)")
+
+    else:
+        ax2.text(0.5, 0.5, "No elevation data", ha="center", va="center", fontsize=10)
+        ax2.set_axis_off()
+
+    plt.tight_layout()
+    return fig
+
+
+def segment_images(df, full_df, kind="climb", progress=None):
+    """
+    PNG figure of every segment in `df`, in order (so they can be cached).
+    `progress(done, total)` is called after each figure.
+    """
+    if df.empty or "plot_grade" not in full_df.columns:
+        return []
+    images = []
+    for s, e in zip(df["start_idx"], df["end_idx"]):
+        images.append(
+            figure_png(
+                build_segment_figure(full_df.iloc[int(s) : int(e) + 1], full_df, kind)
+            )
+        )
+        if progress is not None:
+            progress(len(images), len(df))
+    return images
@@ -0,0 +1,95 @@
+"""
+Ida y vuelta del índice local de edificios: `build_store` + `buildings_near`
+dan los mismos pares que una búsqueda por fuerza bruta, y reconstruir sobre el
+mismo directorio no deja teselas de la construcción anterior.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.core.building_store import BuildingTileStore, build_store
+from components.core.gps_risk import EARTH_RADIUS_M
+
+RADIUS_M = 30
+
+
+def _buildings(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "lat": rng.uniform(41.38, 41.42, n),
+            "lon": rng.uniform(2.15, 2.19, n),
+            "height": rng.uniform(5, 60, n),
+            "levels": rng.integers(1, 12, n).astype(float),
+        }
+    )
+
+
+def _route():
+    t = np.linspace(0, 1, 400)
+    return 41.385 + 0.03 * t, 2.155 + 0.03 * t + 0.002 * np.sin(20 * t)
+
+
+def _brute_force_pairs(lats, lons, buildings):
+    lat1, lon1 = np.radians(lats)[:, None], np.radians(lons)[:, None]
+    lat2 = np.radians(buildings["lat"].to_numpy())[None, :]
+    lon2 = np.radians(buildings["lon"].to_numpy())[None, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+    return distance <= RADIUS_M
+
+
+def _pairs(store, lats, lons):
+    found, point_idx, building_idx = store.buildings_near(lats, lons, RADIUS_M)
+    coords = found[["lat", "lon"]].to_numpy()[building_idx]
+    return {
+        (int(p), round(la, 5), round(lo, 5)) for p, (la, lo) in zip(point_idx, coords)
+    }
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_buildings_near_matches_brute_force(tmp_path, seed):
+    buildings = _buildings(5000, seed)
+    index = build_store(buildings, tmp_path)
+    store = BuildingTileStore(tmp_path)
+    lats, lons = _route()
+
+    near = _brute_force_pairs(lats, lons, buildings)
+    point_idx, building_idx = np.nonzero(near)
+    expected = {
+        (int(p), round(buildings["lat"][b], 5), round(buildings["lon"][b], 5))
+        for p, b in zip(point_idx, building_idx)
+    }
+
+    assert sum(index["tiles"].values()) == len(buildings)
+    assert expected
+    assert _pairs(store, lats, lons) == expected
+
+
+def test_rebuild_replaces_previous_tiles(tmp_path):
+    build_store(_buildings(5000, 0), tmp_path)
+    unrelated = tmp_path / "notes.npz"
+    unrelated.write_bytes(b"not a tile")
+    (tmp_path / "3_4.npz").write_bytes(b"version 1 tile")
+
+    smaller = _buildings(50, 1)
+    index = build_store(smaller, tmp_path)
+    store = BuildingTileStore(tmp_path)
+
+    tile_dirs = [name for name in os.listdir(tmp_path) if name.startswith("tiles-")]
+    assert tile_dirs == [index["tiles_dir"]]
+    assert sorted(os.listdir(tmp_path / index["tiles_dir"])) == sorted(
+        f"{key}.npy" for key in index["tiles"]
+    )
+    assert unrelated.exists()
+    assert not (tmp_path / "3_4.npz").exists()
+    assert store.info()["tiles_on_disk"] == len(index["tiles"])
+
+    found, _, _ = store.buildings_near(*_route(), radius=RADIUS_M)
+    assert set(np.round(found["lat"], 5)) <= set(np.round(smaller["lat"], 5))
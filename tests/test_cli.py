@@ -0,0 +1,51 @@
+"""
+`analyze --save-tracks`: dos ficheros con el mismo nombre en carpetas
+distintas no pueden acabar en el mismo `.gpxtrack`.
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from components.cli import main, track_file_names
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+def test_track_file_names_keep_relative_paths(tmp_path):
+    files = [str(tmp_path / "a" / "x.gpx"), str(tmp_path / "b" / "x.gpx")]
+    assert track_file_names(files) == [os.path.join("a", "x"), os.path.join("b", "x")]
+    assert track_file_names([files[0]]) == ["x"]
+
+
+def test_track_file_names_reject_collisions(tmp_path):
+    with pytest.raises(ValueError, match="both be saved"):
+        track_file_names([str(tmp_path / "x.gpx"), str(tmp_path / "x.gpxtrack")])
+
+
+def test_save_tracks_same_basename(tmp_path):
+    for folder, source in (("a", "example.gpx"), ("b", "Unirun_2024.gpx")):
+        os.makedirs(tmp_path / "in" / folder)
+        shutil.copy(os.path.join(DATA_DIR, source), tmp_path / "in" / folder / "x.gpx")
+    output = tmp_path / "out.jsonl"
+
+    status = main(
+        [
+            "analyze",
+            str(tmp_path / "in"),
+            "--save-tracks",
+            str(tmp_path / "tracks"),
+            "-o",
+            str(output),
+            "-j",
+            "1",
+            "-q",
+        ]
+    )
+
+    assert status == 0
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    saved = {os.path.relpath(r["track_file"], tmp_path / "tracks") for r in records}
+    assert saved == {os.path.join("a", "x.gpxtrack"), os.path.join("b", "x.gpxtrack")}
@@ -0,0 +1,163 @@
+"""
+Prueba diferencial de `detect_significant_segments`: la versión por saltos
+sobre arrays tiene que dar exactamente los mismos segmentos que la máquina de
+estados original fila a fila (copiada aquí tal cual, congelada), en todos los
+GPX de `data/` y con todos los presets de sensibilidad.
+"""
+
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from components.core.climb_detector import (
+    DETECTION_PRESETS,
+    detect_significant_segments,
+)
+from components.core.gpx_parser import parse_gpx
+from components.core.utils import smoothed_grade
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+GPX_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "*.gpx")))
+
+
+# ───────────────────────── Detector original (no tocar)
+
+
+def baseline_detect_significant_segments(
+    df,
+    kind: str = "climb",
+    start_threshold_slope: float = 2.0,
+    end_threshold_slope: float = 1.0,
+    max_pause_length_m: int = 200,
+    max_pause_descent_m: int = 10,
+):
+    segments = []
+    state = "SEARCHING"
+
+    # Signo para diferenciar entre subidas (1) y bajadas (-1)
+    slope_sign = 1 if kind == "climb" else -1
+
+    start_idx = 0
+    current_segment_points = []
+
+    for i in range(1, len(df)):
+        point_data = df.iloc[i]
+        slope = point_data["plot_grade"] * slope_sign
+        elev_diff = (df["ele"].iloc[i] - df["ele"].iloc[i - 1]) * slope_sign
+        dist_diff = point_data["distance"] - df["distance"].iloc[i - 1]
+
+        if state == "SEARCHING":
+            if slope >= start_threshold_slope:
+                state = "IN_CLIMB"
+                start_idx = i - 1
+                current_segment_points = [
+                    df.iloc[i - 1].to_dict(),
+                    point_data.to_dict(),
+                ]
+
+        elif state == "IN_CLIMB":
+            if slope >= end_threshold_slope:
+                current_segment_points.append(point_data.to_dict())
+            else:
+                state = "EVALUATING_PAUSE"
+                pause_start_idx = i - 1
+                pause_length = 0
+                pause_descent = 0
+                current_segment_points.append(point_data.to_dict())
+
+        elif state == "EVALUATING_PAUSE":
+            current_segment_points.append(point_data.to_dict())
+            pause_length += dist_diff
+            if elev_diff < 0:
+                pause_descent += abs(elev_diff)
+
+            if slope >= end_threshold_slope:
+                state = "IN_CLIMB"
+            elif (
+                pause_length > max_pause_length_m or pause_descent > max_pause_descent_m
+            ):
+                final_segment_df = pd.DataFrame(
+                    current_segment_points[: -(i - pause_start_idx)]
+                )
+                _baseline_validate_and_append_segment(
+                    segments, final_segment_df, kind, start_idx
+                )
+                state = "SEARCHING"
+                current_segment_points = []
+
+    if state in ["IN_CLIMB", "EVALUATING_PAUSE"] and current_segment_points:
+        _baseline_validate_and_append_segment(
+            segments, pd.DataFrame(current_segment_points), kind, start_idx
+        )
+
+    return pd.DataFrame(segments)
+
+
+def _baseline_validate_and_append_segment(
+    segments_list,
+    segment_df,
+    kind,
+    start_idx,
+    min_gain: int = 20,
+    min_length: int = 300,
+) -> None:
+    if segment_df.empty or len(segment_df) < 2:
+        return
+
+    length = segment_df["distance"].iloc[-1] - segment_df["distance"].iloc[0]
+
+    if kind == "climb":
+        gain = segment_df[segment_df["ele"].diff() > 0]["ele"].diff().sum()
+    else:
+        gain = abs(segment_df[segment_df["ele"].diff() < 0]["ele"].diff().sum())
+
+    if length > min_length and gain > min_gain:
+        avg_slope = (gain / length) * 100 if length > 0 else 0
+        end_idx = start_idx + len(segment_df) - 1
+
+        segments_list.append(
+            {
+                "type": kind,
+                "start_km": segment_df["distance"].iloc[0] / 1000,
+                "end_km": segment_df["distance"].iloc[-1] / 1000,
+                "elev_gain" if kind == "climb" else "elev_loss": gain,
+                "length_m": length,
+                "avg_slope": avg_slope if kind == "climb" else -avg_slope,
+                "start_idx": start_idx,
+                "end_idx": end_idx,
+            }
+        )
+
+
+# ───────────────────────── Pruebas
+
+
+@pytest.fixture(scope="module", params=GPX_FILES, ids=os.path.basename)
+def track(request):
+    with open(request.param, "rb") as f:
+        df, _ = parse_gpx(f.read())
+    # El detector recibe la pendiente suavizada, igual que en la app y la CLI
+    df["plot_grade"] = smoothed_grade(df)
+    return df
+
+
+def test_data_files_found():
+    assert GPX_FILES, f"no GPX files in {DATA_DIR}"
+
+
+@pytest.mark.parametrize("kind", ["climb", "descent"])
+@pytest.mark.parametrize("preset", list(DETECTION_PRESETS))
+def test_matches_row_based_detector(track, preset, kind):
+    params = DETECTION_PRESETS[preset]
+    expected = baseline_detect_significant_segments(track, kind=kind, **params)
+    result = detect_significant_segments(track, kind=kind, **params)
+
+    if expected.empty:
+        assert result.empty
+        return
+    # La versión nueva añade columnas (categoría, pendientes extremas)
+    pd.testing.assert_frame_equal(
+        result[list(expected.columns)].reset_index(drop=True), expected
+    )
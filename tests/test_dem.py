@@ -0,0 +1,102 @@
+"""
+`DemSource` con teselas sintéticas (.hgt y GeoTIFF) de un plano inclinado:
+la interpolación bilineal lo reproduce exactamente, también en los bordes
+norte y este de la tesela, que con `floor` caían en la celda vecina.
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from components.core.dem import DemSource
+
+SAMPLES = 11  # paso de 0.1°
+
+
+def _plane(lat, lon):
+    return 1000 + 100 * (lat - 42) + 50 * (lon - 1)
+
+
+def _grid():
+    # Fila 0 = borde norte, columna 0 = borde oeste
+    lat = 43 - np.arange(SAMPLES) / (SAMPLES - 1)
+    lon = 1 + np.arange(SAMPLES) / (SAMPLES - 1)
+    return np.round(_plane(lat[:, None], lon[None, :]))
+
+
+def _write_hgt(path):
+    _grid().astype(">i2").tofile(path)
+
+
+def _write_geotiff(path):
+    """GeoTIFF mínimo: float32, una sola tira, EPSG:4326, PixelIsPoint."""
+    data = _grid().astype("<f4")
+    step = 1 / (SAMPLES - 1)
+    geo_keys = (1, 1, 0, 2, 1024, 0, 1, 2, 1025, 0, 1, 2)
+    # (etiqueta, tipo TIFF, valores ya empaquetados); 273 = StripOffsets
+    entries = [
+        (256, 4, struct.pack("<I", SAMPLES)),
+        (257, 4, struct.pack("<I", SAMPLES)),
+        (258, 3, struct.pack("<H", 32)),
+        (259, 3, struct.pack("<H", 1)),
+        (273, 4, None),
+        (277, 3, struct.pack("<H", 1)),
+        (279, 4, struct.pack("<I", data.nbytes)),
+        (339, 3, struct.pack("<H", 3)),
+        (33550, 12, struct.pack("<3d", step, step, 0.0)),
+        (33922, 12, struct.pack("<6d", 0.0, 0.0, 0.0, 1.0, 43.0, 0.0)),
+        (34735, 3, struct.pack(f"<{len(geo_keys)}H", *geo_keys)),
+        (42113, 2, b"-9999\0"),
+    ]
+    sizes = {2: 1, 3: 2, 4: 4, 12: 8}
+
+    # Cabecera, IFD, valores que no caben en 4 bytes y, al final, los datos
+    extra_offset = 8 + 2 + 12 * len(entries) + 4
+    data_offset = extra_offset + sum(len(r) for _, _, r in entries if r and len(r) > 4)
+    extra = b""
+    ifd = struct.pack("<H", len(entries))
+    for tag, kind, raw in entries:
+        if raw is None:
+            raw = struct.pack("<I", data_offset)
+        if len(raw) > 4:
+            value = struct.pack("<I", extra_offset + len(extra))
+            extra += raw
+        else:
+            value = raw.ljust(4, b"\0")
+        ifd += struct.pack("<HHI", tag, kind, len(raw) // sizes[kind]) + value
+    ifd += struct.pack("<I", 0)
+
+    with open(path, "wb") as f:
+        f.write(b"II" + struct.pack("<HI", 42, 8) + ifd + extra + data.tobytes())
+
+
+@pytest.fixture(params=["N42E001.hgt", "dem.tif"])
+def dem(request, tmp_path):
+    path = tmp_path / request.param
+    if path.suffix == ".hgt":
+        _write_hgt(path)
+    else:
+        _write_geotiff(path)
+    return DemSource(tmp_path)
+
+
+def test_interior_points_follow_plane(dem):
+    lat = np.array([42.05, 42.5, 42.93])
+    lon = np.array([1.01, 1.5, 1.77])
+    np.testing.assert_allclose(dem.elevations(lat, lon), _plane(lat, lon))
+
+
+@pytest.mark.parametrize(
+    ("lat", "lon"),
+    [(43.0, 1.5), (42.5, 2.0), (43.0, 2.0), (42.0, 1.0), (42.0, 2.0), (43.0, 1.0)],
+    ids=["north", "east", "north-east", "south-west", "south-east", "north-west"],
+)
+def test_tile_edges(dem, lat, lon):
+    z = dem.elevations([lat], [lon])
+    np.testing.assert_allclose(z, [_plane(lat, lon)])
+
+
+def test_outside_tiles_is_nan(dem):
+    z = dem.elevations([43.01, 42.5, 41.99, np.nan], [1.5, 2.01, 1.5, 1.5])
+    assert np.isnan(z).all()
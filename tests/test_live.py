@@ -0,0 +1,61 @@
+"""
+`LiveTrackAnalyzer` alimentado con un GPX entero da exactamente lo mismo que
+la versión por lotes: `parse_gpx(max_points_per_km=None)` + `smoothed_grade`
++ `detect_significant_segments`.
+"""
+
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from components.core.climb_detector import (
+    DETECTION_PRESETS,
+    detect_significant_segments,
+)
+from components.core.gpx_parser import _read_track_arrays, parse_gpx
+from components.core.live import LiveTrackAnalyzer
+from components.core.utils import smoothed_grade
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+GPX_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "*.gpx")))
+PARAMS = DETECTION_PRESETS["Balanced"]
+
+
+@pytest.fixture(scope="module", params=GPX_FILES, ids=os.path.basename)
+def tracks(request):
+    with open(request.param, "rb") as f:
+        content = f.read()
+
+    lat, lon, ele, times = _read_track_arrays(content)
+    live = LiveTrackAnalyzer(**PARAMS)
+    for k in range(len(lat)):
+        live.append(lat[k], lon[k], ele[k], times[k])
+    live.finish()
+
+    df, stats = parse_gpx(content, max_points_per_km=None)
+    df["plot_grade"] = smoothed_grade(df)
+    return live, df, stats
+
+
+def test_stats_match_batch(tracks):
+    live, _, stats = tracks
+    pd.testing.assert_series_equal(
+        pd.Series(live.stats()), pd.Series(stats), check_exact=True
+    )
+
+
+def test_frame_and_plot_grade_match_batch(tracks):
+    live, df, _ = tracks
+    pd.testing.assert_frame_equal(live.to_frame(), df, check_exact=True)
+
+
+@pytest.mark.parametrize("kind", ["climb", "descent"])
+def test_segments_match_batch(tracks, kind):
+    live, df, _ = tracks
+    pd.testing.assert_frame_equal(
+        live.segments(kind),
+        detect_significant_segments(df, kind=kind, **PARAMS),
+        check_exact=True,
+    )
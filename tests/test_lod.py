@@ -0,0 +1,59 @@
+"""
+Pirámide de detalle: al pedir un tramo corto de un track largo se baja de
+nivel y salen tantos puntos como se piden, no los pocos del nivel superior.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.core.lod import TrackPyramid
+
+POINTS = 200_000
+STEP_M = 5.0
+
+
+@pytest.fixture(scope="module")
+def pyramid():
+    rng = np.random.default_rng(0)
+    distance = np.arange(POINTS) * STEP_M
+    df = pd.DataFrame(
+        {
+            "lat": 42.0 + distance / 111_195 + rng.normal(0, 2e-5, POINTS),
+            "lon": 1.0 + rng.normal(0, 2e-5, POINTS).cumsum() / 50,
+            "ele": 800 + 300 * np.sin(distance / 20_000) + rng.normal(0, 1, POINTS),
+            "distance": distance,
+        }
+    )
+    return TrackPyramid(df)
+
+
+@pytest.mark.parametrize(
+    ("start_m", "end_m"),
+    [(None, None), (100_000, 150_000), (500_000, 520_000), (980_000, None)],
+)
+def test_query_returns_close_to_max_points(pyramid, start_m, end_m):
+    idx = pyramid.query(start_m, end_m, max_points=3000)
+    lo, hi = pyramid.index_range(start_m, end_m)
+
+    assert 0.95 * 3000 <= len(idx) <= 3000
+    assert idx[0] == lo and idx[-1] == hi - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_zooming_in_adds_detail(pyramid):
+    wide = pyramid.query(0, 500_000, max_points=2000)
+    narrow = pyramid.query(100_000, 110_000, max_points=2000)
+    lo, hi = pyramid.index_range(100_000, 110_000)
+
+    in_wide = np.count_nonzero((wide >= lo) & (wide < hi))
+    assert len(narrow) > 10 * in_wide
+    # Lo que ya se veía de lejos sigue al acercarse (los niveles son prefijos)
+    assert set(wide[(wide > lo) & (wide < hi - 1)]) <= set(narrow)
+
+
+def test_short_range_at_full_resolution(pyramid):
+    lo, hi = pyramid.index_range(300_000, 305_000)
+    assert np.array_equal(
+        pyramid.query(300_000, 305_000, max_points=3000), np.arange(lo, hi)
+    )
@@ -0,0 +1,211 @@
+"""
+`OverpassClient` contra espejos locales (`http.server` en localhost): el
+hedging se queda con el espejo rápido, las teselas se piden una sola vez y se
+reutilizan, y si fallan todos los espejos se lanza `OverpassError` (que se
+recuerda un rato sin volver a llamarlos).
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+import pytest
+
+from components.core.overpass import OverpassClient, OverpassError
+
+# Una ruta que cruza el borde entre dos teselas de 0.05°
+ROUTE_LATS = np.full(50, 41.41)
+ROUTE_LONS = np.linspace(2.14, 2.16, 50)
+SHARED_ID = 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        mirror = self.server.mirror
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        query = parse_qs(body)["data"][0]
+        bbox = tuple(
+            map(float, re.search(r"\(([-\d.,]+)\)", query).group(1).split(","))
+        )
+        with mirror.lock:
+            mirror.bboxes.append(bbox)
+            own_id = 1000 + len(mirror.bboxes)
+        time.sleep(mirror.delay_s)
+
+        if mirror.status != 200:
+            self.send_error(mirror.status)
+            return
+        s, w, n, e = bbox
+        elements = [
+            # Un edificio propio de la tesela y otro que cruza el borde
+            {
+                "type": "way",
+                "id": own_id,
+                "center": {"lat": (s + n) / 2, "lon": (w + e) / 2},
+                "tags": {"building": "yes", "height": "12"},
+            },
+            {
+                "type": "way",
+                "id": SHARED_ID,
+                "center": {"lat": 41.41, "lon": 2.15},
+                "tags": {"building": "yes", "building:levels": "3"},
+            },
+        ]
+        payload = json.dumps({"elements": elements}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Mirror:
+    def __init__(self, delay_s=0.0, status=200) -> None:
+        self.delay_s = delay_s
+        self.status = status
+        self.bboxes = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.mirror = self
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/interpreter"
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _wait_idle(client, timeout_s=5.0):
+    # Una consulta fallida no espera a las demás teselas de la ruta
+    deadline = time.monotonic() + timeout_s
+    while client.info()["tiles_in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def mirrors():
+    started = []
+
+    def start(**options):
+        mirror = _Mirror(**options)
+        started.append(mirror)
+        return mirror
+
+    yield start
+    for mirror in started:
+        mirror.close()
+
+
+@pytest.fixture
+def clients():
+    created = []
+
+    def create(endpoints, **options):
+        client = OverpassClient(
+            endpoints, timeout=5, connect_timeout=1, hedge_delay_s=0.2, **options
+        )
+        created.append(client)
+        return client
+
+    yield create
+    for client in created:
+        client.close()
+
+
+def test_hedging_picks_fast_mirror(mirrors, clients):
+    slow, fast = mirrors(delay_s=2.0), mirrors()
+    client = clients([slow.url, fast.url])
+
+    start = time.perf_counter()
+    client.fetch_bbox((41.4, 2.1, 41.45, 2.15))
+    elapsed = time.perf_counter() - start
+
+    info = client.info()
+    assert elapsed < 1.5
+    assert info["hedged"] == 1
+    assert info["wins"] == {slow.url: 0, fast.url: 1}
+    assert info["latency_s"][fast.url] < info["latency_s"][slow.url]
+    # Con la latencia observada, la siguiente consulta va primero al rápido
+    client.fetch_bbox((41.4, 2.15, 41.45, 2.2))
+    assert len(fast.bboxes) == 2 and len(slow.bboxes) == 1
+
+
+def test_tiles_are_deduplicated_and_cached(mirrors, clients):
+    mirror = mirrors(delay_s=0.3)
+    client = clients([mirror.url])
+
+    assert client.prefetch(ROUTE_LATS, ROUTE_LONS) == 2
+    buildings = client.buildings_near(ROUTE_LATS, ROUTE_LONS)
+
+    # La consulta se une a las descargas del prefetch: una petición por tesela
+    assert len(mirror.bboxes) == 2
+    assert len(set(mirror.bboxes)) == 2
+    # El edificio que llega en las dos teselas sale una sola vez
+    assert len(buildings) == 3
+    assert list(buildings.columns) == ["lat", "lon", "height", "levels"]
+
+    again = client.buildings_near(ROUTE_LATS, ROUTE_LONS)
+    client.prefetch(ROUTE_LATS, ROUTE_LONS)
+    info = client.info()
+    assert len(mirror.bboxes) == 2
+    assert again.equals(buildings)
+    assert info["tile_downloads"] == 2
+    assert info["tile_hits"] == 2
+    assert info["tiles_cached"] == 2
+
+
+def test_all_mirrors_failing_raises(mirrors, clients):
+    broken = [mirrors(status=500), mirrors(status=503)]
+    client = clients([m.url for m in broken])
+
+    with pytest.raises(OverpassError) as excinfo:
+        client.buildings_near(ROUTE_LATS, ROUTE_LONS)
+    _wait_idle(client)
+    assert set(excinfo.value.errors) == {m.url for m in broken}
+    requests_made = sum(len(m.bboxes) for m in broken)
+    assert requests_made == 4
+
+    # Las teselas fallidas se recuerdan: ni el prefetch ni la consulta repiten
+    client.prefetch(ROUTE_LATS, ROUTE_LONS)
+    with pytest.raises(OverpassError):
+        client.buildings_near(ROUTE_LATS, ROUTE_LONS)
+    assert sum(len(m.bboxes) for m in broken) == requests_made
+    assert client.info()["tiles_failed"] == 2
+
+
+def test_failed_tiles_are_retried_after_ttl(mirrors, clients):
+    mirror = mirrors(status=500)
+    client = clients([mirror.url], failed_tile_ttl_s=0.2)
+
+    with pytest.raises(OverpassError):
+        client.buildings_near(ROUTE_LATS, ROUTE_LONS)
+    _wait_idle(client)
+    mirror.status = 200
+    time.sleep(0.3)
+
+    assert len(client.buildings_near(ROUTE_LATS, ROUTE_LONS)) == 3
+    assert len(mirror.bboxes) == 4
+    assert client.info()["tiles_failed"] == 0
+
+
+def test_import_does_not_load_requests():
+    # La app importa el módulo al arrancar; `requests` solo hace falta al usarlo
+    code = (
+        "import sys, components.core.overpass, utils.gps_signal_analysis; "
+        "sys.exit('requests' in sys.modules)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
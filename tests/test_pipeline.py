@@ -0,0 +1,59 @@
+"""
+Caché de etapas: el tamaño de un DataFrame cuenta el contenido de sus
+columnas de objetos, y la etapa "parse" es la única caché en memoria del
+track (el `.gpxtrack` en disco solo se lee cuando la etapa no está en caché).
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from components.core import cache
+from components.core.cache import (
+    cached_parse_gpx,
+    content_key,
+    freeze_frame,
+    is_frozen,
+)
+from components.core.pipeline import PipelineRun, StageCache, _nbytes
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+def test_nbytes_counts_object_columns():
+    labels = pd.DataFrame({"osm_id": [f"way/{i:012d}" for i in range(1000)]})
+    numbers = pd.DataFrame({"lat": [0.0] * 1000})
+
+    assert _nbytes(labels) > _nbytes(numbers) + 1000 * 20
+    assert _nbytes(labels) == labels.memory_usage(deep=True).sum()
+    # Los frames de la caché están congelados, también sus columnas de objetos
+    assert _nbytes(freeze_frame(labels.copy())) == _nbytes(labels)
+    assert _nbytes((labels, {"stats": numbers})) == _nbytes(labels) + _nbytes(numbers)
+
+
+def test_parse_stage_reuses_stage_cache_and_track_file(tmp_path, monkeypatch):
+    with open(os.path.join(DATA_DIR, "example.gpx"), encoding="utf-8") as f:
+        gpx_data = f.read()
+
+    def parse(run):
+        gpx = run.source("gpx", content_key(gpx_data), gpx_data)
+        return run.stage(
+            "parse", cached_parse_gpx, gpx, track_dir=str(tmp_path), key=gpx.key
+        )
+
+    stage_cache = StageCache()
+    first = parse(PipelineRun(stage_cache)).value
+    second = parse(PipelineRun(stage_cache)).value
+    assert stage_cache.info()["hits"] == 1
+    assert is_frozen(second[0])
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Con la caché de etapas vacía (p. ej. tras reiniciar) se lee el fichero
+    def fail(*args, **kwargs):
+        raise AssertionError("the GPX should not be parsed again")
+
+    monkeypatch.setattr(cache, "parse_gpx", fail)
+    reopened = parse(PipelineRun(StageCache())).value
+    pd.testing.assert_frame_equal(reopened[0], first[0], check_exact=True)
+    assert reopened[1] == pytest.approx(first[1], nan_ok=True)
@@ -0,0 +1,41 @@
+"""
+Trazas a disco: el escritor conserva solo las más recientes y nunca borra
+ficheros que no ha escrito él, aunque el directorio sea compartido.
+"""
+
+import os
+import time
+
+from components.core import profiler
+from components.core.profiler import Trace, TraceWriter, span, use_trace
+
+
+def _flush(name, directory):
+    trace = Trace(name=name)
+    with use_trace(trace), span("work"):
+        pass
+    trace.flush(directory)
+    profiler.get_writer().drain()
+
+
+def test_prune_keeps_newest_and_unrelated_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "_writer", TraceWriter(keep=2))
+    unrelated = ["server.log", "other.trace.json", "session-old.log"]
+    for name in unrelated:
+        (tmp_path / name).write_text("not ours")
+        os.utime(tmp_path / name, (0, 0))
+
+    for i in range(4):
+        _flush(f"session-{i}", tmp_path)
+        time.sleep(0.02)
+
+    names = sorted(os.listdir(tmp_path))
+    assert names == sorted(
+        [
+            *unrelated,
+            "gpx-trace-session-2.log",
+            "gpx-trace-session-2.trace.json",
+            "gpx-trace-session-3.log",
+            "gpx-trace-session-3.trace.json",
+        ]
+    )
@@ -0,0 +1,99 @@
+"""
+Fidelidad de `simplify_indices`: con un presupuesto o una tolerancia, el track
+simplificado conserva la cima, la horquilla y los extremos de elevación.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.core.geodesy import consecutive_distances
+from components.core.simplify import (
+    EARTH_RADIUS_M,
+    refinement_order,
+    simplify_indices,
+)
+
+HAIRPIN = 1000
+SUMMIT = 1500
+LOCAL_SUMMIT = 600
+VALLEY = 2500
+
+
+def _frame(x, y, ele):
+    lat = 42.0 + np.degrees(y / EARTH_RADIUS_M)
+    lon = 1.0 + np.degrees(x / (EARTH_RADIUS_M * np.cos(np.radians(42.0))))
+    distance = np.cumsum(consecutive_distances(lat, lon, method="haversine"))
+    return pd.DataFrame({"lat": lat, "lon": lon, "ele": ele, "distance": distance})
+
+
+def _peak(i, center, width, height):
+    return height * np.clip(1 - np.abs(i - center) / width, 0, None)
+
+
+@pytest.fixture(scope="module")
+def track():
+    # 1 km al norte, horquilla, 1 km al sur a 20 m y 1 km al este
+    i = np.arange(3001)
+    x = np.where(i <= HAIRPIN, 0.0, np.where(i <= 2000, 20.0, 20.0 + (i - 2000)))
+    y = np.where(i <= HAIRPIN, i, np.where(i <= 2000, 2000.0 - i, 0.0)).astype(float)
+    rng = np.random.default_rng(0)
+    ele = (
+        500
+        + rng.normal(0, 0.3, len(i))
+        + _peak(i, SUMMIT, 200, 80)
+        + _peak(i, LOCAL_SUMMIT, 100, 20)
+        - _peak(i, VALLEY, 150, 30)
+    )
+    return _frame(x, y, ele)
+
+
+def _near(kept, index, slack=5):
+    return bool(np.any(np.abs(kept - index) <= slack))
+
+
+@pytest.mark.parametrize(
+    "options", [{"max_points": 40}, {"tolerance_m": 1.0}], ids=["budget", "tolerance"]
+)
+def test_keeps_summit_hairpin_and_extremes(track, options):
+    kept = simplify_indices(track, **options)
+    ele = track["ele"].to_numpy()
+
+    assert kept[0] == 0 and kept[-1] == len(track) - 1
+    assert int(np.argmax(ele)) in kept
+    assert int(np.argmin(ele)) in kept
+    assert _near(kept, HAIRPIN)
+    assert _near(kept, LOCAL_SUMMIT)
+    assert _near(kept, VALLEY)
+    assert len(kept) < len(track) // 10
+
+
+def test_tolerance_bounds_profile_error(track):
+    kept = simplify_indices(track, tolerance_m=1.0, space="profile")
+    distance, ele = track["distance"].to_numpy(), track["ele"].to_numpy()
+    profile = np.interp(distance, distance[kept], ele[kept])
+    # El ruido es de 0.3 m: lo que queda fuera son restos del ruido, no relieve
+    assert np.max(np.abs(profile - ele)) < 3.0
+
+
+def test_budget_is_prefix_of_refinement_order(track):
+    order = refinement_order(track)
+    assert np.array_equal(np.sort(order), np.arange(len(track)))
+    for budget in (4, 50, 500):
+        assert np.array_equal(
+            simplify_indices(track, max_points=budget), np.sort(order[:budget])
+        )
+
+
+def test_monotone_spiral():
+    # Peor caso de Douglas-Peucker: cada división separaba un solo punto
+    n = 50_000
+    angle = np.linspace(0, 40 * np.pi, n)
+    radius = np.linspace(10, 5000, n)
+    track = _frame(radius * np.cos(angle), radius * np.sin(angle), np.full(n, 100.0))
+
+    order = refinement_order(track)
+    kept = simplify_indices(track, max_points=2000)
+
+    assert np.array_equal(np.sort(order), np.arange(n))
+    assert len(kept) == 2000
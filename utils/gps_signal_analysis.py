@@ -1,136 +1,106 @@
-import altair as alt
-import branca.colormap as cm
-import folium
+import os
+
 import numpy as np
 import pandas as pd
-import requests
 import streamlit as st
-from folium.plugins import HeatMap
-from geopy.distance import geodesic
-from sklearn.neighbors import BallTree
-from streamlit_folium import st_folium
-
-
-def run_gps_signal_analysis(df, radius: int = 10) -> None:
-    st.title("📡 GPS Signal Quality Analyzer")
 
+from components.core.building_store import get_building_store
+from components.core.gps_risk import (
+    impute_building_heights,
+    neighbour_pairs,
+    score_pairs,
+    smooth_risk_scores,
+)
+from components.core.overpass import get_overpass_client
+from components.core.profiler import profiled
+from components.ui.route_layer import add_binned_route, threshold_bins
+
+# Índice local de edificios (ver components/core/building_store.py)
+BUILDING_STORE_DIR = os.environ.get(
+    "GPX_BUILDING_STORE", os.path.join("data", "buildings")
+)
+
+
+def prefetch_buildings(df, radius: int = 10) -> int:
+    """
+    Empieza a descargar de Overpass los edificios de la ruta en segundo plano,
+    para que estén (o estén en camino) al abrir la pestaña. Devuelve el número
+    de teselas de la ruta; no hace nada (0) si hay un índice local de
+    edificios.
+    """
+    if df is None or df.empty or get_building_store(BUILDING_STORE_DIR) is not None:
+        return 0
+    return get_overpass_client().prefetch(df["lat"], df["lon"], radius=radius)
+
+
+@profiled
+def gps_signal_analysis(df, radius: int = 10, progress=None) -> dict:
+    """
+    Cálculo de la pestaña, sin Streamlit: edificios cercanos, puntuación de
+    riesgo por punto y precisión estimada. Lanza `OverpassError` si no se
+    pueden descargar los edificios. `progress(fracción, texto)` se llama
+    durante la descarga (ver `OverpassClient.buildings_near`).
+    """
+
+    def report(fraction, text):
+        if progress is not None:
+            progress(fraction, text)
+
+    # Reduce number of points (every 2nd point): vistas, sin copiar el track
+    df = pd.DataFrame(
+        {"lat": df["lat"].to_numpy()[::2], "lon": df["lon"].to_numpy()[::2]},
+        copy=False,
+    )
+    result = {"points": df, "buildings": None}
     if df.empty:
-        st.warning("No points found in GPX.")
-        return
-
-    # Reduce number of points (every 2nd point)
-    df = df.iloc[::2].reset_index(drop=True)
-    st.markdown(f"🔢 Points after reduction: {len(df)}")
-
-    # ────── Bounding Box & Overpass Query
-    min_lat, max_lat = df["lat"].min(), df["lat"].max()
-    min_lon, max_lon = df["lon"].min(), df["lon"].max()
-    bbox_key = f"{min_lat:.5f}-{min_lon:.5f}-{max_lat:.5f}-{max_lon:.5f}"
+        return result
 
-    if "building_cache" not in st.session_state:
-        st.session_state["building_cache"] = {}
+    # ────── Buildings: local tile store if available, Overpass otherwise
+    def tiles_done(done, total):
+        report(0.8 * done / max(total, 1), f"Buildings: {done}/{total} tiles")
 
-    if bbox_key in st.session_state["building_cache"]:
-        buildings_df = st.session_state["building_cache"][bbox_key]
+    store = get_building_store(BUILDING_STORE_DIR)
+    if store is not None:
+        buildings_df, point_idx, building_idx = store.buildings_near(
+            df["lat"], df["lon"], radius=radius, progress=tiles_done
+        )
+        result["source"] = (
+            f"🗂️ Buildings from local store ({store.info()['tiles_loaded']} tiles loaded)"
+        )
     else:
-        query = f"""
-        [out:json];
-        (
-            way["building"]({min_lat},{min_lon},{max_lat},{max_lon});
-            relation["building"]({min_lat},{min_lon},{max_lat},{max_lon});
-        );
-        out center;
-        """
-
-        overpass_endpoints = [
-            "http://overpass-api.de/api/interpreter",
-            "https://overpass.kumi.systems/api/interpreter",
-            "https://overpass.openstreetmap.ru/api/interpreter",
-        ]
-
-        response = None
-        for endpoint in overpass_endpoints:
-            try:
-                response = requests.get(endpoint, params={"data": query}, timeout=25)
-                response.raise_for_status()
-                raw_data = response.json()
-                break
-            except Exception as e:
-                st.warning(f"❌ Overpass endpoint failed: {endpoint} — {e}")
-                continue
-
-        if response is None:
-            st.error("❌ All Overpass API endpoints failed. Try again later.")
-            return
-
-        buildings = []
-        for el in raw_data["elements"]:
-            lat_ = el.get("lat") or el.get("center", {}).get("lat")
-            lon_ = el.get("lon") or el.get("center", {}).get("lon")
-            if lat_ is None or lon_ is None:
-                continue
-            tags = el.get("tags", {})
-            h = tags.get("height")
-            l = tags.get("building:levels")
-            height = None
-            levels = None
-            if h:
-                try:
-                    height = float(h)
-                except:
-                    pass
-            if l and levels is None:
-                try:
-                    levels = int(l)
-                except:
-                    pass
-            buildings.append(
-                {"lat": lat_, "lon": lon_, "height": height, "levels": levels}
-            )
-        buildings_df = pd.DataFrame(buildings)
-        st.session_state["building_cache"][bbox_key] = buildings_df
+        client = get_overpass_client()
+        buildings_df = client.buildings_near(
+            df["lat"], df["lon"], radius=radius, progress=tiles_done
+        )
+        info = client.info()
+        result["source"] = (
+            f"🌐 Buildings from Overpass ({info['tiles_cached']} tiles cached, "
+            f"{info['tile_hits']} cache hits)"
+        )
+        point_idx = building_idx = None
 
     if buildings_df.empty:
-        st.warning("No buildings found in the area.")
-        return
-
-    # ────── Risk Calculation (using BallTree)
-    earth_radius_m = 6371000
-    radius_rad = radius / earth_radius_m
-
-    tree = BallTree(np.radians(buildings_df[["lat", "lon"]].values), metric="haversine")
-    risk_scores = []
-    heatmap_data = []
-    used_buildings_idx = set()
-
-    building_heights = (
-        buildings_df.apply(
-            lambda row: (
-                row["height"] if pd.notnull(row["height"]) else (row["levels"] or 0) * 3
-            ),
-            axis=1,
+        result["buildings"] = buildings_df
+        return result
+
+    # ────── Risk Calculation (batched BallTree query)
+    report(0.9, "Scoring points")
+    if point_idx is None:
+        point_idx, building_idx = neighbour_pairs(
+            df["lat"], df["lon"], buildings_df["lat"], buildings_df["lon"], radius
         )
-        .fillna(0)
-        .values
-    )
-
-    for _, row in df.iterrows():
-        point_rad = np.radians([[row["lat"], row["lon"]]])
-        ind = tree.query_radius(point_rad, r=radius_rad)[0]
-        total_score = 0.0
-        for i in ind:
-            b_lat, b_lon = buildings_df.loc[i, ["lat", "lon"]]
-            d = geodesic((row["lat"], row["lon"]), (b_lat, b_lon)).meters
-            h = building_heights[i]
-            if h > 0 and d > 1:
-                total_score += h / d
-                used_buildings_idx.add(i)
-        heatmap_data.append([row["lat"], row["lon"], total_score])
-        risk_scores.append(total_score)
-
-    df["risk_score"] = (
-        pd.Series(risk_scores).rolling(window=5, center=True).mean().bfill().ffill()
+    building_heights = impute_building_heights(buildings_df)
+    raw_scores, used_buildings = score_pairs(
+        df["lat"],
+        df["lon"],
+        buildings_df["lat"],
+        buildings_df["lon"],
+        building_heights,
+        point_idx,
+        building_idx,
     )
+    df["raw_score"] = raw_scores
+    df["risk_score"] = smooth_risk_scores(raw_scores)
 
     gps_score = "✅ High"
     danger_ratio = (df["risk_score"] >= 1.0).mean()
@@ -139,29 +109,64 @@ def run_gps_signal_analysis(df, radius: int = 10) -> None:
     elif danger_ratio > 0.2:
         gps_score = "⚠️ Medium"
 
-    st.markdown(f"### 📡 Estimated GPS Precision: {gps_score}")
+    result["precision"] = gps_score
+    result["buildings"] = buildings_df[used_buildings].reset_index(drop=True)
+    result["heights"] = building_heights[used_buildings]
+    report(1.0, "Done")
+    return result
+
+
+def show_overpass_error(error) -> None:
+    st.error("❌ All Overpass API endpoints failed. Try again later.")
+    for url, message in error.errors.items():
+        st.warning(f"❌ Overpass endpoint failed: {url} — {message}")
+
+
+def show_gps_signal_analysis(result) -> None:
+    """Pinta el resultado de `gps_signal_analysis` (p. ej. salido de la caché)."""
+    # Dependencias de gráficos y mapas solo al pintar la pestaña (arranque en frío)
+    import altair as alt
+    import branca.colormap as cm
+    import folium
+    from folium.plugins import HeatMap
+    from streamlit_folium import st_folium
+
+    st.title("📡 GPS Signal Quality Analyzer")
+
+    df = result["points"]
+    if df.empty:
+        st.warning("No points found in GPX.")
+        return
+    st.markdown(f"🔢 Points after reduction: {len(df)}")
+    st.caption(result["source"])
+
+    buildings_df = result["buildings"]
+    if buildings_df.empty:
+        st.warning("No buildings found in the area.")
+        return
+
+    heatmap_data = np.column_stack((df["lat"], df["lon"], df["raw_score"])).tolist()
+    st.markdown(f"### 📡 Estimated GPS Precision: {result['precision']}")
 
     # ────── Map
     center = [df["lat"].mean(), df["lon"].mean()]
     m = folium.Map(location=center, zoom_start=14)
 
-    for i in range(len(df) - 1):
-        lat1, lon1 = df.loc[i, ["lat", "lon"]]
-        lat2, lon2 = df.loc[i + 1, ["lat", "lon"]]
-        avg_risk = (df.loc[i, "risk_score"] + df.loc[i + 1, "risk_score"]) / 2
-        color = "green" if avg_risk < 0.5 else "orange" if avg_risk < 1.0 else "red"
-        folium.PolyLine(
-            [(lat1, lon1), (lat2, lon2)], color=color, weight=5, opacity=0.9
-        ).add_to(m)
-
-    filtered_buildings_df = buildings_df.iloc[list(used_buildings_idx)]
+    risk = df["risk_score"].to_numpy()
+    add_binned_route(
+        m,
+        df["lat"],
+        df["lon"],
+        threshold_bins((risk[:-1] + risk[1:]) / 2, [0.5, 1.0]),
+        ["green", "orange", "red"],
+        weight=5,
+        opacity=0.9,
+    )
 
-    heights = []
-    for _, b in filtered_buildings_df.iterrows():
-        h = b["height"] if pd.notnull(b["height"]) else (b["levels"] or 0) * 3
-        if h > 0:
-            heights.append(h)
+    filtered_buildings_df = buildings_df
+    filtered_heights = result["heights"]
 
+    heights = filtered_heights[filtered_heights > 0].tolist()
     if len(heights) < 2:
         heights = [10, 100]
     min_h, max_h = float(min(heights)), float(max(heights))
@@ -175,11 +180,12 @@ def run_gps_signal_analysis(df, radius: int = 10) -> None:
     colormap.caption = "Building Height (m)"
     colormap.add_to(m)
 
-    for _, b in filtered_buildings_df.iterrows():
-        h = b["height"] if pd.notnull(b["height"]) else (b["levels"] or 0) * 3
+    for b_lat, b_lon, h in zip(
+        filtered_buildings_df["lat"], filtered_buildings_df["lon"], filtered_heights
+    ):
         color = colormap(h) if h else "#999999"
         folium.CircleMarker(
-            location=[b["lat"], b["lon"]],
+            location=[b_lat, b_lon],
             radius=5,
             color=color,
             fill=True,
@@ -205,13 +211,16 @@ def run_gps_signal_analysis(df, radius: int = 10) -> None:
     )
 
     st.markdown("### 📊 Histogram of GPS Risk Levels")
-    df["risk_level"] = pd.cut(
-        df["risk_score"],
-        bins=[-1, 0.5, 1.0, float("inf")],
-        labels=["Low", "Medium", "High"],
+    # `df` puede venir de la caché compartida: la columna va en una copia
+    levels = df.assign(
+        risk_level=pd.cut(
+            df["risk_score"],
+            bins=[-1, 0.5, 1.0, float("inf")],
+            labels=["Low", "Medium", "High"],
+        )
     )
     st.altair_chart(
-        alt.Chart(df)
+        alt.Chart(levels)
         .mark_bar()
         .encode(
             x=alt.X("risk_level:N", title="Risk Level"),